@@ -0,0 +1,61 @@
+"""Compare decoding ClientPayload deltas with chr() per byte and with bytes().
+
+Usage:
+    python benchmarks/client_payload.py
+
+Uses a reaction storm: a ClientPayload with 100 reaction deltas.
+"""
+import json
+import timeit
+
+from fbchat import _util
+
+REACTIONS = 100
+
+
+def reaction_storm():
+    deltas = [
+        {
+            "deltaMessageReaction": {
+                "threadKey": {"threadFbId": 1234},
+                "messageId": "mid.$XYZ{}".format(i),
+                "action": 0,
+                "userId": 4321 + i,
+                "reaction": "😍",
+                "senderId": 4321 + i,
+                "offlineThreadingId": "6623596674408921967",
+            }
+        }
+        for i in range(REACTIONS)
+    ]
+    text = json.dumps({"deltas": deltas}, ensure_ascii=False)
+    return list(text.encode("utf-8"))
+
+
+def per_char(payload):
+    # How parse_client_payloads used to do it
+    return _util.parse_json("".join(chr(z) for z in payload))
+
+
+def from_bytes(payload):
+    return _util.parse_json(bytes(payload))
+
+
+def main():
+    payload = reaction_storm()
+    assert from_bytes(payload)["deltas"][0]["deltaMessageReaction"]["reaction"] == "😍"
+    number = 200
+    print("{} reactions ({} KiB)".format(REACTIONS, len(payload) // 1024))
+    baseline = None
+    for name, func in [("chr() join", per_char), ("bytes()", from_bytes)]:
+        took = timeit.timeit(lambda: func(payload), number=number) / number
+        baseline = baseline or took
+        print(
+            "  {:<12} {:8.1f} µs  {:6.1f} MiB/s  {:5.1f}x".format(
+                name, took * 1e6, len(payload) / took / 2 ** 20, baseline / took
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
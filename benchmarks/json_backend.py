@@ -0,0 +1,117 @@
+"""Compare the JSON backends on MQTT and GraphQL payloads.
+
+Usage:
+    python benchmarks/json_backend.py [payload files...]
+
+Payload files are raw response bodies or MQTT payloads, e.g. saved from the debug
+logs. Files ending in ``.graphql`` are parsed as ``/api/graphqlbatch/`` responses.
+Without any files, generated payloads shaped like real ones are used.
+"""
+import sys
+import json
+import timeit
+import random
+import string
+
+from fbchat import _util, _graphql
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def random_text(length):
+    alphabet = string.ascii_letters + " " * 10 + "äöé😀"
+    return "".join(random.choice(alphabet) for _ in range(length))
+
+
+def message_delta(i):
+    return {
+        "class": "NewMessage",
+        "attachments": [],
+        "body": random_text(80),
+        "data": {"prng": '[{"o":0,"i":"1234","l":5}]'},
+        "irisSeqId": str(1000 + i),
+        "messageMetadata": {
+            "actorFbId": "1234",
+            "messageId": "mid.$" + random_text(20),
+            "offlineThreadingId": str(6000000000000000000 + i),
+            "threadKey": {"threadFbId": "5678"},
+            "timestamp": str(1600000000000 + i),
+            "tags": ["source:messenger:web"],
+        },
+        "participants": ["1234", "5678", "9012"],
+        "requestContext": {"apiArgs": {}},
+    }
+
+
+def t_ms_payload():
+    deltas = [message_delta(i) for i in range(20)]
+    return json.dumps({"deltas": deltas, "lastIssuedSeqId": 1020}).encode("utf-8")
+
+
+def graphql_payload():
+    nodes = [
+        {
+            "__typename": "UserMessage",
+            "message_id": "mid.$" + random_text(20),
+            "message_sender": {"id": "1234"},
+            "message": {"text": random_text(80), "ranges": []},
+            "timestamp_precise": str(1600000000000 + i),
+            "unread": False,
+            "tags_list": ["source:messenger:web"],
+            "message_reactions": [],
+            "blob_attachments": [],
+        }
+        for i in range(100)
+    ]
+    objects = [
+        {"q0": {"data": {"message_thread": {"messages": {"nodes": nodes}}}}},
+        {"successful_results": 1, "error_results": 0, "skipped_results": 0},
+    ]
+    return "\r\n".join(json.dumps(o) for o in objects).encode("utf-8")
+
+
+def load_payloads(paths):
+    if not paths:
+        return [("t_ms (generated)", t_ms_payload(), False),
+                ("graphqlbatch (generated)", graphql_payload(), True)]
+    payloads = []
+    for path in paths:
+        with open(path, "rb") as f:
+            payloads.append((path, f.read(), path.endswith(".graphql")))
+    return payloads
+
+
+def bench(data, graphql, number):
+    if graphql:
+        return timeit.timeit(lambda: _graphql.response_to_json(data), number=number)
+    return timeit.timeit(lambda: _util.parse_json(_util.strip_json_cruft(data)),
+                         number=number)
+
+
+def main():
+    random.seed(0)
+    number = 500
+    backends = [("json (str)", json.loads, True), ("json", json.loads, False)]
+    if orjson:
+        backends.append(("orjson", orjson.loads, False))
+    else:
+        print("orjson is not installed, only benchmarking the standard library")
+
+    for name, data, graphql in load_payloads(sys.argv[1:]):
+        print("{} ({} KiB)".format(name, len(data) // 1024))
+        baseline = None
+        for backend, loads, decode in backends:
+            _util.set_json_loads(loads)
+            # The old code path decoded the payload to a str before parsing
+            payload = data.decode("utf-8") if decode else data
+            took = bench(payload, graphql, number) / number * 1e6
+            baseline = baseline or took
+            print("  {:<12} {:8.1f} µs  {:5.2f}x".format(backend, took, baseline / took))
+    _util.set_json_loads(None)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""Compare computing ``MessageData.read_by`` per receipt with the sorted index.
+
+Usage:
+    python benchmarks/read_receipts.py
+
+Uses a page of 100 messages from a group with 250 participants, each of which has
+read up to a random message.
+"""
+import timeit
+import random
+
+from fbchat import _util
+from fbchat._models._message import ReadReceiptIndex
+
+PARTICIPANTS = 250
+MESSAGES = 100
+START = 1600000000000
+
+
+def group_fixture():
+    timestamps = [START + i * 1000 for i in range(MESSAGES)]
+    receipts = [
+        {
+            "actor": {"id": str(100000 + i)},
+            "watermark": str(random.choice(timestamps)),
+        }
+        for i in range(PARTICIPANTS)
+    ]
+    return timestamps, receipts
+
+
+def per_receipt(timestamps, receipts):
+    # How MessageData._from_graphql used to do it
+    rtn = []
+    for timestamp in timestamps:
+        created_at = _util.millis_to_datetime(timestamp)
+        rtn.append(
+            [
+                receipt["actor"]["id"]
+                for receipt in receipts
+                if _util.millis_to_datetime(int(receipt["watermark"])) >= created_at
+            ]
+        )
+    return rtn
+
+
+def indexed(timestamps, receipts):
+    index = ReadReceiptIndex._from_graphql(receipts)
+    return [index.read_by(timestamp) for timestamp in timestamps]
+
+
+def main():
+    random.seed(0)
+    timestamps, receipts = group_fixture()
+    assert per_receipt(timestamps, receipts) == indexed(timestamps, receipts)
+    number = 20
+    print("{} messages, {} participants".format(MESSAGES, PARTICIPANTS))
+    baseline = None
+    for name, func in [("per receipt", per_receipt), ("index", indexed)]:
+        took = timeit.timeit(lambda: func(timestamps, receipts), number=number)
+        took = took / number * 1e3
+        baseline = baseline or took
+        print("  {:<12} {:8.2f} ms  {:6.1f}x".format(name, took, baseline / took))
+
+
+if __name__ == "__main__":
+    main()
@@ -16,6 +16,7 @@ _logging.getLogger(__name__).addHandler(_logging.NullHandler())
 
 # The order of these is somewhat significant, e.g. User has to be imported after Thread!
 from . import _common, _util
+from ._util import set_json_loads, generate_offline_threading_id
 from ._exception import (
     FacebookError,
     HTTPError,
@@ -27,7 +28,10 @@ from ._exception import (
     NotConnected,
     PleaseRefresh,
 )
-from ._session import Session
+from ._ratelimit import RateLimiter, RateLimitStats
+from ._retry import RetryPolicy
+from ._outbox import Outbox, OutboxStats
+from ._session import Session, ConnectionOptions
 from ._threads import (
     ThreadABC,
     Thread,
@@ -69,6 +73,7 @@ from ._models import (
     Message,
     MessageSnippet,
     MessageData,
+    LazyMessageData,
 )
 
 # Events
@@ -77,6 +82,7 @@ from ._events import (
     Event,
     UnknownEvent,
     ThreadEvent,
+    ParserRegistry,
     Connect,
     Disconnect,
     Resync,
@@ -86,6 +92,7 @@ from ._events import (
     LiveLocationEvent,
     UnsendEvent,
     MessageReplyEvent,
+    CLIENT_DELTA_PARSERS,
     # _delta_class
     PeopleAdded,
     PersonRemoved,
@@ -95,6 +102,7 @@ from ._events import (
     ThreadsRead,
     MessageEvent,
     ThreadFolder,
+    DELTA_PARSERS,
     # _delta_type
     ColorSet,
     EmojiSet,
@@ -112,14 +120,24 @@ from ._events import (
     PlanEdited,
     PlanDeleted,
     PlanResponded,
+    ADMIN_MESSAGE_PARSERS,
     # __init__
     Typing,
     FriendRequest,
     Presence,
 )
+from ._event_queue import OverflowPolicy, QueueStats
+from ._checkpoint import (
+    Checkpoint,
+    CheckpointStore,
+    FileCheckpointStore,
+    SQLiteCheckpointStore,
+)
+from ._cache import ThreadInfoCache
 from ._listen import Listener
+from ._pool import SessionPool, PoolHealth
 
-from ._client import Client
+from ._client import Client, BackfillCursor, BroadcastResult
 
 __version__ = "0.6.21"
 
@@ -0,0 +1,241 @@
+import attr
+import time
+import asyncio
+import collections
+from ._common import log, kw_only
+from . import _threads, _events
+
+from typing import AsyncIterator, Callable, Dict, Iterable, List, Optional, Tuple
+
+FetchFunc = Callable[[List[str]], AsyncIterator[_threads.ThreadABC]]
+
+_GROUP_EVENTS = (
+    _events.TitleSet,
+    _events.PeopleAdded,
+    _events.PersonRemoved,
+    _events.AdminsAdded,
+    _events.AdminsRemoved,
+    _events.ApprovalModeSet,
+)
+_PLAN_EVENTS = (
+    _events.PlanCreated,
+    _events.PlanEnded,
+    _events.PlanEdited,
+    _events.PlanDeleted,
+    _events.PlanResponded,
+)
+
+
+#: Result of a lookup that the fetch didn't return a thread for, e.g. because it was
+#: passed to ``on_error``. Callers waiting for it skip it, like the fetching caller
+_NOT_FETCHED = object()
+
+
+def _fail(future: asyncio.Future, exc: BaseException) -> None:
+    if future.done():
+        return
+    if isinstance(exc, Exception):
+        future.set_exception(exc)
+        # Nobody might be waiting, so mark the exception as retrieved
+        future.exception()
+    else:
+        future.cancel()
+
+
+@attr.s(slots=True, kw_only=kw_only, eq=False, auto_attribs=True)
+class ThreadInfoCache:
+    """Cache of `UserData`, `GroupData` and `PageData`, keyed by thread ID.
+
+    Entries are evicted when they're older than ``ttl``, or when the cache is full
+    (least recently used first). Concurrent lookups of the same missing thread only
+    fetch it once.
+
+    Pass it to both `Client` and `Listener`, and events that change a thread will
+    update or invalidate its entry.
+
+    Example:
+        >>> cache = fbchat.ThreadInfoCache(max_size=10000, ttl=3600)
+        >>> client = fbchat.Client(session=session, thread_cache=cache)
+        >>> listener = fbchat.Listener(session=session, chat_on=False,
+        ...                            foreground=False, thread_cache=cache)
+    """
+
+    #: How many threads to keep at most
+    max_size: int = 1024
+    #: How long entries are valid, in seconds
+    ttl: float = 300
+    #: Number of lookups that were answered from the cache
+    hits: int = 0
+    #: Number of lookups that had to be fetched
+    misses: int = 0
+    _clock: Callable[[], float] = time.monotonic
+    _entries: "collections.OrderedDict[str, Tuple[float, _threads.ThreadABC]]" = (
+        attr.ib(factory=collections.OrderedDict)
+    )
+    _inflight: Dict[str, asyncio.Future] = attr.ib(factory=dict)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, thread_id: str) -> Optional[_threads.ThreadABC]:
+        """Get a cached thread, or ``None`` if it's not cached or has expired."""
+        try:
+            expires_at, thread = self._entries[thread_id]
+        except KeyError:
+            return None
+        if expires_at <= self._clock():
+            del self._entries[thread_id]
+            return None
+        self._entries.move_to_end(thread_id)
+        return thread
+
+    def put(self, thread: _threads.ThreadABC) -> None:
+        """Add or replace a thread in the cache."""
+        self._entries[thread.id] = (self._clock() + self.ttl, thread)
+        self._entries.move_to_end(thread.id)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, thread_id: str) -> None:
+        """Remove a thread from the cache."""
+        self._entries.pop(thread_id, None)
+
+    def clear(self) -> None:
+        """Remove all threads from the cache."""
+        self._entries.clear()
+
+    def _patch(self, thread_id: str, **changes) -> None:
+        try:
+            expires_at, thread = self._entries[thread_id]
+        except KeyError:
+            return
+        fields = attr.fields_dict(type(thread))
+        if not all(key in fields for key in changes):
+            # The entry doesn't know about this kind of change, so refetch it later
+            del self._entries[thread_id]
+            return
+        self._entries[thread_id] = (expires_at, attr.evolve(thread, **changes))
+
+    def handle_event(self, event: _events.Event) -> None:
+        """Update or invalidate the entries affected by an event.
+
+        `Listener` calls this for every event it parses.
+        """
+        if isinstance(event, _events.UnfetchedThreadEvent):
+            self.invalidate(event.thread.id)
+            return
+        if not isinstance(event, _events.ThreadEvent):
+            return
+        thread_id = event.thread.id
+        _, thread = self._entries.get(thread_id, (None, None))
+        if thread is None:
+            return
+        if isinstance(event, _GROUP_EVENTS) and not isinstance(
+            thread, _threads.GroupData
+        ):
+            self.invalidate(thread_id)
+            return
+
+        if isinstance(event, _events.TitleSet):
+            self._patch(thread_id, name=event.title)
+        elif isinstance(event, _events.PeopleAdded):
+            # Parsed groups have a list of participants, so keep the order
+            added = [user for user in event.added if user not in thread.participants]
+            self._patch(thread_id, participants=[*thread.participants, *added])
+        elif isinstance(event, _events.PersonRemoved):
+            participants = [p for p in thread.participants if p != event.removed]
+            self._patch(thread_id, participants=participants)
+        elif isinstance(event, _events.NicknameSet):
+            if isinstance(thread, _threads.GroupData):
+                nicknames = dict(thread.nicknames or {})
+                if event.nickname is None:
+                    nicknames.pop(event.subject.id, None)
+                else:
+                    nicknames[event.subject.id] = event.nickname
+                self._patch(thread_id, nicknames=nicknames)
+            elif event.subject.id == thread_id:
+                self._patch(thread_id, nickname=event.nickname)
+            else:
+                self._patch(thread_id, own_nickname=event.nickname)
+        elif isinstance(event, _events.ColorSet):
+            self._patch(thread_id, color=event.color)
+        elif isinstance(event, _events.EmojiSet):
+            self._patch(thread_id, emoji=event.emoji)
+        elif isinstance(event, _events.AdminsAdded):
+            self._patch(thread_id, admins=thread.admins | {u.id for u in event.added})
+        elif isinstance(event, _events.AdminsRemoved):
+            self._patch(thread_id, admins=thread.admins - {u.id for u in event.removed})
+        elif isinstance(event, _events.ApprovalModeSet):
+            self._patch(thread_id, approval_mode=event.require_admin_approval)
+        elif isinstance(event, _PLAN_EVENTS):
+            self.invalidate(thread_id)
+
+    async def get_many(
+        self, ids: Iterable[str], fetch: FetchFunc
+    ) -> AsyncIterator[_threads.ThreadABC]:
+        """Get threads from the cache, and fetch the missing ones, unordered.
+
+        Args:
+            ids: Thread IDs to get
+            fetch: Fetches threads that aren't cached. Threads that are being fetched
+                by another call are waited for instead. Threads that the fetch doesn't
+                return are skipped, in every call waiting for them.
+        """
+        loop = asyncio.get_event_loop()
+        cached = []
+        waiting = []
+        missing = []
+        # Register all the misses before yielding anything, so that the finally block
+        # below releases them however the caller stops iterating
+        for thread_id in dict.fromkeys(ids):
+            thread = self.get(thread_id)
+            if thread is not None:
+                self.hits += 1
+                cached.append(thread)
+            elif thread_id in self._inflight:
+                self.hits += 1
+                waiting.append((thread_id, self._inflight[thread_id]))
+            else:
+                self.misses += 1
+                missing.append(thread_id)
+                self._inflight[thread_id] = loop.create_future()
+
+        error = None
+        try:
+            for thread in cached:
+                yield thread
+            if missing:
+                async for thread in fetch(missing):
+                    self.put(thread)
+                    future = self._inflight.pop(thread.id, None)
+                    if future is not None and not future.done():
+                        future.set_result(thread)
+                    yield thread
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            for thread_id in missing:
+                future = self._inflight.pop(thread_id, None)
+                if future is None or future.done():
+                    continue
+                if error is None:
+                    future.set_result(_NOT_FETCHED)
+                else:
+                    _fail(future, error)
+
+        retry = []
+        for thread_id, future in waiting:
+            try:
+                thread = await asyncio.shield(future)
+            except asyncio.CancelledError:
+                if not future.cancelled():
+                    raise  # We were cancelled, not the fetch we were waiting for
+                retry.append(thread_id)
+                continue
+            if thread is not _NOT_FETCHED:
+                yield thread
+        if retry:
+            log.debug("Fetching threads that another lookup gave up on: %s", retry)
+            async for thread in self.get_many(retry, fetch):
+                yield thread
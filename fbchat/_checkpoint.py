@@ -0,0 +1,154 @@
+import abc
+import attr
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+from ._common import log, kw_only, attrs_default
+
+from typing import Optional
+
+
+@attrs_default
+class Checkpoint:
+    """A position in the messenger sync queue, which `Listener` can resume from."""
+
+    #: The token of the sync queue
+    sync_token: str
+    #: The last sequence ID that was received
+    sequence_id: int
+
+
+class CheckpointStore(metaclass=abc.ABCMeta):
+    """Stores `Checkpoint` objects for `Listener`, so it can resume after a restart.
+
+    Implement this to store the checkpoints somewhere other than a file or SQLite.
+    `Listener` calls `CheckpointStore.save` in a worker thread, so it may block.
+    """
+
+    @abc.abstractmethod
+    def load(self, user_id: str) -> Optional[Checkpoint]:
+        """Load the checkpoint of the user, or ``None`` if there is none."""
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def save(self, user_id: str, checkpoint: Optional[Checkpoint]) -> None:
+        """Atomically replace the checkpoint of the user.
+
+        If ``checkpoint`` is ``None``, the stored checkpoint should be removed.
+        """
+        raise NotImplementedError
+
+
+@attr.s(slots=True, kw_only=kw_only, auto_attribs=True)
+class FileCheckpointStore(CheckpointStore):
+    """Store checkpoints in a JSON file.
+
+    The file is replaced atomically on every save, so it's never left half-written.
+
+    Example:
+        >>> store = fbchat.FileCheckpointStore(path="checkpoints.json")
+        >>> listener = fbchat.Listener(session=session, chat_on=True, foreground=False,
+        ...                            checkpoint_store=store)
+    """
+
+    #: Path of the JSON file
+    path: str
+    _lock: threading.Lock = attr.ib(factory=threading.Lock, init=False)
+
+    def _read(self):
+        try:
+            with open(self.path) as file:
+                return json.load(file)
+        except FileNotFoundError:
+            return {}
+        except ValueError:
+            log.warning("Checkpoint file %s is corrupted, ignoring it", self.path)
+            return {}
+
+    def load(self, user_id: str) -> Optional[Checkpoint]:
+        with self._lock:
+            data = self._read().get(user_id)
+        if not data:
+            return None
+        return Checkpoint(
+            sync_token=data["sync_token"], sequence_id=data["sequence_id"]
+        )
+
+    def save(self, user_id: str, checkpoint: Optional[Checkpoint]) -> None:
+        with self._lock:
+            self._save(user_id, checkpoint)
+
+    def _save(self, user_id, checkpoint):
+        data = self._read()
+        if checkpoint is None:
+            data.pop(user_id, None)
+        else:
+            data[user_id] = attr.asdict(checkpoint)
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".checkpoint-")
+        try:
+            with os.fdopen(fd, "w") as file:
+                json.dump(data, file)
+                file.flush()
+                os.fsync(file.fileno())
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+
+@attr.s(slots=True, kw_only=kw_only, auto_attribs=True)
+class SQLiteCheckpointStore(CheckpointStore):
+    """Store checkpoints in an SQLite database.
+
+    Useful when many listeners in one process (or many processes) share one store.
+
+    Example:
+        >>> store = fbchat.SQLiteCheckpointStore(path="checkpoints.db")
+    """
+
+    #: Path of the database, or ``":memory:"``
+    path: str
+    _db: sqlite3.Connection = None
+    _lock: threading.Lock = attr.ib(factory=threading.Lock, init=False)
+
+    def __attrs_post_init__(self):
+        # Saves happen in worker threads, the lock keeps them from overlapping
+        self._db = sqlite3.connect(self.path, check_same_thread=False)
+        with self._db:
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS fbchat_checkpoint ("
+                "  user_id TEXT PRIMARY KEY,"
+                "  sync_token TEXT NOT NULL,"
+                "  sequence_id INTEGER NOT NULL"
+                ")"
+            )
+
+    def load(self, user_id: str) -> Optional[Checkpoint]:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT sync_token, sequence_id FROM fbchat_checkpoint WHERE user_id=?",
+                (user_id,),
+            ).fetchone()
+        if row is None:
+            return None
+        return Checkpoint(sync_token=row[0], sequence_id=row[1])
+
+    def save(self, user_id: str, checkpoint: Optional[Checkpoint]) -> None:
+        with self._lock, self._db:
+            if checkpoint is None:
+                self._db.execute(
+                    "DELETE FROM fbchat_checkpoint WHERE user_id=?", (user_id,)
+                )
+            else:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO fbchat_checkpoint"
+                    " (user_id, sync_token, sequence_id) VALUES (?, ?, ?)",
+                    (user_id, checkpoint.sync_token, checkpoint.sequence_id),
+                )
+
+    def close(self) -> None:
+        """Close the database connection."""
+        self._db.close()
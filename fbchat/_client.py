@@ -1,12 +1,57 @@
 from typing import Callable, Optional
+import asyncio
 import datetime
 
 import attr
 
-from ._common import log, req_log, kw_only
-from . import _exception, _util, _graphql, _session, _threads, _models
+from ._common import log, req_log, kw_only, attrs_default
+from . import _exception, _util, _graphql, _session, _threads, _models, _cache
+from ._threads._abc import MESSAGES_BATCH_LIMIT
 
-from typing import Sequence, Iterable, Tuple, Optional, Set, BinaryIO, AsyncIterator
+from typing import (
+    Sequence,
+    Iterable,
+    Tuple,
+    Optional,
+    Set,
+    BinaryIO,
+    AsyncIterator,
+    MutableMapping,
+    Union,
+)
+
+
+@attr.s(slots=True, kw_only=kw_only, auto_attribs=True)
+class BackfillCursor:
+    """Progress of backfilling the messages of a thread with `Client.backfill`.
+
+    The cursors are updated as messages are yielded. Pass them to `Client.backfill`
+    again to continue where it stopped.
+    """
+
+    #: The ID of the thread
+    thread_id: str
+    #: When the oldest message that has been yielded was sent
+    before: Optional[datetime.datetime] = None
+    #: How many messages have been yielded
+    count: int = 0
+    #: Whether all requested messages have been yielded
+    done: bool = False
+
+
+@attrs_default
+class BroadcastResult:
+    """The result of sending a message to one thread with `Client.broadcast`."""
+
+    #: The thread the message was sent to
+    thread: _threads.ThreadABC
+    #: The ID the message was sent with. Pass it to `ThreadABC.send_text` to resend
+    #: the message without risking a duplicate
+    offline_threading_id: str
+    #: The ID of the sent message, if it was sent
+    message_id: Optional[str] = None
+    #: Why the message couldn't be sent, if it wasn't
+    error: Optional[Exception] = None
 
 
 @attr.s(slots=True, kw_only=kw_only, auto_attribs=True)
@@ -24,6 +69,9 @@ class Client:
     #: The session to use when making requests.
     session: _session.Session
     sequence_id_callback: Optional[Callable[[int], None]] = None
+    #: Cache for `Client.fetch_thread_info`. Pass the same cache to `Listener` to
+    #: keep it up to date
+    thread_cache: Optional[_cache.ThreadInfoCache] = None
 
     async def fetch_users(self) -> Sequence[_threads.UserData]:
         """Fetch users the client is currently chatting with.
@@ -277,14 +325,30 @@ class Client:
         log.debug(entries)
         return entries
 
-    async def fetch_thread_info(self, ids: Iterable[str]) -> AsyncIterator[_threads.ThreadABC]:
+    async def fetch_thread_info(
+        self,
+        ids: Iterable[str],
+        batch_size: int = 50,
+        concurrency: int = 4,
+        on_error: Optional[Callable[[str, Exception], None]] = None,
+    ) -> AsyncIterator[_threads.ThreadABC]:
         """Fetch threads' info from IDs, unordered.
 
+        The IDs are fetched in chunks of ``batch_size``, and the threads of each chunk
+        are yielded as soon as it's done.
+
+        If `Client.thread_cache` is set, cached threads are returned without a request.
+
         Warning:
-            Sends two requests if users or pages are present, to fetch all available info!
+            Sends two requests per chunk if users or pages are present, to fetch all
+            available info!
 
         Args:
             ids: Thread ids to query
+            batch_size: Max. number of threads to fetch in one request
+            concurrency: Max. number of chunks to fetch at a time
+            on_error: Called with the thread ID and the error for each thread that
+                couldn't be fetched. If not set, the first error is raised instead.
 
         Example:
             Get data about the user with id "4".
@@ -297,6 +361,65 @@ class Client:
             ids = [ids]
         else:
             ids = list(ids)
+
+        def fetch(ids):
+            return self._fetch_thread_info(ids, batch_size, concurrency, on_error)
+
+        if self.thread_cache is not None:
+            threads = self.thread_cache.get_many(ids, fetch)
+        else:
+            threads = fetch(ids)
+        async for thread in threads:
+            yield thread
+
+    async def _fetch_thread_info(
+        self, ids, batch_size, concurrency, on_error
+    ) -> AsyncIterator[_threads.ThreadABC]:
+        semaphore = asyncio.Semaphore(concurrency)
+        queue = asyncio.Queue()
+
+        async def fetch_chunk(chunk):
+            pending = set(chunk)
+            try:
+                async with semaphore:
+                    async for thread_id, result in self._fetch_thread_info_chunk(chunk):
+                        pending.discard(thread_id)
+                        queue.put_nowait((thread_id, result))
+            except Exception as e:
+                # Report the error for every thread of the chunk that wasn't done
+                for thread_id in chunk:
+                    if thread_id in pending:
+                        queue.put_nowait((thread_id, e))
+            finally:
+                queue.put_nowait(None)
+
+        tasks = [
+            asyncio.ensure_future(fetch_chunk(ids[i : i + batch_size]))
+            for i in range(0, len(ids), batch_size)
+        ]
+        remaining = len(tasks)
+        try:
+            while remaining:
+                item = await queue.get()
+                if item is None:
+                    remaining -= 1
+                    continue
+                thread_id, result = item
+                if not isinstance(result, Exception):
+                    yield result
+                elif on_error is None:
+                    raise result
+                else:
+                    on_error(thread_id, result)
+            # Raise anything that wasn't reported for the threads, e.g. cancellation
+            await asyncio.gather(*tasks)
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def _fetch_thread_info_chunk(
+        self, ids: Sequence[str]
+    ) -> AsyncIterator[Tuple[str, Union[_threads.ThreadABC, Exception]]]:
         queries = []
         for thread_id in ids:
             params = {
@@ -308,43 +431,228 @@ class Client:
             }
             queries.append(_graphql.from_doc_id("2147762685294928", params))
 
-        j = await self.session._graphql_requests(*queries)
-
-        for i, entry in enumerate(j):
-            if entry.get("message_thread") is None:
+        # Groups are yielded as soon as their result arrives, users and pages need
+        # another request once all of the results are in
+        missing = set(range(len(ids)))
+        entries = []
+        async for i, entry in self.session._graphql_stream(
+            *queries, return_errors=True
+        ):
+            missing.discard(i)
+            thread_id = ids[i]
+            if isinstance(entry, Exception):
+                yield thread_id, entry
+            elif entry.get("message_thread") is None:
                 # If you don't have an existing thread with this person, attempt to retrieve user data anyways
-                j[i]["message_thread"] = {
-                    "thread_key": {"other_user_id": ids[i]},
-                    "thread_type": "ONE_TO_ONE",
-                }
+                entries.append(
+                    (
+                        thread_id,
+                        {
+                            "thread_key": {"other_user_id": thread_id},
+                            "thread_type": "ONE_TO_ONE",
+                        },
+                    )
+                )
+            elif entry["message_thread"].get("thread_type") == "GROUP":
+                yield thread_id, _threads.GroupData._from_graphql(
+                    self.session, entry["message_thread"]
+                )
+            else:
+                entries.append((thread_id, entry["message_thread"]))
+
+        for i in sorted(missing):
+            yield ids[i], _exception.ParseError("Missing GraphQL result")
 
         pages_and_user_ids = [
-            k["message_thread"]["thread_key"]["other_user_id"]
-            for k in j
-            if k["message_thread"].get("thread_type") == "ONE_TO_ONE"
+            entry["thread_key"]["other_user_id"]
+            for _, entry in entries
+            if entry.get("thread_type") == "ONE_TO_ONE"
         ]
         pages_and_users = {}
+        pages_and_users_error = None
         if len(pages_and_user_ids) != 0:
-            pages_and_users = await self._fetch_info(*pages_and_user_ids)
-
-        for i, entry in enumerate(j):
-            entry = entry["message_thread"]
-            if entry.get("thread_type") == "GROUP":
-                _id = entry["thread_key"]["thread_fbid"]
-                yield _threads.GroupData._from_graphql(self.session, entry)
-            elif entry.get("thread_type") == "ONE_TO_ONE":
+            try:
+                pages_and_users = await self._fetch_info(*pages_and_user_ids)
+            except _exception.FacebookError as e:
+                pages_and_users_error = e
+
+        for thread_id, entry in entries:
+            if entry.get("thread_type") == "ONE_TO_ONE":
                 _id = entry["thread_key"]["other_user_id"]
-                if pages_and_users.get(_id) is None:
-                    raise _exception.ParseError(
+                if pages_and_users_error:
+                    yield thread_id, pages_and_users_error
+                elif pages_and_users.get(_id) is None:
+                    error = _exception.ParseError(
                         "Could not fetch thread {}".format(_id), data=pages_and_users
                     )
-                entry.update(pages_and_users[_id])
-                if "first_name" in entry:
-                    yield _threads.UserData._from_graphql(self.session, entry)
+                    yield thread_id, error
                 else:
-                    yield _threads.PageData._from_graphql(self.session, entry)
+                    entry.update(pages_and_users[_id])
+                    if "first_name" in entry:
+                        thread = _threads.UserData._from_graphql(self.session, entry)
+                    else:
+                        thread = _threads.PageData._from_graphql(self.session, entry)
+                    yield thread_id, thread
+            else:
+                yield thread_id, _exception.ParseError(
+                    "Unknown thread type", data=entry
+                )
+
+    async def backfill(
+        self,
+        threads: Iterable[_threads.ThreadABC],
+        limit: Optional[int] = None,
+        after: Optional[datetime.datetime] = None,
+        cursors: Optional[MutableMapping[str, BackfillCursor]] = None,
+        concurrency: int = 4,
+        batch_size: int = 10,
+        on_error: Optional[Callable[[str, Exception], None]] = None,
+    ) -> AsyncIterator[Tuple[_threads.ThreadABC, _models.MessageData]]:
+        """Fetch the message history of many threads concurrently.
+
+        Messages are yielded as they arrive, so messages from different threads are
+        interleaved. Messages of the same thread are ordered by last sent first.
+
+        The first pages of up to ``batch_size`` threads are fetched in one request.
+
+        Args:
+            threads: Threads to fetch messages from
+            limit: Max. number of messages to retrieve per thread. If ``None``, all
+                messages will be retrieved.
+            after: Don't retrieve messages sent before this
+            cursors: Progress of each thread, by thread ID. Missing cursors are added,
+                and the cursors are updated as messages are yielded. Pass the same
+                cursors again to resume.
+            concurrency: Max. number of requests to make at a time
+            batch_size: Max. number of threads to fetch the first page of in one request
+            on_error: Called with the thread ID and the error for each thread that
+                couldn't be fetched, while the other threads continue. The thread's
+                cursor isn't done, so it's resumed when the cursors are passed again.
+                If not set, the first error is raised instead.
+
+        Example:
+            >>> cursors = {}
+            >>> async for thread, message in client.backfill(threads, limit=1000,
+            ...                                              cursors=cursors):
+            ...     store(thread, message)
+        """
+        if cursors is None:
+            cursors = {}
+        pending = []
+        for thread in threads:
+            cursor = cursors.setdefault(thread.id, BackfillCursor(thread_id=thread.id))
+            if limit is not None and cursor.count >= limit:
+                cursor.done = True
+            if not cursor.done:
+                pending.append((thread, cursor))
+
+        semaphore = asyncio.Semaphore(concurrency)
+        queue = asyncio.Queue(maxsize=MESSAGES_BATCH_LIMIT * concurrency)
+
+        def get_remaining(cursor):
+            return None if limit is None else max(limit - cursor.count, 0)
+
+        def get_page_limit(remaining, before):
+            if remaining is None:
+                return MESSAGES_BATCH_LIMIT
+            # Make room for the message the previous page ended with
+            return min(remaining + (1 if before else 0), MESSAGES_BATCH_LIMIT)
+
+        async def request(*queries, return_errors=False):
+            async with semaphore:
+                return await self.session._graphql_requests(
+                    *queries, return_errors=return_errors
+                )
+
+        async def backfill_thread(thread, cursor, j, page_limit):
+            before = cursor.before
+            remaining = get_remaining(cursor)
+            try:
+                while True:
+                    if isinstance(j, Exception):
+                        raise j
+                    messages = thread._parse_messages(j)
+                    messages.reverse()
+                    # When continuing, the first message was the last one of the
+                    # previous page
+                    for message in messages[1:] if before else messages:
+                        if remaining == 0 or (after and message.created_at < after):
+                            remaining = 0
+                            break
+                        await queue.put((thread, cursor, message))
+                        if remaining is not None:
+                            remaining -= 1
+                    if remaining == 0 or len(messages) < page_limit:
+                        break  # No more data to fetch
+                    before = messages[-1].created_at
+                    page_limit = get_page_limit(remaining, before)
+                    (j,) = await request(thread._messages_query(page_limit, before))
+            except Exception as e:
+                # Only this thread stops, its cursor is left where it got to
+                await queue.put((thread, cursor, e))
             else:
-                raise _exception.ParseError("Unknown thread type", data=entry)
+                await queue.put((thread, cursor, None))
+
+        async def backfill_batch(batch):
+            page_limits = [
+                get_page_limit(get_remaining(cursor), cursor.before)
+                for _, cursor in batch
+            ]
+            queries = [
+                thread._messages_query(page_limit, cursor.before)
+                for (thread, cursor), page_limit in zip(batch, page_limits)
+            ]
+            # The semaphore is only held during the request, the pages are parsed and
+            # followed up on outside of it
+            try:
+                results = await request(*queries, return_errors=True)
+                if len(results) < len(batch):
+                    raise _exception.ParseError("Missing GraphQL result")
+            except Exception as e:
+                results = [e] * len(batch)
+            await asyncio.gather(
+                *(
+                    backfill_thread(thread, cursor, j, page_limit)
+                    for (thread, cursor), j, page_limit in zip(
+                        batch, results, page_limits
+                    )
+                )
+            )
+
+        async def run(batches):
+            try:
+                await asyncio.gather(*batches)
+            except Exception as e:
+                await queue.put((None, None, e))
+
+        batches = [
+            asyncio.ensure_future(backfill_batch(pending[i : i + batch_size]))
+            for i in range(0, len(pending), batch_size)
+        ]
+        runner = asyncio.ensure_future(run(batches))
+        done_threads = 0
+        try:
+            while done_threads < len(pending):
+                thread, cursor, message = await queue.get()
+                if thread is None:
+                    raise message
+                if message is None:
+                    cursor.done = True
+                    done_threads += 1
+                    continue
+                if isinstance(message, Exception):
+                    done_threads += 1
+                    if on_error is None:
+                        raise message
+                    on_error(thread.id, message)
+                    continue
+                cursor.before = message.created_at
+                cursor.count += 1
+                yield thread, message
+        finally:
+            runner.cancel()
+            for batch in batches:
+                batch.cancel()
 
     async def _fetch_threads(self, limit, before, folders):
         params = {
@@ -552,6 +860,88 @@ class Client:
             for item in j["metadata"]
         ]
 
+    async def broadcast(
+        self,
+        threads: Iterable[_threads.ThreadABC],
+        text: Optional[str] = None,
+        files: Iterable[Tuple[str, BinaryIO, str]] = None,
+        file_ids: Iterable[Tuple[str, str]] = None,
+        concurrency: int = 8,
+    ) -> AsyncIterator[BroadcastResult]:
+        """Send the same message to many threads.
+
+        The files are uploaded once, and the uploaded files are sent to every thread.
+        Each thread gets its own offline threading ID, so failed sends are retried
+        without creating duplicates, see `ThreadABC.send_text`. Sends are rate
+        limited by `Session.rate_limiter`, if it's set.
+
+        Results are yielded as the sends finish. A failed send doesn't stop the
+        others, its error is yielded instead.
+
+        Args:
+            threads: Threads to send the message to
+            text: Text to send
+            files: Files to upload and send, see `Client.upload`
+            file_ids: Already uploaded files to send, see `ThreadABC.send_files`
+            concurrency: Max. number of messages to send at a time
+
+        Example:
+            >>> with open("image.png", "rb") as f:
+            ...     results = client.broadcast(threads, "Hello!",
+            ...                                files=[("image.png", f, "image/png")])
+            ...     async for result in results:
+            ...         if result.error:
+            ...             print(result.thread.id, result.error)
+        """
+        file_ids = list(file_ids or ())
+        if files:
+            file_ids.extend(await self.upload(files))
+        if text is None and not file_ids:
+            raise ValueError("Nothing to send")
+
+        threads = iter(threads)  # Shared by the workers
+        queue = asyncio.Queue()
+
+        async def send(thread):
+            offline_threading_id = _util.generate_offline_threading_id()
+            try:
+                message_id, _ = await thread.send_text(
+                    text, files=file_ids, offline_threading_id=offline_threading_id
+                )
+            except Exception as e:
+                return BroadcastResult(
+                    thread=thread, offline_threading_id=offline_threading_id, error=e
+                )
+            return BroadcastResult(
+                thread=thread,
+                offline_threading_id=offline_threading_id,
+                message_id=message_id,
+            )
+
+        async def worker():
+            try:
+                for thread in threads:
+                    await queue.put(await send(thread))
+            except Exception as e:
+                await queue.put(e)
+            await queue.put(None)
+
+        workers = [asyncio.ensure_future(worker()) for _ in range(concurrency)]
+        done_workers = 0
+        try:
+            while done_workers < len(workers):
+                result = await queue.get()
+                if result is None:
+                    done_workers += 1
+                elif isinstance(result, Exception):
+                    raise result
+                else:
+                    yield result
+        finally:
+            for task in workers:
+                task.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+
     async def mark_as_delivered(self, message: _models.Message):
         """Mark a message as delivered.
 
@@ -0,0 +1,158 @@
+import attr
+import enum
+import struct
+import asyncio
+import tempfile
+from ._common import log, kw_only
+
+from typing import Any, Callable, Iterable, Optional
+
+#: Header of a spilled MQTT message: the topic length and the payload length
+SPILL_HEADER = struct.Struct("!HI")
+
+
+class OverflowPolicy(enum.Enum):
+    """Used to specify what `Listener` does when its event queue is full."""
+
+    #: Never limit the size of the queue
+    UNBOUNDED = "unbounded"
+    #: Stop reading from the MQTT socket until the queue has been drained
+    BLOCK = "block"
+    #: Discard the oldest queued events to make room for new ones
+    DROP_OLDEST = "drop_oldest"
+    #: Write incoming MQTT messages to a temporary file until the queue has been drained
+    SPILL = "spill"
+
+
+@attr.s(slots=True, kw_only=kw_only, auto_attribs=True)
+class QueueStats:
+    """Counters for the event queue of a `Listener`.
+
+    Example:
+        >>> listener.queue_stats.dropped
+        0
+    """
+
+    #: Events that were put into the queue
+    enqueued: int = 0
+    #: Events that were taken out of the queue
+    dequeued: int = 0
+    #: The highest amount of events that have been in the queue at once
+    max_depth: int = 0
+    #: Events that were discarded by `OverflowPolicy.DROP_OLDEST`
+    dropped: int = 0
+    #: MQTT messages that were written to disk by `OverflowPolicy.SPILL`
+    spilled: int = 0
+    #: Spilled MQTT messages that have been read back from disk
+    unspilled: int = 0
+    #: How many times reading was paused by `OverflowPolicy.BLOCK`
+    pauses: int = 0
+
+
+@attr.s(slots=True, kw_only=kw_only, eq=False, auto_attribs=True)
+class EventQueue:
+    """Queue between the MQTT callbacks and `Listener.listen`.
+
+    The underlying queue is unbounded, ``maxsize`` is enforced by ``policy``, since a
+    single MQTT message may contain several events.
+    """
+
+    maxsize: int
+    policy: OverflowPolicy
+    #: Parses a spilled MQTT message (topic and payload) into the items to queue
+    _parse: Callable[[str, bytes], Iterable[Any]]
+    #: Called when reading should be paused/resumed, for `OverflowPolicy.BLOCK`
+    _pause: Callable[[], None]
+    _resume: Callable[[], None]
+    #: Directory for the spill file, if ``None`` the platform default is used
+    _spill_dir: Optional[str] = None
+    stats: QueueStats = attr.ib(factory=QueueStats)
+    paused: bool = False
+    _queue: asyncio.Queue = attr.ib(factory=asyncio.Queue)
+    _spill_file: Any = None
+    _spill_pending: int = 0
+    _spill_offset: int = 0
+
+    def __len__(self) -> int:
+        return self._queue.qsize()
+
+    def _is_full(self) -> bool:
+        return self.maxsize > 0 and self._queue.qsize() >= self.maxsize
+
+    def wants_spill(self) -> bool:
+        """Whether the next MQTT message should be written to disk instead."""
+        if self.policy != OverflowPolicy.SPILL:
+            return False
+        # Once we've started spilling, keep doing so until the spill file has been
+        # read back, otherwise the events would get out of order
+        return self._spill_pending > 0 or self._is_full()
+
+    def spill(self, topic: str, payload: bytes) -> None:
+        if self._spill_file is None:
+            self._spill_file = tempfile.TemporaryFile(dir=self._spill_dir)
+        topic_bytes = topic.encode("utf-8")
+        self._spill_file.seek(0, 2)
+        self._spill_file.write(SPILL_HEADER.pack(len(topic_bytes), len(payload)))
+        self._spill_file.write(topic_bytes)
+        self._spill_file.write(payload)
+        self._spill_pending += 1
+        self.stats.spilled += 1
+
+    def _unspill(self, offset: int) -> int:
+        self._spill_file.seek(offset)
+        topic_len, payload_len = SPILL_HEADER.unpack(
+            self._spill_file.read(SPILL_HEADER.size)
+        )
+        topic = self._spill_file.read(topic_len).decode("utf-8")
+        payload = self._spill_file.read(payload_len)
+        self._spill_pending -= 1
+        self.stats.unspilled += 1
+        for event in self._parse(topic, payload):
+            self.put(event)
+        return self._spill_file.tell()
+
+    def _refill(self) -> None:
+        offset = self._spill_offset
+        while self._spill_pending > 0 and not self._is_full():
+            offset = self._unspill(offset)
+        if self._spill_pending == 0:
+            # Everything has been read back, start over to reclaim the space
+            self._spill_file.seek(0)
+            self._spill_file.truncate()
+            offset = 0
+        self._spill_offset = offset
+
+    def close(self) -> None:
+        """Remove the spill file, discarding the messages that weren't read back."""
+        if self._spill_file is not None:
+            self._spill_file.close()
+            self._spill_file = None
+            self._spill_pending = 0
+            self._spill_offset = 0
+
+    def put(self, event: Any) -> None:
+        self._queue.put_nowait(event)
+        self.stats.enqueued += 1
+        if self.policy == OverflowPolicy.DROP_OLDEST:
+            while self._queue.qsize() > self.maxsize > 0:
+                self._queue.get_nowait()
+                self.stats.dropped += 1
+        self.stats.max_depth = max(self.stats.max_depth, self._queue.qsize())
+        if self.policy == OverflowPolicy.BLOCK and not self.paused and self._is_full():
+            log.debug("Event queue is full, pausing reading")
+            self.paused = True
+            self.stats.pauses += 1
+            self._pause()
+
+    async def get(self) -> Any:
+        while self._queue.empty() and self._spill_pending > 0:
+            self._refill()
+        event = await self._queue.get()
+        self.stats.dequeued += 1
+        # Resume once half of the queue has been drained, to avoid toggling the
+        # reader on and off for every event
+        if self.paused and self._queue.qsize() <= self.maxsize // 2:
+            log.debug("Event queue was drained, resuming reading")
+            self.paused = False
+            self._resume()
+        return event
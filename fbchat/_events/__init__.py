@@ -19,14 +19,14 @@ class Typing(ThreadEvent):
 
     @classmethod
     def _parse_orca(cls, session, data):
-        author = _threads.User(session=session, id=str(data["sender_fbid"]))
+        author = session._intern(_threads.User, str(data["sender_fbid"]))
         status = data["state"] == 1
         return cls(author=author, thread=author, status=status)
 
     @classmethod
     def _parse_thread_typing(cls, session, data):
-        author = _threads.User(session=session, id=str(data["sender_fbid"]))
-        thread = _threads.Group(session=session, id=str(data["thread"]))
+        author = session._intern(_threads.User, str(data["sender_fbid"]))
+        thread = session._intern(_threads.Group, str(data["thread"]))
         status = data["state"] == 1
         return cls(author=author, thread=thread, status=status)
 
@@ -40,7 +40,7 @@ class FriendRequest(Event):
 
     @classmethod
     def _parse(cls, session, data):
-        author = _threads.User(session=session, id=str(data["from"]))
+        author = session._intern(_threads.User, str(data["from"]))
         return cls(author=author)
 
 
@@ -91,15 +91,17 @@ class Disconnect(Event):
     reason: str
 
 
-def parse_events(session, topic, data):
+def parse_events(session, topic, data, delta_classes=None, client_deltas=None):
     # See Mqtt._configure_connect_options for information about these topics
     try:
         if topic == "/t_ms":
             # `deltas` will always be available, since we're filtering out the things
             # that don't have it earlier in the MQTT listener
             for delta in data["deltas"]:
+                if delta_classes is not None and delta["class"] not in delta_classes:
+                    continue
                 if delta["class"] == "ClientPayload":
-                    yield from parse_client_payloads(session, delta)
+                    yield from parse_client_payloads(session, delta, client_deltas)
                     continue
                 try:
                     event = parse_delta(session, delta)
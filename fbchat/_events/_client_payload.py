@@ -1,6 +1,6 @@
 import attr
 import datetime
-from ._common import attrs_event, UnknownEvent, ThreadEvent
+from ._common import attrs_event, UnknownEvent, ThreadEvent, ParserRegistry
 from .. import _exception, _util, _threads, _models
 
 from typing import Optional
@@ -25,7 +25,7 @@ class ReactionEvent(ThreadEvent):
     def _parse(cls, session, data):
         thread = cls._get_thread(session, data)
         return cls(
-            author=_threads.User(session=session, id=str(data["userId"])),
+            author=session._intern(_threads.User, str(data["userId"])),
             thread=thread,
             message=_models.Message(thread=thread, id=data["messageId"]),
             reaction=data["reaction"] if data["action"] == 0 else None,
@@ -40,7 +40,7 @@ class UserStatusEvent(ThreadEvent):
     @classmethod
     def _parse(cls, session, data):
         return cls(
-            author=_threads.User(session=session, id=str(data["actorFbid"])),
+            author=session._intern(_threads.User, str(data["actorFbid"])),
             thread=cls._get_thread(session, data),
             blocked=not data["canViewerReply"],
         )
@@ -59,7 +59,7 @@ class LiveLocationEvent(ThreadEvent):
         thread = cls._get_thread(session, data)
         for location_data in data["messageLiveLocations"]:
             message = _models.Message(thread=thread, id=data["messageId"])
-            author = _threads.User(session=session, id=str(location_data["senderId"]))
+            author = session._intern(_threads.User, str(location_data["senderId"]))
             location = _location.LiveLocationAttachment._from_pull(location_data)
 
         return None
@@ -78,7 +78,7 @@ class UnsendEvent(ThreadEvent):
     def _parse(cls, session, data):
         thread = cls._get_thread(session, data)
         return cls(
-            author=_threads.User(session=session, id=str(data["senderID"])),
+            author=session._intern(_threads.User, str(data["senderID"])),
             thread=thread,
             message=_models.Message(thread=thread, id=data["messageID"]),
             at=_util.millis_to_datetime(data["deletionTimestamp"]),
@@ -99,7 +99,7 @@ class MessageReplyEvent(ThreadEvent):
         metadata = data["message"]["messageMetadata"]
         thread = cls._get_thread(session, metadata)
         return cls(
-            author=_threads.User(session=session, id=str(metadata["actorFbId"])),
+            author=session._intern(_threads.User, str(metadata["actorFbId"])),
             thread=thread,
             message=_models.MessageData._from_reply(thread, data["message"]),
             replied_to=_models.MessageData._from_reply(
@@ -108,27 +108,43 @@ class MessageReplyEvent(ThreadEvent):
         )
 
 
+def _parse_viewer_status(session, data):
+    # TODO: Parse all `reason`
+    if data["reason"] == 2:
+        return UserStatusEvent._parse(session, data)
+    return NotImplemented
+
+
+#: Parsers of the deltas in ``ClientPayload`` deltas, by the key of their data.
+#: Parsers are called with the data under the key, and may return ``NotImplemented``
+#: to make the whole delta an `UnknownEvent`
+CLIENT_DELTA_PARSERS = ParserRegistry(source="client payload")
+CLIENT_DELTA_PARSERS.register("deltaMessageReaction", ReactionEvent._parse)
+CLIENT_DELTA_PARSERS.register("deltaChangeViewerStatus", _parse_viewer_status)
+CLIENT_DELTA_PARSERS.register("liveLocationData", LiveLocationEvent._parse)
+CLIENT_DELTA_PARSERS.register("deltaRecallMessageData", UnsendEvent._parse)
+CLIENT_DELTA_PARSERS.register("deltaMessageReply", MessageReplyEvent._parse)
+
+
 def parse_client_delta(session, data):
-    if "deltaMessageReaction" in data:
-        return ReactionEvent._parse(session, data["deltaMessageReaction"])
-    elif "deltaChangeViewerStatus" in data:
-        # TODO: Parse all `reason`
-        if data["deltaChangeViewerStatus"]["reason"] == 2:
-            return UserStatusEvent._parse(session, data["deltaChangeViewerStatus"])
-    elif "liveLocationData" in data:
-        return LiveLocationEvent._parse(session, data["liveLocationData"])
-    elif "deltaRecallMessageData" in data:
-        return UnsendEvent._parse(session, data["deltaRecallMessageData"])
-    elif "deltaMessageReply" in data:
-        return MessageReplyEvent._parse(session, data["deltaMessageReply"])
-    return UnknownEvent(source="client payload", data=data)
-
-
-def parse_client_payloads(session, data):
-    payload = _util.parse_json("".join(chr(z) for z in data["payload"]))
+    # If a delta has several known keys, the one registered first is parsed
+    for key in CLIENT_DELTA_PARSERS:
+        if key in data:
+            event = CLIENT_DELTA_PARSERS.parse(session, key, data[key])
+            if event is NotImplemented:
+                return UnknownEvent(source=CLIENT_DELTA_PARSERS.source, data=data)
+            return event
+    return CLIENT_DELTA_PARSERS.parse(session, next(iter(data), ""), data)
+
+
+def parse_client_payloads(session, data, client_deltas=None):
+    # The payload is a list of the bytes of UTF-8 encoded JSON
+    payload = _util.parse_json(bytes(data["payload"]))
 
     try:
         for delta in payload["deltas"]:
+            if client_deltas is not None and client_deltas.isdisjoint(delta):
+                continue
             yield parse_client_delta(session, delta)
     except _exception.ParseError:
         raise
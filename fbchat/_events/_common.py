@@ -1,8 +1,11 @@
 import attr
+import collections
 from .._common import kw_only
 from .. import _exception, _util, _threads
 
-from typing import Any
+from typing import Any, Callable, Dict, Iterator, Optional
+
+ParserFunc = Callable[[Any, Any], Optional["Event"]]
 
 #: Default attrs settings for events
 attrs_event = attr.s(slots=True, kw_only=kw_only, auto_attribs=True)
@@ -18,9 +21,9 @@ class Event:
         key = data["threadKey"]
 
         if "threadFbId" in key:
-            return _threads.Group(session=session, id=str(key["threadFbId"]))
+            return session._intern(_threads.Group, str(key["threadFbId"]))
         elif "otherUserFbId" in key:
-            return _threads.User(session=session, id=str(key["otherUserFbId"]))
+            return session._intern(_threads.User, str(key["otherUserFbId"]))
         raise _exception.ParseError("Could not find thread data", data=data)
 
 
@@ -50,13 +53,72 @@ class ThreadEvent(Event):
     @classmethod
     def _parse_metadata(cls, session, data):
         metadata = data["messageMetadata"]
-        author = _threads.User(session=session, id=metadata["actorFbId"])
+        author = session._intern(_threads.User, metadata["actorFbId"])
         thread = cls._get_thread(session, metadata)
         at = _util.millis_to_datetime(int(metadata["timestamp"]))
         return author, thread, at
 
     @classmethod
     def _parse_fetch(cls, session, data):
-        author = _threads.User(session=session, id=data["message_sender"]["id"])
+        author = session._intern(_threads.User, data["message_sender"]["id"])
         at = _util.millis_to_datetime(int(data["timestamp_precise"]))
         return author, at
+
+
+@attr.s(slots=True, kw_only=kw_only, eq=False, auto_attribs=True)
+class ParserRegistry:
+    """Maps the keys of deltas (like their class) to the functions that parse them.
+
+    A parser is called with the session and the delta, and returns an `Event`, or
+    ``None`` to skip the delta. Deltas without a parser become `UnknownEvent`.
+
+    Example:
+        Parse a delta that's currently an `UnknownEvent`.
+
+        >>> @fbchat.DELTA_PARSERS.register("MessageEdit")
+        ... def parse_edit(session, data):
+        ...     return MyEditEvent(...)
+        >>> fbchat.DELTA_PARSERS.hits.most_common(2)
+        [('NewMessage', 1234), ('ReadReceipt', 567)]
+    """
+
+    #: Where the deltas come from, used as the source of `UnknownEvent`
+    source: str
+    #: Number of deltas seen, by key. Keys without a parser are counted too
+    hits: "collections.Counter[str]" = attr.ib(factory=collections.Counter)
+    _parsers: Dict[str, ParserFunc] = attr.ib(factory=dict)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._parsers
+
+    def __iter__(self) -> Iterator[str]:
+        """Iterate over the keys that have a parser, in the order they were registered."""
+        return iter(self._parsers)
+
+    def register(self, key: str, parser: Optional[ParserFunc] = None):
+        """Set the parser of a key, replacing the existing one.
+
+        Can be used as a decorator, by leaving out ``parser``.
+        """
+        if parser is None:
+
+            def decorator(parser):
+                self._parsers[key] = parser
+                return parser
+
+            return decorator
+        self._parsers[key] = parser
+        return parser
+
+    def unregister(self, key: str) -> None:
+        """Remove the parser of a key, so its deltas become `UnknownEvent`."""
+        self._parsers.pop(key, None)
+
+    def parse(self, session, key: str, data: Any) -> Optional[Event]:
+        """Parse a delta with the parser of the key."""
+        self.hits[key] += 1
+        try:
+            parser = self._parsers[key]
+        except KeyError:
+            return UnknownEvent(source=self.source, data=data)
+        return parser(session, data)
@@ -1,6 +1,6 @@
 import attr
 import datetime
-from ._common import attrs_event, Event, UnknownEvent, ThreadEvent
+from ._common import attrs_event, Event, UnknownEvent, ThreadEvent, ParserRegistry
 from . import _delta_type
 from .. import _util, _threads, _models
 
@@ -24,7 +24,7 @@ class PeopleAdded(ThreadEvent):
         author, thread, at = cls._parse_metadata(session, data)
         added = [
             # TODO: Parse user name
-            _threads.User(session=session, id=x["userFbId"])
+            session._intern(_threads.User, x["userFbId"])
             for x in data["addedParticipants"]
         ]
         return cls(author=author, thread=thread, added=added, at=at)
@@ -45,7 +45,7 @@ class PersonRemoved(ThreadEvent):
     @classmethod
     def _parse(cls, session, data):
         author, thread, at = cls._parse_metadata(session, data)
-        removed = _threads.User(session=session, id=data["leftParticipantFbId"])
+        removed = session._intern(_threads.User, data["leftParticipantFbId"])
         return cls(author=author, thread=thread, removed=removed, at=at)
 
 
@@ -104,7 +104,7 @@ class MessagesDelivered(ThreadEvent):
     def _parse(cls, session, data):
         thread = cls._get_thread(session, data)
         if "actorFbId" in data:
-            author = _threads.User(session=session, id=data["actorFbId"])
+            author = session._intern(_threads.User, data["actorFbId"])
         else:
             author = thread
         messages = [_models.Message(thread=thread, id=x) for x in data["messageIds"]]
@@ -125,7 +125,7 @@ class ThreadsRead(Event):
 
     @classmethod
     def _parse_read_receipt(cls, session, data):
-        author = _threads.User(session=session, id=data["actorFbId"])
+        author = session._intern(_threads.User, data["actorFbId"])
         thread = cls._get_thread(session, data)
         at = _util.millis_to_datetime(int(data["actionTimestampMs"]))
         return cls(author=author, threads=[thread], at=at)
@@ -179,36 +179,33 @@ class ThreadFolder(Event):
         return cls(thread=thread, folder=folder)
 
 
+def _parse_mark_folder_seen(session, data):
+    # TODO: Finish this
+    folders = [_models.ThreadLocation._parse(folder) for folder in data["folders"]]
+    at = _util.millis_to_datetime(int(data["timestamp"]))
+    return None
+
+
+def _parse_client_payload(session, data):
+    raise ValueError("This is implemented in `parse_events`")
+
+
+#: Parsers of deltas on ``/t_ms``, by their ``class``
+DELTA_PARSERS = ParserRegistry(source="Delta class")
+DELTA_PARSERS.register("AdminTextMessage", _delta_type.parse_admin_message)
+DELTA_PARSERS.register("ParticipantsAddedToGroupThread", PeopleAdded._parse)
+DELTA_PARSERS.register("ParticipantLeftGroupThread", PersonRemoved._parse)
+DELTA_PARSERS.register("MarkFolderSeen", _parse_mark_folder_seen)
+DELTA_PARSERS.register("ThreadName", TitleSet._parse)
+DELTA_PARSERS.register("ForcedFetch", UnfetchedThreadEvent._parse)
+DELTA_PARSERS.register("DeliveryReceipt", MessagesDelivered._parse)
+DELTA_PARSERS.register("ReadReceipt", ThreadsRead._parse_read_receipt)
+DELTA_PARSERS.register("MarkRead", ThreadsRead._parse)
+DELTA_PARSERS.register("NoOp", lambda session, data: None)  # Skip "no operation" events
+DELTA_PARSERS.register("NewMessage", MessageEvent._parse)
+DELTA_PARSERS.register("ThreadFolder", ThreadFolder._parse)
+DELTA_PARSERS.register("ClientPayload", _parse_client_payload)
+
+
 def parse_delta(session, data):
-    class_ = data["class"]
-    if class_ == "AdminTextMessage":
-        return _delta_type.parse_admin_message(session, data)
-    elif class_ == "ParticipantsAddedToGroupThread":
-        return PeopleAdded._parse(session, data)
-    elif class_ == "ParticipantLeftGroupThread":
-        return PersonRemoved._parse(session, data)
-    elif class_ == "MarkFolderSeen":
-        # TODO: Finish this
-        folders = [_models.ThreadLocation._parse(folder) for folder in data["folders"]]
-        at = _util.millis_to_datetime(int(data["timestamp"]))
-        return None
-    elif class_ == "ThreadName":
-        return TitleSet._parse(session, data)
-    elif class_ == "ForcedFetch":
-        return UnfetchedThreadEvent._parse(session, data)
-    elif class_ == "DeliveryReceipt":
-        return MessagesDelivered._parse(session, data)
-    elif class_ == "ReadReceipt":
-        return ThreadsRead._parse_read_receipt(session, data)
-    elif class_ == "MarkRead":
-        return ThreadsRead._parse(session, data)
-    elif class_ == "NoOp":
-        # Skip "no operation" events
-        return None
-    elif class_ == "NewMessage":
-        return MessageEvent._parse(session, data)
-    elif class_ == "ThreadFolder":
-        return ThreadFolder._parse(session, data)
-    elif class_ == "ClientPayload":
-        raise ValueError("This is implemented in `parse_events`")
-    return UnknownEvent(source="Delta class", data=data)
+    return DELTA_PARSERS.parse(session, data["class"], data)
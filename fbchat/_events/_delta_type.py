@@ -1,6 +1,6 @@
 import attr
 import datetime
-from ._common import attrs_event, Event, UnknownEvent, ThreadEvent
+from ._common import attrs_event, Event, UnknownEvent, ThreadEvent, ParserRegistry
 from .. import _util, _threads, _models
 
 from typing import Sequence, Optional
@@ -73,7 +73,7 @@ class AdminsAdded(ThreadEvent):
     @classmethod
     def _parse(cls, session, data):
         author, thread, at = cls._parse_metadata(session, data)
-        subject = _threads.User(session=session, id=data["untypedData"]["TARGET_ID"])
+        subject = session._intern(_threads.User, data["untypedData"]["TARGET_ID"])
         return cls(author=author, thread=thread, added=[subject], at=at)
 
 
@@ -89,7 +89,7 @@ class AdminsRemoved(ThreadEvent):
     @classmethod
     def _parse(cls, session, data):
         author, thread, at = cls._parse_metadata(session, data)
-        subject = _threads.User(session=session, id=data["untypedData"]["TARGET_ID"])
+        subject = session._intern(_threads.User, data["untypedData"]["TARGET_ID"])
         return cls(author=author, thread=thread, removed=[subject], at=at)
 
 
@@ -280,52 +280,51 @@ class PlanResponded(ThreadEvent):
         return cls(author=author, thread=thread, plan=plan, take_part=take_part, at=at)
 
 
+def _parse_admins_changed(session, data):
+    event_type = data["untypedData"]["ADMIN_EVENT"]
+    if event_type == "add_admin":
+        return AdminsAdded._parse(session, data)
+    elif event_type == "remove_admin":
+        return AdminsRemoved._parse(session, data)
+    return UnknownEvent(source=ADMIN_MESSAGE_PARSERS.source, data=data)
+
+
+def _parse_call_log(session, data):
+    event_type = data["untypedData"]["event"]
+    if event_type == "group_call_started":
+        return CallStarted._parse(session, data)
+    elif event_type in ["group_call_ended", "one_on_one_call_ended"]:
+        return CallEnded._parse(session, data)
+    return UnknownEvent(source=ADMIN_MESSAGE_PARSERS.source, data=data)
+
+
+def _parse_group_poll(session, data):
+    event_type = data["untypedData"]["event_type"]
+    if event_type == "question_creation":
+        return PollCreated._parse(session, data)
+    elif event_type == "update_vote":
+        return PollVoted._parse(session, data)
+    return UnknownEvent(source=ADMIN_MESSAGE_PARSERS.source, data=data)
+
+
+#: Parsers of ``AdminTextMessage`` deltas, by their ``type``
+ADMIN_MESSAGE_PARSERS = ParserRegistry(source="Delta type")
+ADMIN_MESSAGE_PARSERS.register("change_thread_theme", ColorSet._parse)
+ADMIN_MESSAGE_PARSERS.register("change_thread_icon", EmojiSet._parse)
+ADMIN_MESSAGE_PARSERS.register("change_thread_nickname", NicknameSet._parse)
+ADMIN_MESSAGE_PARSERS.register("change_thread_admins", _parse_admins_changed)
+ADMIN_MESSAGE_PARSERS.register("change_thread_approval_mode", ApprovalModeSet._parse)
+# TODO: instant_game_update
+# Previously "rtc_call_log"
+ADMIN_MESSAGE_PARSERS.register("messenger_call_log", _parse_call_log)
+ADMIN_MESSAGE_PARSERS.register("participant_joined_group_call", CallJoined._parse)
+ADMIN_MESSAGE_PARSERS.register("group_poll", _parse_group_poll)
+ADMIN_MESSAGE_PARSERS.register("lightweight_event_create", PlanCreated._parse)
+ADMIN_MESSAGE_PARSERS.register("lightweight_event_notify", PlanEnded._parse)
+ADMIN_MESSAGE_PARSERS.register("lightweight_event_update", PlanEdited._parse)
+ADMIN_MESSAGE_PARSERS.register("lightweight_event_delete", PlanDeleted._parse)
+ADMIN_MESSAGE_PARSERS.register("lightweight_event_rsvp", PlanResponded._parse)
+
+
 def parse_admin_message(session, data):
-    type_ = data["type"]
-    if type_ == "change_thread_theme":
-        return ColorSet._parse(session, data)
-    elif type_ == "change_thread_icon":
-        return EmojiSet._parse(session, data)
-    elif type_ == "change_thread_nickname":
-        return NicknameSet._parse(session, data)
-    elif type_ == "change_thread_admins":
-        event_type = data["untypedData"]["ADMIN_EVENT"]
-        if event_type == "add_admin":
-            return AdminsAdded._parse(session, data)
-        elif event_type == "remove_admin":
-            return AdminsRemoved._parse(session, data)
-        else:
-            pass
-    elif type_ == "change_thread_approval_mode":
-        return ApprovalModeSet._parse(session, data)
-    elif type_ == "instant_game_update":
-        pass  # TODO: This
-    elif type_ == "messenger_call_log":  # Previously "rtc_call_log"
-        event_type = data["untypedData"]["event"]
-        if event_type == "group_call_started":
-            return CallStarted._parse(session, data)
-        elif event_type in ["group_call_ended", "one_on_one_call_ended"]:
-            return CallEnded._parse(session, data)
-        else:
-            pass
-    elif type_ == "participant_joined_group_call":
-        return CallJoined._parse(session, data)
-    elif type_ == "group_poll":
-        event_type = data["untypedData"]["event_type"]
-        if event_type == "question_creation":
-            return PollCreated._parse(session, data)
-        elif event_type == "update_vote":
-            return PollVoted._parse(session, data)
-        else:
-            pass
-    elif type_ == "lightweight_event_create":
-        return PlanCreated._parse(session, data)
-    elif type_ == "lightweight_event_notify":
-        return PlanEnded._parse(session, data)
-    elif type_ == "lightweight_event_update":
-        return PlanEdited._parse(session, data)
-    elif type_ == "lightweight_event_delete":
-        return PlanDeleted._parse(session, data)
-    elif type_ == "lightweight_event_rsvp":
-        return PlanResponded._parse(session, data)
-    return UnknownEvent(source="Delta type", data=data)
+    return ADMIN_MESSAGE_PARSERS.parse(session, data["type"], data)
@@ -174,6 +174,9 @@ def handle_http_error(code):
 
 
 def handle_requests_error(e):
+    if isinstance(e, (aiohttp.ServerTimeoutError, asyncio.TimeoutError)):
+        # Set with ConnectionOptions
+        raise HTTPError("Request timed out") from e
     if isinstance(e, (aiohttp.ClientConnectionError, aiohttp.ServerConnectionError)):
         raise HTTPError("Connection error") from e
     if isinstance(e, aiohttp.ClientResponseError):
@@ -182,7 +185,4 @@ def handle_requests_error(e):
         pass  # Should never happen, we always prove valid URLs
     if isinstance(e, aiohttp.TooManyRedirects):
         pass  # TODO: Consider using allow_redirects=False to prevent this
-    if isinstance(e, (aiohttp.ServerTimeoutError, asyncio.TimeoutError)):
-        pass  # Should never happen, we don't set timeouts
-
     raise HTTPError("Requests error") from e
@@ -1,8 +1,22 @@
+import attr
 import json
+import logging
 import re
-from ._common import log
+import asyncio
+from ._common import log, kw_only
 from . import _util, _exception
 
+from typing import (
+    Any,
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+)
+
 # Shameless copy from https://stackoverflow.com/a/8730674
 FLAGS = re.VERBOSE | re.MULTILINE | re.DOTALL
 WHITESPACE = re.compile(r"[ \t\n\r]*", FLAGS)
@@ -24,6 +38,95 @@ class ConcatJSONDecoder(json.JSONDecoder):
 # End shameless copy
 
 
+WHITESPACE_BYTES = re.compile(rb"[ \t\n\r]*")
+_decoder = json.JSONDecoder()
+
+
+def _fast_loads():
+    loads = _util._json_loads
+    if loads is json.loads:
+        return None
+    if _util.orjson is not None and loads is _util.orjson.loads:
+        return loads  # Parses memoryviews, so slicing doesn't copy the data
+    return lambda chunk: loads(bytes(chunk))
+
+
+def iter_json_objects(data, start=0):
+    """Decode JSON objects that are concatenated in the data, one at a time.
+
+    With a fast JSON decoder, bytes are cut at line breaks (Facebook puts each
+    object on its own line) and decoded without copying. Whatever can't be decoded
+    that way is decoded with the standard library, which doesn't need line breaks.
+    """
+    try:
+        if isinstance(data, bytes):
+            view = memoryview(data)
+            loads = _fast_loads()
+            while loads is not None:
+                start = WHITESPACE_BYTES.match(data, start).end()
+                if start == len(data):
+                    return
+                end = data.find(b"\n", start)
+                if end == -1:
+                    end = len(data)
+                try:
+                    obj = loads(view[start:end])
+                except ValueError:
+                    break
+                yield obj
+                start = end + 1
+            data = str(view[start:], "utf-8")
+            start = 0
+        while True:
+            start = WHITESPACE.match(data, start).end()
+            if start == len(data):
+                return
+            obj, start = _decoder.raw_decode(data, start)
+            yield obj
+    except ValueError as e:
+        raise _exception.ParseError("Error while parsing JSON", data=data) from e
+
+
+async def iter_json_stream(stream):
+    """Decode JSON objects that are concatenated in a stream, as they arrive.
+
+    Objects are decoded as soon as their line is complete, so they're yielded
+    before the rest of the response has been received, and decoded lines are
+    dropped from the buffer. Responses that aren't split into lines are decoded
+    with `iter_json_objects` once the stream ends.
+    """
+    buffer = bytearray()
+    pos = None  # None until the start of the JSON (after the cruft) has been seen
+    by_line = True
+    async for chunk in stream.iter_any():
+        buffer += chunk
+        if pos is None:
+            pos = buffer.find(b"{")
+            if pos == -1:
+                pos = None
+                continue
+        while by_line:
+            end = buffer.find(b"\n", pos)
+            if end == -1:
+                break
+            line = bytes(buffer[pos:end])
+            if line.strip():
+                try:
+                    obj = _util.parse_json(line)
+                except _exception.ParseError:
+                    by_line = False  # Probably a multi-line object
+                    break
+                yield obj
+            pos = end + 1
+        if by_line:
+            del buffer[:pos]
+            pos = 0
+    if pos is None:
+        raise _exception.ParseError("No JSON object found", data=bytes(buffer))
+    for obj in iter_json_objects(bytes(buffer), start=pos):
+        yield obj
+
+
 def queries_to_json(*queries):
     """
     Queries should be a list of GraphQL objects
@@ -34,33 +137,162 @@ def queries_to_json(*queries):
     return _util.json_minimal(rtn)
 
 
-def response_to_json(text):
-    text = _util.strip_json_cruft(text)  # Usually only needed in some error cases
+def _parse_result(x, return_errors):
+    """Get the query index and result of a response object, if it has one."""
+    if "error_results" in x:
+        return None
+    _exception.handle_payload_error(x)
+    [(key, value), *rest] = x.items()
+    if len(rest) > 0:
+        log.warning("GraphQL payload has more than one entry: %s", x)
     try:
-        j = json.loads(text, cls=ConcatJSONDecoder)
-    except Exception as e:
-        raise _exception.ParseError("Error while parsing JSON", data=text) from e
-
-    rtn = [None] * (len(j))
-    for x in j:
-        if "error_results" in x:
-            del rtn[-1]
-            continue
-        _exception.handle_payload_error(x)
-        [(key, value), *rest] = x.items()
-        if len(rest) > 0:
-            log.warning("GraphQL payload has more than one entry: %s", x)
         _exception.handle_graphql_errors(value)
-        if "response" in value:
-            rtn[int(key[1:])] = value["response"]
-        else:
-            rtn[int(key[1:])] = value["data"]
+    except _exception.GraphQLError as e:
+        if not return_errors:
+            raise
+        return int(key[1:]), e
+    if "response" in value:
+        return int(key[1:]), value["response"]
+    return int(key[1:]), value["data"]
+
 
-    log.debug(rtn)
+def response_to_json(text, return_errors=False, count=None):
+    """Parse a ``/api/graphqlbatch/`` response into a list of results, in query order.
+
+    If ``return_errors`` is set, GraphQL errors are returned in place of the results
+    they belong to, instead of being raised.
+
+    If the number of queries is given as ``count``, parsing stops as soon as all of
+    them have been seen.
+    """
+    # The cruft is usually only there in some error cases
+    objects = iter_json_objects(text, start=_util.find_json_start(text))
+    if count is None:
+        objects = list(objects)
+        count = sum(1 for x in objects if "error_results" not in x)
+
+    rtn = [None] * count
+    seen = 0
+    for x in objects:
+        result = _parse_result(x, return_errors)
+        if result is None:
+            continue
+        index, rtn[index] = result
+        seen += 1
+        if seen == count:
+            break
+
+    if log.isEnabledFor(logging.DEBUG):
+        log.debug(rtn)
 
     return rtn
 
 
+@attr.s(slots=True, kw_only=kw_only, eq=False, auto_attribs=True)
+class GraphQLBatcher:
+    """Coalesce GraphQL queries from concurrent callers into shared batch requests.
+
+    Queries are collected for ``window`` seconds, or until ``max_batch_size`` queries
+    are waiting, and then sent in one ``/api/graphqlbatch/`` request.
+    """
+
+    #: Sends a batch of queries, and returns the results with errors in place
+    _send: Callable[..., Awaitable[Sequence[Any]]]
+    #: How long to wait for more queries before sending a batch, in seconds
+    window: float = 0.005
+    #: How many queries to send in one request at most
+    max_batch_size: int = 50
+    #: How many batch requests have been sent
+    requests_sent: int = 0
+    #: How many queries have been sent in total
+    queries_sent: int = 0
+    _pending: List[Tuple[Any, asyncio.Future]] = attr.ib(factory=list)
+    _timer: Optional[asyncio.TimerHandle] = None
+
+    def _enqueue(self, queries) -> List[asyncio.Future]:
+        loop = asyncio.get_event_loop()
+        futures = []
+        for query in queries:
+            future = loop.create_future()
+            self._pending.append((query, future))
+            futures.append(future)
+            if len(self._pending) >= self.max_batch_size:
+                self._flush()
+        if self._pending and self._timer is None:
+            self._timer = loop.call_later(self.window, self._flush)
+        return futures
+
+    async def request(self, *queries, return_errors=False) -> List[Any]:
+        futures = self._enqueue(queries)
+        results = await asyncio.gather(*futures, return_exceptions=True)
+        for result in results:
+            if isinstance(result, Exception):
+                if return_errors and isinstance(result, _exception.GraphQLError):
+                    continue  # Returned in place of the result, like response_to_json
+                raise result
+        return results
+
+    async def stream(
+        self, *queries, return_errors=False
+    ) -> AsyncIterator[Tuple[int, Any]]:
+        """Like `GraphQLBatcher.request`, but yield ``(index, result)`` pairs.
+
+        Results are yielded as soon as the batch they were sent in is done.
+        """
+        futures = self._enqueue(queries)
+        indexes = {future: i for i, future in enumerate(futures)}
+        pending = set(futures)
+        try:
+            while pending:
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+                for future in sorted(done, key=indexes.__getitem__):
+                    error = future.exception()
+                    if error is None:
+                        yield indexes[future], future.result()
+                    elif return_errors and isinstance(error, _exception.GraphQLError):
+                        yield indexes[future], error
+                    else:
+                        raise error
+        finally:
+            # Results that nobody is waiting for are skipped in _send_batch
+            for future in futures:
+                if not future.cancel() and not future.cancelled():
+                    future.exception()  # Mark errors that weren't raised as retrieved
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if batch:
+            asyncio.ensure_future(self._send_batch(batch))
+
+    async def _send_batch(self, batch) -> None:
+        self.requests_sent += 1
+        self.queries_sent += len(batch)
+        try:
+            results = await self._send(*(query for query, _ in batch))
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for i, (_, future) in enumerate(batch):
+            if future.done():
+                continue  # The caller was cancelled
+            result = results[i] if i < len(results) else None
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            elif result is None:
+                future.set_exception(
+                    _exception.ParseError("Missing GraphQL result", data=results)
+                )
+            else:
+                future.set_result(result)
+
+
 def from_query(query, params):
     return {"priority": 0, "q": query, "query_params": params}
 
@@ -4,10 +4,21 @@ import paho.mqtt.client
 import urllib.request
 import asyncio
 import aiohttp
+import ssl
+import collections
 from ._common import log, kw_only
-from . import _util, _exception, _session, _events
-
-from typing import AsyncGenerator, Optional, List
+from . import (
+    _util,
+    _exception,
+    _session,
+    _events,
+    _event_queue,
+    _mqtt,
+    _checkpoint,
+    _cache,
+)
+
+from typing import AsyncGenerator, Optional, List, Union, Iterable, FrozenSet, Deque
 
 from yarl import URL
 
@@ -53,6 +64,18 @@ TOPICS = [
     "/webrtc_response",
 ]
 
+#: How often (in seconds) the MQTT client's housekeeping is run while listening
+MISC_INTERVAL = 1
+
+
+def _topic_set(topics: Optional[Iterable[str]]) -> Optional[FrozenSet[str]]:
+    # /t_ms is needed for the sequence ID, even if no events from it are wanted
+    return None if topics is None else frozenset({"/t_ms", *topics})
+
+
+def _optional_set(values: Optional[Iterable[str]]) -> Optional[FrozenSet[str]]:
+    return None if values is None else frozenset(values)
+
 
 def get_cookie_header(session: aiohttp.ClientSession, url: str) -> str:
     """Extract a cookie header from a requests session."""
@@ -65,7 +88,9 @@ def generate_session_id() -> int:
     return random.randint(1, 2 ** 53)
 
 
-def mqtt_factory(domain: str) -> paho.mqtt.client.Client:
+def mqtt_factory(
+    domain: str, ssl_context: Optional[ssl.SSLContext] = None
+) -> paho.mqtt.client.Client:
     # Configure internal MQTT handler
     mqtt = paho.mqtt.client.Client(
         client_id="mqttwsclient",
@@ -93,7 +118,10 @@ def mqtt_factory(domain: str) -> paho.mqtt.client.Client:
     # mqtt.max_queued_messages_set(0)  # Unlimited messages can be queued
     # mqtt.message_retry_set(20)  # Retry sending for at least 20 seconds
     # mqtt.reconnect_delay_set(min_delay=1, max_delay=120)
-    mqtt.tls_set()
+    if ssl_context:
+        mqtt.tls_set_context(ssl_context)
+    else:
+        mqtt.tls_set()
     mqtt.connect_async(f"edge-chat.{domain}", 443, keepalive=10)
     return mqtt
 
@@ -108,25 +136,104 @@ class Listener:
         session: The session to use when making requests.
         chat_on: Whether ...
         foreground: Whether ...
+        queue_size: How many events may be waiting to be yielded by `listen`. ``0``
+            means unlimited.
+        overflow: What to do with incoming events when the queue is full
+        spill_dir: Where to write the spill file for `OverflowPolicy.SPILL`
+        transport: ``"paho"`` to use paho-mqtt, or ``"aiohttp"`` to connect with the
+            session's own aiohttp client, sharing its connector, proxy and cookies
+        checkpoint_store: Where to persist the sync token and sequence ID, so that a
+            restarted listener can continue where the previous one stopped
+        checkpoint_interval: How many deltas to receive between checkpoints
+        thread_cache: A cache to update from the received events, usually the same one
+            `Client` uses
+        ssl_context: SSL context for the paho transport, instead of creating a new one
+        topics: Topics to subscribe to, out of `TOPICS`. ``None`` subscribes to all of
+            them. ``/t_ms`` is always subscribed to, since it's needed for tracking the
+            sequence ID.
+        delta_classes: Classes of the ``/t_ms`` deltas to parse into events, like
+            ``"NewMessage"`` or ``"ClientPayload"``, see `DELTA_PARSERS`. ``None``
+            parses all of them.
+        client_deltas: Keys of the deltas in ``ClientPayload`` to parse into events,
+            like ``"deltaMessageReaction"``, see `CLIENT_DELTA_PARSERS`. ``None``
+            parses all of them.
 
     Example:
         >>> listener = fbchat.Listener(session, chat_on=True, foreground=True)
+
+        Only receive messages and reactions.
+
+        >>> listener = fbchat.Listener(
+        ...     session, chat_on=False, foreground=False, topics=[],
+        ...     delta_classes=["NewMessage", "ClientPayload"],
+        ...     client_deltas=["deltaMessageReaction"],
+        ... )
     """
 
     session: _session.Session
     _chat_on: bool
     _foreground: bool
     _loop: asyncio.AbstractEventLoop = attr.ib(factory=asyncio.get_event_loop)
-    _mqtt: paho.mqtt.client.Client = None
+    _mqtt: "Union[paho.mqtt.client.Client, _mqtt.WebsocketMQTT]" = None
     _disconnect_error: Optional[Exception] = None
     _sync_token: Optional[str] = None
     _sequence_id: Optional[int] = None
+    #: The sequence ID of the last message whose events have all been yielded
+    _checkpoint_sequence_id: Optional[int] = None
+    #: Incremented when the sync queue is replaced, so that the sequence IDs of the
+    #: messages that were queued before that aren't checkpointed
+    _generation: int = 0
+    #: The generations of the spilled messages, in the order they were spilled
+    _spilled_generations: Deque[int] = attr.ib(factory=collections.deque)
+    _checkpoint_write: Optional[asyncio.Future] = None
     _sequence_id_wait: Optional[asyncio.Future] = None
     _tmp_events: List[_events.Event] = attr.ib(factory=list)
-    _message_queue: asyncio.Queue = attr.ib(factory=lambda: asyncio.Queue(maxsize=64))
+    _queue_size: int = 64
+    _overflow: _event_queue.OverflowPolicy = _event_queue.OverflowPolicy.BLOCK
+    _spill_dir: Optional[str] = None
+    _message_queue: _event_queue.EventQueue = None
+    _transport: str = "paho"
+    _checkpoint_store: Optional[_checkpoint.CheckpointStore] = None
+    _checkpoint_interval: int = 100
+    _deltas_since_checkpoint: int = 0
+    _thread_cache: Optional[_cache.ThreadInfoCache] = None
+    _ssl_context: Optional[ssl.SSLContext] = None
+    _topics: Optional[FrozenSet[str]] = attr.ib(default=None, converter=_topic_set)
+    _delta_classes: Optional[FrozenSet[str]] = attr.ib(
+        default=None, converter=_optional_set
+    )
+    _client_deltas: Optional[FrozenSet[str]] = attr.ib(
+        default=None, converter=_optional_set
+    )
 
     def __attrs_post_init__(self):
-        self._mqtt = mqtt_factory(self.session.domain)
+        if self._checkpoint_store:
+            checkpoint = self._checkpoint_store.load(self.session.user.id)
+            if checkpoint:
+                log.debug("Resuming from checkpoint %s", checkpoint)
+                self._sync_token = checkpoint.sync_token
+                self._sequence_id = checkpoint.sequence_id
+                self._checkpoint_sequence_id = checkpoint.sequence_id
+        self._message_queue = _event_queue.EventQueue(
+            maxsize=self._queue_size,
+            policy=self._overflow,
+            parse=self._parse_spilled,
+            pause=self._pause_reading,
+            resume=self._resume_reading,
+            spill_dir=self._spill_dir,
+        )
+        if self._transport == "aiohttp":
+            self._mqtt = _mqtt.WebsocketMQTT(
+                session=self.session._session,
+                host=f"edge-chat.{self.session.domain}",
+                loop=self._loop,
+            )
+            self._mqtt.on_message = self._on_message_handler
+            self._mqtt.on_connect = self._on_connect_handler
+            return
+        elif self._transport != "paho":
+            raise ValueError("Unknown MQTT transport {!r}".format(self._transport))
+        self._mqtt = mqtt_factory(self.session.domain, self._ssl_context)
         self._mqtt.on_message = self._on_message_handler
         self._mqtt.on_connect = self._on_connect_handler
         self._mqtt.on_socket_open = self.on_socket_open
@@ -135,7 +242,9 @@ class Listener:
         self._mqtt.on_socket_unregister_write = self.on_socket_unregister_write
 
     def on_socket_open(self, client, userdata, sock):
-        self._loop.add_reader(sock, client.loop_read)
+        # If the event queue is full, reading will be resumed once it has been drained
+        if not self._message_queue.paused:
+            self._loop.add_reader(sock, client.loop_read)
 
     def on_socket_close(self, client, userdata, sock):
         self._loop.remove_reader(sock)
@@ -146,6 +255,64 @@ class Listener:
     def on_socket_unregister_write(self, client, userdata, sock):
         self._loop.remove_writer(sock)
 
+    def _pause_reading(self):
+        if isinstance(self._mqtt, _mqtt.WebsocketMQTT):
+            self._mqtt.pause_reading()
+            return
+        sock = self._mqtt.socket()
+        if sock:
+            self._loop.remove_reader(sock)
+
+    def _resume_reading(self):
+        if isinstance(self._mqtt, _mqtt.WebsocketMQTT):
+            self._mqtt.resume_reading()
+            return
+        sock = self._mqtt.socket()
+        if sock:
+            self._loop.add_reader(sock, self._mqtt.loop_read)
+
+    @property
+    def queue_stats(self) -> _event_queue.QueueStats:
+        """Counters for the event queue, useful for choosing ``queue_size``."""
+        return self._message_queue.stats
+
+    def _save_checkpoint(self):
+        self._deltas_since_checkpoint = 0
+        if not self._checkpoint_store:
+            return
+        checkpoint = None
+        if self._sync_token is not None and self._checkpoint_sequence_id is not None:
+            checkpoint = _checkpoint.Checkpoint(
+                sync_token=self._sync_token, sequence_id=self._checkpoint_sequence_id
+            )
+        # Saving may block on fsync or SQLite, so it's done in a thread. Each write
+        # waits for the previous one, so an older checkpoint never replaces a newer one
+        self._checkpoint_write = self._loop.create_task(
+            self._write_checkpoint(self._checkpoint_write, checkpoint)
+        )
+
+    async def _write_checkpoint(self, previous, checkpoint):
+        if previous is not None:
+            await previous
+        try:
+            await self._loop.run_in_executor(
+                None, self._checkpoint_store.save, self.session.user.id, checkpoint
+            )
+        except Exception:
+            log.exception("Failed saving listener checkpoint")
+
+    async def _flush_checkpoint(self):
+        if self._checkpoint_write is not None:
+            await self._checkpoint_write
+
+    def _events_yielded(self, sequence_id, generation):
+        """Called once all events up to the sequence ID have been yielded."""
+        if generation != self._generation:
+            return  # From a sync queue that has been replaced since
+        self._checkpoint_sequence_id = sequence_id
+        if self._deltas_since_checkpoint >= self._checkpoint_interval:
+            self._save_checkpoint()
+
     def _handle_ms(self, j):
         """Handle /t_ms special logic.
 
@@ -159,6 +326,9 @@ class Listener:
         if "syncToken" in j and "firstDeltaSeqId" in j:
             self._sync_token = j["syncToken"]
             self._sequence_id = j["firstDeltaSeqId"]
+            self._generation += 1
+            self._checkpoint_sequence_id = self._sequence_id
+            self._save_checkpoint()
             return False
 
         if "errorCode" in j:
@@ -175,6 +345,9 @@ class Listener:
                 )
                 self._sync_token = None
                 self._sequence_id = None
+                self._checkpoint_sequence_id = None
+                self._generation += 1
+                self._save_checkpoint()
                 return False
             log.error("MQTT error code %s received", error)
             return False
@@ -182,15 +355,79 @@ class Listener:
         # Update last sequence id
         # Except for the two cases above, this is always received
         self._sequence_id = j["lastIssuedSeqId"]
+        # The checkpoint is saved once the events have been yielded, see `listen`
+        self._deltas_since_checkpoint += len(j.get("deltas") or ())
         return True
 
+    def _confirm_sends(self, j):
+        """Match echoed messages to the sends that are waiting for a response."""
+        if not self.session._pending_sends:
+            return
+        for delta in j.get("deltas") or ():
+            if delta.get("class") != "NewMessage":
+                continue
+            metadata = delta.get("messageMetadata") or {}
+            thread_key = metadata.get("threadKey") or {}
+            self.session._confirm_send(
+                str(metadata.get("offlineThreadingId")),
+                metadata.get("messageId"),
+                str(thread_key.get("threadFbId") or thread_key.get("otherUserFbId")),
+            )
+
+    def _parse_payload(self, topic, payload):
+        try:
+            return _util.parse_json(payload)
+        except _exception.FacebookError:
+            log.debug(payload)
+            log.exception("Failed parsing MQTT data on %s as JSON", topic)
+            return None
+
+    def _parse_events(self, topic, j):
+        try:
+            events = _events.parse_events(
+                self.session,
+                topic,
+                j,
+                delta_classes=self._delta_classes,
+                client_deltas=self._client_deltas,
+            )
+            for event in events:
+                if self._thread_cache is not None:
+                    self._thread_cache.handle_event(event)
+                yield event
+        except _exception.ParseError:
+            log.exception("Failed parsing MQTT data")
+
+    def _queue_items(self, topic, j, generation):
+        """Pair the events with the sequence ID that's reached once they're yielded.
+
+        The last event of a ``/t_ms`` message carries its sequence ID. If the message
+        didn't produce any events, the sequence ID is queued alone. Each item also
+        carries the generation of the sync queue the message was received from.
+        """
+        sequence_id = j.get("lastIssuedSeqId") if topic == "/t_ms" else None
+        last = None
+        for event in self._parse_events(topic, j):
+            if last is not None:
+                yield last, None, generation
+            last = event
+        if last is not None or sequence_id is not None:
+            yield last, sequence_id, generation
+
+    def _parse_spilled(self, topic, payload):
+        generation = self._spilled_generations.popleft()
+        j = self._parse_payload(topic, payload)
+        if j is None:
+            return []
+        return self._queue_items(topic, j, generation)
+
     def _on_message_handler(self, client, userdata, message):
+        if self._topics is not None and message.topic not in self._topics:
+            return  # Not subscribed to, but Facebook sends some topics anyway
+
         # Parse payload JSON
-        try:
-            j = _util.parse_json(message.payload.decode("utf-8"))
-        except (_exception.FacebookError, UnicodeDecodeError):
-            log.debug(message.payload)
-            log.exception("Failed parsing MQTT data on %s as JSON", message.topic)
+        j = self._parse_payload(message.topic, message.payload)
+        if j is None:
             return
 
         log.debug("MQTT payload: %s, %s", message.topic, j)
@@ -198,12 +435,16 @@ class Listener:
         if message.topic == "/t_ms":
             if not self._handle_ms(j):
                 return
+            self._confirm_sends(j)
 
-        try:
-            for event in _events.parse_events(self.session, message.topic, j):
-                self._message_queue.put_nowait(event)
-        except _exception.ParseError:
-            log.exception("Failed parsing MQTT data")
+        if self._message_queue.wants_spill():
+            # The events are parsed when the message is read back from disk
+            self._message_queue.spill(message.topic, message.payload)
+            self._spilled_generations.append(self._generation)
+            return
+
+        for item in self._queue_items(message.topic, j, self._generation):
+            self._message_queue.put(item)
 
     def _on_connect_handler(self, client, userdata, flags, rc):
         if rc == 21:
@@ -244,6 +485,13 @@ class Listener:
 
         self._mqtt.publish(topic, _util.json_minimal(payload), qos=1)
 
+    def _subscribed_topics(self) -> List[str]:
+        if self._topics is None:
+            return TOPICS
+        return [topic for topic in TOPICS if topic in self._topics] + sorted(
+            self._topics.difference(TOPICS)
+        )
+
     def _configure_connect_options(self):
         # Generate a new session ID on each reconnect
         session_id = generate_session_id()
@@ -262,7 +510,7 @@ class Listener:
             # Application ID, taken from facebook.com
             "aid": 219994525426954,
             # MQTT extension by FB, allows making a SUBSCRIBE while CONNECTing
-            "st": TOPICS,
+            "st": self._subscribed_topics(),
             # MQTT extension by FB, allows making a PUBLISH while CONNECTing
             # Using this is more efficient, but the same can be acheived with:
             #     def on_connect(*args):
@@ -307,6 +555,12 @@ class Listener:
     async def _reconnect(self) -> None:
         # Try reconnecting
         self._configure_connect_options()
+        if isinstance(self._mqtt, _mqtt.WebsocketMQTT):
+            try:
+                await self._mqtt.connect()
+            except (aiohttp.ClientError, asyncio.TimeoutError, OSError) as e:
+                raise _exception.NotLoggedIn("MQTT reconnection failed") from e
+            return
         try:
             self._mqtt.reconnect()
         except (
@@ -328,7 +582,7 @@ class Listener:
     async def listen(self) -> AsyncGenerator[_events.Event, Optional[bool]]:
         """Run the listening loop continually.
 
-        This is a blocking call, that will yield events as they arrive.
+        This is a blocking call, that will yield events as soon as they arrive.
 
         Example:
             Print events continually.
@@ -342,19 +596,37 @@ class Listener:
             log.debug("Waiting for sequence ID...")
             self._sequence_id = await fut
             log.debug("Got sequence ID: %d", self._sequence_id)
+        if self._checkpoint_sequence_id is None:
+            self._checkpoint_sequence_id = self._sequence_id
 
         await self._reconnect()
         yield _events.Connect()
         exit_if_not_connected = False
+        # When the next MQTT housekeeping (keepalive pings, retries) is due
+        misc_at = self._loop.time() + MISC_INTERVAL
 
         while True:
+            # Yield events as soon as the MQTT callbacks enqueue them, and only wake up
+            # without one when it's time to run the housekeeping below
             try:
-                await asyncio.sleep(1)
+                event, sequence_id, generation = await asyncio.wait_for(
+                    self._message_queue.get(), max(misc_at - self._loop.time(), 0)
+                )
+            except asyncio.TimeoutError:
+                pass
             except asyncio.CancelledError:
                 self.disconnect()
                 # this might not be necessary
                 self._mqtt.loop_misc()
                 break
+            else:
+                if event is not None:
+                    yield event
+                if sequence_id is not None:
+                    self._events_yielded(sequence_id, generation)
+                continue
+
+            misc_at = self._loop.time() + MISC_INTERVAL
             rc = self._mqtt.loop_misc()
 
             # The sequence ID was reset in _handle_ms
@@ -393,15 +665,16 @@ class Listener:
                 await self._reconnect()
                 exit_if_not_connected = True
                 yield _events.Connect()
-                self._mqtt.subscribe([(topic, 0) for topic in TOPICS])
+                topics = self._subscribed_topics()
+                self._mqtt.subscribe([(topic, 0) for topic in topics])
             else:
                 exit_if_not_connected = False
-
-            while True:
-                try:
-                    yield self._message_queue.get_nowait()
-                except asyncio.QueueEmpty:
-                    break
+        # Events that weren't yielded are discarded here, but the checkpoint only
+        # includes the ones that were, so they're received again after a restart
+        self._message_queue.close()
+        self._spilled_generations.clear()
+        self._save_checkpoint()
+        await self._flush_checkpoint()
         if self._disconnect_error:
             log.info("disconnect_error is set, raising and clearing variable")
             err = self._disconnect_error
@@ -1,11 +1,12 @@
 import attr
+import bisect
 import datetime
 import enum
 from string import Formatter
 from . import _attachment, _location, _file, _quick_reply, _sticker
 from .._common import log, attrs_default
 from .. import _exception, _util
-from typing import Optional, Mapping, Sequence, Any, TYPE_CHECKING
+from typing import Optional, Mapping, Sequence, Any, List, TYPE_CHECKING
 
 if TYPE_CHECKING:
     from .. import _threads
@@ -205,6 +206,42 @@ class Message:
         return result, mentions
 
 
+@attrs_default
+class ReadReceiptIndex:
+    """Read receipts of a thread, sorted by watermark.
+
+    Finding who has read a message is then a binary search, instead of converting
+    every receipt for every message.
+    """
+
+    #: The watermarks, as milliseconds since the epoch, in ascending order
+    watermarks: Sequence[int]
+    #: The positions of the receipts the watermarks belong to
+    positions: Sequence[int]
+    #: The IDs of the people that sent the receipts, in the original order
+    actor_ids: Sequence[str]
+
+    @classmethod
+    def _from_graphql(cls, receipts):
+        actor_ids = [receipt["actor"]["id"] for receipt in receipts]
+        pairs = sorted(
+            (int(receipt["watermark"]), i) for i, receipt in enumerate(receipts)
+        )
+        return cls(
+            watermarks=[watermark for watermark, _ in pairs],
+            positions=[i for _, i in pairs],
+            actor_ids=actor_ids,
+        )
+
+    def read_by(self, timestamp: int) -> List[str]:
+        """IDs of the people who have read a message sent at the timestamp.
+
+        They're in the same order as the receipts were.
+        """
+        start = bisect.bisect_left(self.watermarks, timestamp)
+        return [self.actor_ids[i] for i in sorted(self.positions[start:])]
+
+
 @attrs_default
 class MessageSnippet(Message):
     """Represents data in a Facebook message snippet.
@@ -287,6 +324,12 @@ class MessageData(Message):
                 return [_quick_reply.graphql_to_quick_reply(data, is_response=True)]
         return []
 
+    @classmethod
+    def _new(cls, thread, parse, **values):
+        if thread.session.lazy_messages:
+            return LazyMessageData._lazy(parse, thread=thread, **values)
+        return cls(thread=thread, **values, **parse())
+
     @classmethod
     def _from_graphql(cls, thread, data, read_receipts=None):
         if data.get("message_sender") is None:
@@ -295,52 +338,61 @@ class MessageData(Message):
             data["message"] = {}
         tags = data.get("tags_list")
 
-        created_at = _util.millis_to_datetime(int(data.get("timestamp_precise")))
-
-        attachments = [
-            _file.graphql_to_attachment(attachment)
-            for attachment in data.get("blob_attachments") or ()
-        ]
-        unsent = False
-        if data.get("extensible_attachment") is not None:
-            attachment = graphql_to_extensible_attachment(data["extensible_attachment"])
-            if isinstance(attachment, _attachment.UnsentMessage):
-                unsent = True
-            elif attachment:
-                attachments.append(attachment)
-
-        replied_to = None
-        if data.get("replied_to_message") and data["replied_to_message"]["message"]:
-            # data["replied_to_message"]["message"] is None if the message is deleted
-            replied_to = cls._from_graphql(
-                thread, data["replied_to_message"]["message"]
+        timestamp = int(data.get("timestamp_precise"))
+        created_at = _util.millis_to_datetime(timestamp)
+        if read_receipts is not None and not isinstance(read_receipts, ReadReceiptIndex):
+            read_receipts = ReadReceiptIndex._from_graphql(read_receipts)
+
+        def parse():
+            attachments = [
+                _file.graphql_to_attachment(attachment)
+                for attachment in data.get("blob_attachments") or ()
+            ]
+            unsent = False
+            if data.get("extensible_attachment") is not None:
+                attachment = graphql_to_extensible_attachment(
+                    data["extensible_attachment"]
+                )
+                if isinstance(attachment, _attachment.UnsentMessage):
+                    unsent = True
+                elif attachment:
+                    attachments.append(attachment)
+
+            replied_to = None
+            if data.get("replied_to_message") and data["replied_to_message"]["message"]:
+                # data["replied_to_message"]["message"] is None if the message is deleted
+                replied_to = cls._from_graphql(
+                    thread, data["replied_to_message"]["message"]
+                )
+
+            return dict(
+                mentions=[
+                    Mention._from_range(m) for m in data["message"].get("ranges") or ()
+                ],
+                read_by=read_receipts.read_by(timestamp) if read_receipts else [],
+                reactions={
+                    str(r["user"]["id"]): r["reaction"]
+                    for r in data["message_reactions"]
+                },
+                sticker=_sticker.Sticker._from_graphql(data.get("sticker")),
+                attachments=attachments,
+                quick_replies=cls._parse_quick_replies(
+                    data.get("platform_xmd_encoded")
+                ),
+                unsent=unsent,
+                reply_to_id=replied_to.id if replied_to else None,
+                replied_to=replied_to,
             )
 
-        return cls(
-            thread=thread,
+        return cls._new(
+            thread,
+            parse,
             id=str(data["message_id"]),
             author=str(data["message_sender"]["id"]),
             created_at=created_at,
             text=data["message"].get("text"),
-            mentions=[
-                Mention._from_range(m) for m in data["message"].get("ranges") or ()
-            ],
             emoji_size=EmojiSize._from_tags(tags),
             is_read=not data["unread"] if data.get("unread") is not None else None,
-            read_by=[
-                receipt["actor"]["id"]
-                for receipt in read_receipts or ()
-                if _util.millis_to_datetime(int(receipt["watermark"])) >= created_at
-            ],
-            reactions={
-                str(r["user"]["id"]): r["reaction"] for r in data["message_reactions"]
-            },
-            sticker=_sticker.Sticker._from_graphql(data.get("sticker")),
-            attachments=attachments,
-            quick_replies=cls._parse_quick_replies(data.get("platform_xmd_encoded")),
-            unsent=unsent,
-            reply_to_id=replied_to.id if replied_to else None,
-            replied_to=replied_to,
             forwarded=cls._get_forwarded_from_tags(tags),
         )
 
@@ -349,43 +401,50 @@ class MessageData(Message):
         tags = data["messageMetadata"].get("tags")
         metadata = data.get("messageMetadata", {})
 
-        attachments = []
-        unsent = False
-        sticker = None
-        for attachment in data.get("attachments") or ():
-            attachment = _util.parse_json(attachment["mercuryJSON"])
-            if attachment.get("blob_attachment"):
-                attachments.append(
-                    _file.graphql_to_attachment(attachment["blob_attachment"])
-                )
-            if attachment.get("extensible_attachment"):
-                extensible_attachment = graphql_to_extensible_attachment(
-                    attachment["extensible_attachment"]
-                )
-                if isinstance(extensible_attachment, _attachment.UnsentMessage):
-                    unsent = True
-                else:
-                    attachments.append(extensible_attachment)
-            if attachment.get("sticker_attachment"):
-                sticker = _sticker.Sticker._from_graphql(
-                    attachment["sticker_attachment"]
-                )
+        def parse():
+            attachments = []
+            unsent = False
+            sticker = None
+            for attachment in data.get("attachments") or ():
+                attachment = _util.parse_json(attachment["mercuryJSON"])
+                if attachment.get("blob_attachment"):
+                    attachments.append(
+                        _file.graphql_to_attachment(attachment["blob_attachment"])
+                    )
+                if attachment.get("extensible_attachment"):
+                    extensible_attachment = graphql_to_extensible_attachment(
+                        attachment["extensible_attachment"]
+                    )
+                    if isinstance(extensible_attachment, _attachment.UnsentMessage):
+                        unsent = True
+                    else:
+                        attachments.append(extensible_attachment)
+                if attachment.get("sticker_attachment"):
+                    sticker = _sticker.Sticker._from_graphql(
+                        attachment["sticker_attachment"]
+                    )
 
-        return cls(
-            thread=thread,
+            return dict(
+                mentions=[
+                    Mention._from_prng(m)
+                    for m in _util.parse_json(data.get("data", {}).get("prng", "[]"))
+                ],
+                sticker=sticker,
+                attachments=attachments,
+                quick_replies=cls._parse_quick_replies(
+                    data.get("platform_xmd_encoded")
+                ),
+                unsent=unsent,
+            )
+
+        return cls._new(
+            thread,
+            parse,
             id=metadata.get("messageId"),
             author=str(metadata["actorFbId"]),
             created_at=_util.millis_to_datetime(metadata["timestamp"]),
             text=data.get("body"),
-            mentions=[
-                Mention._from_prng(m)
-                for m in _util.parse_json(data.get("data", {}).get("prng", "[]"))
-            ],
             emoji_size=EmojiSize._from_tags(tags),
-            sticker=sticker,
-            attachments=attachments,
-            quick_replies=cls._parse_quick_replies(data.get("platform_xmd_encoded")),
-            unsent=unsent,
             reply_to_id=data["messageReply"]["replyToMessageId"]["id"]
             if "messageReply" in data
             else None,
@@ -398,62 +457,67 @@ class MessageData(Message):
 
         tags = metadata.get("tags")
 
-        mentions = []
-        if data.get("data") and data["data"].get("prng"):
+        def parse():
+            mentions = []
+            if data.get("data") and data["data"].get("prng"):
+                try:
+                    mentions = [
+                        Mention._from_prng(m)
+                        for m in _util.parse_json(data["data"]["prng"])
+                    ]
+                except Exception:
+                    log.exception("An exception occured while reading attachments")
+
+            attachments = []
+            unsent = False
+            sticker = None
             try:
-                mentions = [
-                    Mention._from_prng(m)
-                    for m in _util.parse_json(data["data"]["prng"])
-                ]
-            except Exception:
-                log.exception("An exception occured while reading attachments")
+                for a in data.get("attachments") or ():
+                    mercury = a["mercury"]
+                    if mercury.get("blob_attachment"):
+                        image_metadata = a.get("imageMetadata", {})
+                        attach_type = mercury["blob_attachment"]["__typename"]
+                        attachment = _file.graphql_to_attachment(
+                            mercury["blob_attachment"], a.get("fileSize")
+                        )
+                        attachments.append(attachment)
 
-        attachments = []
-        unsent = False
-        sticker = None
-        try:
-            for a in data.get("attachments") or ():
-                mercury = a["mercury"]
-                if mercury.get("blob_attachment"):
-                    image_metadata = a.get("imageMetadata", {})
-                    attach_type = mercury["blob_attachment"]["__typename"]
-                    attachment = _file.graphql_to_attachment(
-                        mercury["blob_attachment"], a.get("fileSize")
-                    )
-                    attachments.append(attachment)
+                    elif mercury.get("sticker_attachment"):
+                        sticker = _sticker.Sticker._from_graphql(
+                            mercury["sticker_attachment"]
+                        )
 
-                elif mercury.get("sticker_attachment"):
-                    sticker = _sticker.Sticker._from_graphql(
-                        mercury["sticker_attachment"]
-                    )
+                    elif mercury.get("extensible_attachment"):
+                        attachment = graphql_to_extensible_attachment(
+                            mercury["extensible_attachment"]
+                        )
+                        if isinstance(attachment, _attachment.UnsentMessage):
+                            unsent = True
+                        elif attachment:
+                            attachments.append(attachment)
 
-                elif mercury.get("extensible_attachment"):
-                    attachment = graphql_to_extensible_attachment(
-                        mercury["extensible_attachment"]
+            except Exception:
+                log.exception(
+                    "An exception occured while reading attachments: {}".format(
+                        data["attachments"]
                     )
-                    if isinstance(attachment, _attachment.UnsentMessage):
-                        unsent = True
-                    elif attachment:
-                        attachments.append(attachment)
-
-        except Exception:
-            log.exception(
-                "An exception occured while reading attachments: {}".format(
-                    data["attachments"]
                 )
+
+            return dict(
+                mentions=mentions,
+                sticker=sticker,
+                attachments=attachments,
+                unsent=unsent,
             )
 
-        return cls(
-            thread=thread,
+        return cls._new(
+            thread,
+            parse,
             id=metadata["messageId"],
             author=author,
             created_at=created_at,
             text=data.get("body"),
-            mentions=mentions,
             emoji_size=EmojiSize._from_tags(tags),
-            sticker=sticker,
-            attachments=attachments,
-            unsent=unsent,
             forwarded=cls._get_forwarded_from_tags(tags),
         )
 
@@ -476,3 +540,98 @@ def graphql_to_extensible_attachment(data):
         return _attachment.ShareAttachment._from_graphql(story)
 
     return None
+
+
+#: Fields of `LazyMessageData` that are parsed when they're first accessed
+LAZY_FIELDS = (
+    "mentions",
+    "read_by",
+    "reactions",
+    "sticker",
+    "attachments",
+    "quick_replies",
+    "unsent",
+    "reply_to_id",
+    "replied_to",
+)
+
+
+class LazyMessageData(MessageData):
+    """`MessageData` that parses mentions, attachments, reactions and such only when
+    one of them is first accessed.
+
+    Used instead of `MessageData` when `Session.lazy_messages` is set. It keeps the
+    raw data of the message alive until then, and errors in the data are raised
+    when the fields are accessed instead of when the message is received.
+
+    Inherits `MessageData`.
+
+    Example:
+        >>> session.lazy_messages = True
+        >>> message.text  # Cheap
+        "Hello"
+        >>> message.attachments  # Parsed now
+        [ImageAttachment(...)]
+    """
+
+    __slots__ = ("_parse",)
+
+    @classmethod
+    def _lazy(cls, parse, **values):
+        self = cls.__new__(cls)
+        # Fields that the parser doesn't pass, like is_read for pulled messages, keep
+        # their defaults, like they would with MessageData
+        for field in attr.fields(MessageData):
+            if field.name in LAZY_FIELDS or field.name in values:
+                continue
+            if field.default is attr.NOTHING:
+                continue  # Required, so always passed
+            if isinstance(field.default, attr.Factory):
+                value = field.default.factory()
+            else:
+                value = field.default
+            object.__setattr__(self, field.name, value)
+        for name, value in values.items():
+            object.__setattr__(self, name, value)
+        object.__setattr__(self, "_parse", parse)
+        return self
+
+    def _materialize(self):
+        values = self._parse()
+        object.__setattr__(self, "_parse", None)
+        for field in attr.fields(MessageData):
+            if field.name not in LAZY_FIELDS:
+                continue
+            slot = MessageData.__dict__[field.name]
+            try:
+                slot.__get__(self, type(self))
+                continue  # Not lazy in this message
+            except AttributeError:
+                pass
+            if field.name in values:
+                value = values[field.name]
+            elif isinstance(field.default, attr.Factory):
+                value = field.default.factory()
+            else:
+                value = field.default
+            slot.__set__(self, value)
+
+
+def _lazy_field(name):
+    slot = MessageData.__dict__[name]
+
+    def get(self):
+        try:
+            return slot.__get__(self, type(self))
+        except AttributeError:
+            self._materialize()
+            return slot.__get__(self, type(self))
+
+    def set(self, value):
+        slot.__set__(self, value)
+
+    return property(get, set, doc=slot.__doc__)
+
+
+for _name in LAZY_FIELDS:
+    setattr(LazyMessageData, _name, _lazy_field(_name))
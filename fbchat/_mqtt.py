@@ -0,0 +1,354 @@
+import attr
+import struct
+import asyncio
+import aiohttp
+import paho.mqtt.client
+from ._common import log, kw_only
+
+from typing import Callable, Iterable, Iterator, Mapping, NamedTuple, Optional, Tuple
+
+# Packet types, as they appear in the upper four bits of the fixed header
+CONNECT = 0x10
+CONNACK = 0x20
+PUBLISH = 0x30
+PUBACK = 0x40
+SUBSCRIBE = 0x80
+SUBACK = 0x90
+PINGREQ = 0xC0
+PINGRESP = 0xD0
+DISCONNECT = 0xE0
+
+PINGREQ_PACKET = bytes([PINGREQ, 0])
+DISCONNECT_PACKET = bytes([DISCONNECT, 0])
+
+
+class MQTTMessage(NamedTuple):
+    """A received PUBLISH, with the attributes `Listener` reads from paho's messages."""
+
+    topic: str
+    payload: bytes
+
+
+def encode_length(length: int) -> bytes:
+    """Encode the "remaining length" field of the fixed header."""
+    rtn = bytearray()
+    while True:
+        byte = length % 128
+        length //= 128
+        if length > 0:
+            byte |= 0x80
+        rtn.append(byte)
+        if length == 0:
+            return bytes(rtn)
+
+
+def encode_string(value) -> bytes:
+    if isinstance(value, str):
+        value = value.encode("utf-8")
+    return struct.pack("!H", len(value)) + value
+
+
+def encode_packet(header: int, body: bytes) -> bytes:
+    return bytes([header]) + encode_length(len(body)) + body
+
+
+def connect_packet(
+    client_id: str,
+    keepalive: int,
+    username: Optional[str] = None,
+    password: Optional[str] = None,
+    clean_session: bool = True,
+) -> bytes:
+    flags = 0x02 if clean_session else 0
+    payload = encode_string(client_id)
+    if username is not None:
+        flags |= 0x80
+        payload += encode_string(username)
+    if password is not None:
+        flags |= 0x40
+        payload += encode_string(password)
+    # MQTTv31 uses the protocol name "MQIsdp" and protocol level 3
+    variable_header = encode_string("MQIsdp") + struct.pack("!BBH", 3, flags, keepalive)
+    return encode_packet(CONNECT, variable_header + payload)
+
+
+def publish_packet(topic: str, payload: bytes, qos: int = 0, mid: int = 0) -> bytes:
+    body = encode_string(topic)
+    if qos > 0:
+        body += struct.pack("!H", mid)
+    return encode_packet(PUBLISH | (qos << 1), body + payload)
+
+
+def puback_packet(mid: int) -> bytes:
+    return encode_packet(PUBACK, struct.pack("!H", mid))
+
+
+def subscribe_packet(mid: int, topics: Iterable[Tuple[str, int]]) -> bytes:
+    body = struct.pack("!H", mid)
+    for topic, qos in topics:
+        body += encode_string(topic) + bytes([qos])
+    # The lower bits of SUBSCRIBE are reserved, and must be 0b0010
+    return encode_packet(SUBSCRIBE | 0x02, body)
+
+
+def parse_publish(header: int, body: bytes) -> Tuple[MQTTMessage, int, int]:
+    """Parse a PUBLISH packet into the message, its QoS and its message ID."""
+    qos = (header >> 1) & 0x03
+    (topic_len,) = struct.unpack_from("!H", body)
+    pos = 2 + topic_len
+    topic = body[2:pos].decode("utf-8")
+    mid = 0
+    if qos > 0:
+        (mid,) = struct.unpack_from("!H", body, pos)
+        pos += 2
+    return MQTTMessage(topic=topic, payload=body[pos:]), qos, mid
+
+
+class PacketReader:
+    """Split a stream of bytes into MQTT packets.
+
+    WebSocket frames don't have to line up with packet boundaries.
+    """
+
+    __slots__ = ("_buffer",)
+
+    def __init__(self):
+        self._buffer = bytearray()
+
+    def feed(self, data: bytes) -> Iterator[Tuple[int, bytes]]:
+        """Add data to the buffer, and yield the header and body of complete packets."""
+        buf = self._buffer
+        buf += data
+        while len(buf) >= 2:
+            length = 0
+            multiplier = 1
+            pos = 1
+            while True:
+                if pos >= len(buf):
+                    return  # The remaining length is incomplete
+                byte = buf[pos]
+                length += (byte & 0x7F) * multiplier
+                multiplier *= 128
+                pos += 1
+                if not byte & 0x80:
+                    break
+                if pos > 4:
+                    raise ValueError("Malformed remaining length in MQTT packet")
+            if len(buf) < pos + length:
+                return  # The body is incomplete
+            header = buf[0]
+            body = bytes(buf[pos : pos + length])
+            del buf[: pos + length]
+            yield header, body
+
+
+@attr.s(slots=True, kw_only=kw_only, eq=False, auto_attribs=True)
+class WebsocketMQTT:
+    """MQTTv31 client running on aiohttp's WebSocket client.
+
+    Implements the subset of ``paho.mqtt.client.Client`` that `Listener` uses, so it
+    shares the connector, proxy settings and cookie jar of the session, and runs
+    directly on the event loop.
+    """
+
+    _session: aiohttp.ClientSession
+    _host: str
+    _loop: asyncio.AbstractEventLoop
+    _client_id: str = "mqttwsclient"
+    _keepalive: int = 10
+    #: Called like paho's ``on_message(client, userdata, message)``
+    on_message: Optional[Callable] = None
+    #: Called like paho's ``on_connect(client, userdata, flags, rc)``
+    on_connect: Optional[Callable] = None
+    _username: Optional[str] = None
+    _password: Optional[str] = None
+    _path: str = "/mqtt"
+    _headers: Mapping[str, str] = attr.ib(factory=dict)
+    # Uses paho's constants, since `Listener.listen` checks this
+    _state: int = paho.mqtt.client.mqtt_cs_new
+    _ws: Optional[aiohttp.ClientWebSocketResponse] = None
+    _outgoing: Optional[asyncio.Queue] = None
+    _tasks: Tuple[asyncio.Task, ...] = ()
+    _reading: asyncio.Event = attr.ib(factory=asyncio.Event)
+    _connection_lost: bool = False
+    _last_out: float = 0
+    _ping_sent: Optional[float] = None
+    _last_mid: int = 0
+
+    def __attrs_post_init__(self):
+        self._reading.set()
+
+    def username_pw_set(self, username: str, password: Optional[str] = None) -> None:
+        self._username = username
+        self._password = password
+
+    def ws_set_options(self, path: str = "/mqtt", headers: Mapping[str, str] = None):
+        self._path = path
+        self._headers = headers or {}
+
+    def socket(self):
+        # There's no raw socket to register with the event loop
+        return None
+
+    def is_connected(self) -> bool:
+        return (
+            self._state == paho.mqtt.client.mqtt_cs_connected
+            and self._ws is not None
+            and not self._ws.closed
+        )
+
+    def _next_mid(self) -> int:
+        self._last_mid = self._last_mid % 65535 + 1
+        return self._last_mid
+
+    def _send(self, packet: bytes) -> bool:
+        if self._outgoing is None:
+            return False
+        self._outgoing.put_nowait(packet)
+        self._last_out = self._loop.time()
+        return True
+
+    async def connect(self) -> None:
+        """Open the WebSocket and send CONNECT. Replaces any existing connection."""
+        await self._close()
+        # The cookie jar and the default headers of the session are used instead
+        headers = {
+            key: value
+            for key, value in self._headers.items()
+            if key.lower() not in ("cookie", "host", "user-agent")
+        }
+        self._ws = ws = await self._session.ws_connect(
+            f"wss://{self._host}{self._path}", headers=headers, protocols=("mqtt",)
+        )
+        self._state = paho.mqtt.client.mqtt_cs_connect_async
+        self._connection_lost = False
+        self._ping_sent = None
+        self._outgoing = outgoing = asyncio.Queue()
+        self._send(
+            connect_packet(
+                self._client_id, self._keepalive, self._username, self._password
+            )
+        )
+        self._tasks = (
+            self._loop.create_task(self._write_loop(ws, outgoing)),
+            self._loop.create_task(self._read_loop(ws)),
+        )
+
+    def _abort(self) -> Optional[aiohttp.ClientWebSocketResponse]:
+        """Stop the reader and writer, and return the WebSocket to close."""
+        for task in self._tasks:
+            task.cancel()
+        self._tasks = ()
+        self._outgoing = None
+        ws, self._ws = self._ws, None
+        return ws
+
+    async def _close(self) -> None:
+        ws = self._abort()
+        if ws is not None:
+            await ws.close()
+
+    async def _write_loop(self, ws, outgoing):
+        while True:
+            packet = await outgoing.get()
+            if packet is None:
+                await ws.close()
+                return
+            try:
+                await ws.send_bytes(packet)
+            except (aiohttp.ClientError, ConnectionError) as e:
+                log.warning("Failed sending MQTT packet: %s", e)
+                return
+
+    async def _read_loop(self, ws):
+        reader = PacketReader()
+        try:
+            while True:
+                await self._reading.wait()
+                msg = await ws.receive()
+                if msg.type != aiohttp.WSMsgType.BINARY:
+                    if msg.type not in (
+                        aiohttp.WSMsgType.CLOSE,
+                        aiohttp.WSMsgType.CLOSING,
+                        aiohttp.WSMsgType.CLOSED,
+                    ):
+                        log.warning("Unexpected WebSocket message: %s", msg)
+                    break
+                for header, body in reader.feed(msg.data):
+                    self._handle_packet(header, body)
+        except ValueError:
+            log.exception("Failed parsing MQTT packet")
+        finally:
+            # Don't flag a connection that has already been replaced
+            if self._ws is ws and self._state != paho.mqtt.client.mqtt_cs_disconnecting:
+                self._connection_lost = True
+
+    def _handle_packet(self, header: int, body: bytes) -> None:
+        type_ = header & 0xF0
+        if type_ == PUBLISH:
+            message, qos, mid = parse_publish(header, body)
+            if qos == 1:
+                self._send(puback_packet(mid))
+            self._callback(self.on_message, message)
+        elif type_ == CONNACK:
+            rc = body[1]
+            if rc == 0:
+                self._state = paho.mqtt.client.mqtt_cs_connected
+            self._callback(self.on_connect, {"session present": body[0] & 0x01}, rc)
+        elif type_ == PINGRESP:
+            self._ping_sent = None
+        elif type_ in (PUBACK, SUBACK):
+            pass  # We don't keep track of what has been acknowledged
+        else:
+            log.warning("Unexpected MQTT packet type %x", type_)
+
+    def _callback(self, callback, *args) -> None:
+        if callback is None:
+            return
+        # Like paho, don't let errors in the callbacks break the connection
+        try:
+            callback(self, None, *args)
+        except Exception:
+            log.exception("Error in MQTT callback")
+
+    def loop_misc(self) -> int:
+        """Check the connection and send keepalive pings, like paho's ``loop_misc``."""
+        if self._ws is None:
+            return paho.mqtt.client.MQTT_ERR_NO_CONN
+        now = self._loop.time()
+        if self._connection_lost or self._ws.closed:
+            self._loop.create_task(self._abort().close())
+            return paho.mqtt.client.MQTT_ERR_CONN_LOST
+        if self._ping_sent is not None and now - self._ping_sent >= self._keepalive:
+            log.warning("No PINGRESP received in %d seconds", self._keepalive)
+            self._loop.create_task(self._abort().close())
+            return paho.mqtt.client.MQTT_ERR_CONN_LOST
+        if self._ping_sent is None and now - self._last_out >= self._keepalive:
+            self._send(PINGREQ_PACKET)
+            self._ping_sent = now
+        return paho.mqtt.client.MQTT_ERR_SUCCESS
+
+    def publish(self, topic: str, payload=b"", qos: int = 0) -> int:
+        if isinstance(payload, str):
+            payload = payload.encode("utf-8")
+        mid = self._next_mid() if qos > 0 else 0
+        if not self._send(publish_packet(topic, payload, qos, mid)):
+            log.warning("Tried to publish to %s while not connected", topic)
+        return mid
+
+    def subscribe(self, topics: Iterable[Tuple[str, int]]) -> int:
+        mid = self._next_mid()
+        self._send(subscribe_packet(mid, topics))
+        return mid
+
+    def disconnect(self) -> None:
+        self._state = paho.mqtt.client.mqtt_cs_disconnecting
+        if self._send(DISCONNECT_PACKET):
+            # Makes the writer close the WebSocket once everything has been sent
+            self._outgoing.put_nowait(None)
+
+    def pause_reading(self) -> None:
+        self._reading.clear()
+
+    def resume_reading(self) -> None:
+        self._reading.set()
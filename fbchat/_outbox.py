@@ -0,0 +1,136 @@
+import attr
+import time
+import asyncio
+import collections
+from ._common import log, kw_only
+
+from typing import Any, Awaitable, Callable, Deque, Dict, Hashable, Tuple, TypeVar
+
+T = TypeVar("T")
+
+_Item = Tuple[Callable[[], Awaitable[Any]], asyncio.Future, float]
+
+
+@attr.s(slots=True, kw_only=kw_only, auto_attribs=True)
+class OutboxStats:
+    """Statistics of an `Outbox`."""
+
+    #: Number of messages that have been sent
+    sent: int = 0
+    #: Number of messages that failed to send
+    failed: int = 0
+    #: Most messages that have been waiting at once
+    max_depth: int = 0
+    #: Total time from queueing to being sent, in seconds
+    total_latency: float = 0
+    #: Longest time from queueing to being sent, in seconds
+    max_latency: float = 0
+    #: Total time spent waiting for earlier messages and free slots, in seconds
+    total_wait: float = 0
+
+
+@attr.s(slots=True, kw_only=kw_only, eq=False, auto_attribs=True)
+class Outbox:
+    """Sends messages in order within each thread, and to different threads in parallel.
+
+    Set it as `Session.outbox`, and messages sent with methods like
+    `ThreadABC.send_text` are queued in it. A message is only sent once the earlier
+    messages to the same thread are done, and at most ``max_concurrency`` messages
+    are sent at a time.
+
+    A message that fails to send doesn't stop the ones after it.
+
+    Example:
+        >>> session.outbox = fbchat.Outbox(max_concurrency=4)
+        >>> await asyncio.gather(*(thread.send_text(text) for text in texts))
+        >>> session.outbox.stats.max_latency
+        0.8
+    """
+
+    #: Max. number of messages to send at a time
+    max_concurrency: int = 8
+    #: Statistics of the outbox
+    stats: OutboxStats = attr.ib(factory=OutboxStats)
+    _clock: Callable[[], float] = time.monotonic
+    _queues: Dict[Hashable, Deque[_Item]] = attr.ib(factory=dict)
+    _workers: Dict[Hashable, asyncio.Task] = attr.ib(factory=dict)
+    _semaphore: asyncio.Semaphore = None
+    _depth: int = 0
+
+    @property
+    def depth(self) -> int:
+        """Number of messages that are waiting or being sent."""
+        return self._depth
+
+    def thread_depth(self, thread_id: Hashable) -> int:
+        """Number of messages to a thread that are waiting to be sent."""
+        return len(self._queues.get(thread_id, ()))
+
+    async def send(self, thread_id: Hashable, send: Callable[[], Awaitable[T]]) -> T:
+        """Queue a message, and wait until it has been sent.
+
+        Args:
+            thread_id: The thread the message is sent to
+            send: Sends the message when called
+
+        Returns:
+            What ``send`` returned
+        """
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        future = asyncio.get_event_loop().create_future()
+        self._queues.setdefault(thread_id, collections.deque()).append(
+            (send, future, self._clock())
+        )
+        self._depth += 1
+        self.stats.max_depth = max(self.stats.max_depth, self._depth)
+        if thread_id not in self._workers:
+            self._workers[thread_id] = asyncio.ensure_future(self._run(thread_id))
+        return await future
+
+    async def _run(self, thread_id: Hashable) -> None:
+        queue = self._queues[thread_id]
+        future = None
+        try:
+            while queue:
+                send, future, queued_at = queue.popleft()
+                try:
+                    if future.cancelled():
+                        continue  # Nobody is waiting for it anymore
+                    async with self._semaphore:
+                        self.stats.total_wait += self._clock() - queued_at
+                        try:
+                            result = await send()
+                        except Exception as e:
+                            self.stats.failed += 1
+                            if not future.cancelled():
+                                future.set_exception(e)
+                            continue
+                    latency = self._clock() - queued_at
+                    self.stats.sent += 1
+                    self.stats.total_latency += latency
+                    self.stats.max_latency = max(self.stats.max_latency, latency)
+                    if not future.cancelled():
+                        future.set_result(result)
+                finally:
+                    self._depth -= 1
+        except asyncio.CancelledError:
+            if future is not None:
+                future.cancel()  # Cancelled while it was being sent
+            for _, future, _ in queue:
+                future.cancel()
+            self._depth -= len(queue)
+            queue.clear()
+            raise
+        finally:
+            del self._queues[thread_id]
+            del self._workers[thread_id]
+
+    async def close(self) -> None:
+        """Cancel the messages that are waiting to be sent."""
+        workers = list(self._workers.values())
+        for worker in workers:
+            worker.cancel()
+        if workers:
+            await asyncio.gather(*workers, return_exceptions=True)
+        log.debug("Closed outbox, %d messages were sent", self.stats.sent)
@@ -0,0 +1,197 @@
+import attr
+import ssl
+import asyncio
+import aiohttp
+from ._common import log, kw_only, attrs_default
+from . import _session, _listen
+
+from typing import Any, Dict, Mapping, Optional
+
+
+@attrs_default
+class PoolHealth:
+    """Summary of the state of a `SessionPool`."""
+
+    #: Number of sessions in the pool
+    sessions: int
+    #: Number of listeners in the pool
+    listeners: int
+    #: Number of listeners that are currently connected
+    connected: int
+    #: Accounts that failed to start, and why
+    failed: Mapping[str, Exception]
+    #: Number of open HTTP connections in the shared pool
+    open_connections: int
+
+
+@attr.s(slots=True, kw_only=kw_only, eq=False, auto_attribs=True)
+class SessionPool:
+    """Run many accounts with one shared connection pool and SSL context.
+
+    Accounts are identified by a key of your choosing. Logins are staggered, so
+    starting hundreds of accounts doesn't send hundreds of requests at once.
+
+    Example:
+        >>> pool = fbchat.SessionPool()
+        >>> sessions = await pool.start({"alice": alice_cookies, "bob": bob_cookies})
+        >>> listener = pool.listener("alice", chat_on=False, foreground=False)
+        >>> pool.health()
+        PoolHealth(sessions=2, listeners=1, connected=1, failed={}, open_connections=4)
+        >>> await pool.close()
+    """
+
+    #: Settings of the shared connection pool. The ``connector`` field is ignored
+    connection_options: _session.ConnectionOptions = attr.ib(
+        factory=_session.ConnectionOptions
+    )
+    #: Min. time between two logins, in seconds
+    startup_interval: float = 0.5
+    #: Max. number of logins at a time
+    max_concurrent_startups: int = 4
+    #: The sessions in the pool, by key
+    sessions: Dict[str, _session.Session] = attr.ib(factory=dict)
+    #: The listeners in the pool, by key
+    listeners: Dict[str, "_listen.Listener"] = attr.ib(factory=dict)
+    #: Accounts that failed to start, by key
+    failed: Dict[str, Exception] = attr.ib(factory=dict)
+    _ssl_context: Optional[ssl.SSLContext] = None
+    _connector: Optional[aiohttp.TCPConnector] = None
+    _startup_semaphore: Optional[asyncio.Semaphore] = None
+    _next_startup: float = 0
+
+    @property
+    def ssl_context(self) -> ssl.SSLContext:
+        """The SSL context shared by all sessions and listeners."""
+        if self._ssl_context is None:
+            self._ssl_context = ssl.create_default_context()
+        return self._ssl_context
+
+    def _get_connection_options(self) -> _session.ConnectionOptions:
+        if self._connector is None:
+            self._connector = aiohttp.TCPConnector(
+                ssl=self.ssl_context,
+                **self.connection_options._get_connector_kwargs(),
+            )
+        return attr.evolve(self.connection_options, connector=self._connector)
+
+    async def _wait_for_turn(self) -> None:
+        loop = asyncio.get_event_loop()
+        now = loop.time()
+        start_at = max(now, self._next_startup)
+        self._next_startup = start_at + self.startup_interval
+        if start_at > now:
+            await asyncio.sleep(start_at - now)
+
+    async def add_from_cookies(
+        self,
+        key: str,
+        cookies: Mapping[str, str],
+        user_agent: Optional[str] = None,
+        domain: str = "messenger.com",
+    ) -> _session.Session:
+        """Load a session from cookies, and add it to the pool.
+
+        Args:
+            key: Identifies the account in the pool
+            cookies: Session cookies, see `Session.from_cookies`
+            user_agent: The user agent to send to Facebook
+            domain: The domain to connect to
+        """
+        if self._startup_semaphore is None:
+            self._startup_semaphore = asyncio.Semaphore(self.max_concurrent_startups)
+        connection_options = self._get_connection_options()
+        async with self._startup_semaphore:
+            await self._wait_for_turn()
+            try:
+                session = await _session.Session.from_cookies(
+                    cookies,
+                    user_agent=user_agent,
+                    domain=domain,
+                    connection_options=connection_options,
+                )
+            except Exception as e:
+                self.failed[key] = e
+                raise
+        self.failed.pop(key, None)
+        self.sessions[key] = session
+        return session
+
+    async def start(
+        self, cookies: Mapping[str, Mapping[str, str]], **kwargs
+    ) -> Dict[str, _session.Session]:
+        """Add many accounts to the pool, with staggered logins.
+
+        Accounts that fail to start are logged and left in `SessionPool.failed`,
+        without affecting the others.
+
+        Args:
+            cookies: Session cookies by key
+            kwargs: Passed to `SessionPool.add_from_cookies`
+
+        Returns:
+            The sessions that were started, by key
+        """
+
+        async def add(key, account_cookies):
+            try:
+                return await self.add_from_cookies(key, account_cookies, **kwargs)
+            except Exception:
+                log.exception("Failed to start session %s", key)
+                return None
+
+        keys = list(cookies)
+        results = await asyncio.gather(*(add(key, cookies[key]) for key in keys))
+        return {key: session for key, session in zip(keys, results) if session}
+
+    def listener(self, key: str, **kwargs: Any) -> "_listen.Listener":
+        """Create a `Listener` for a session in the pool, using the shared SSL context.
+
+        Args:
+            key: The key of the session
+            kwargs: Passed to `Listener`
+        """
+        listener = _listen.Listener(
+            session=self.sessions[key], ssl_context=self.ssl_context, **kwargs
+        )
+        self.listeners[key] = listener
+        return listener
+
+    def health(self) -> PoolHealth:
+        """Get a summary of the state of the pool."""
+        connected = sum(
+            1
+            for listener in self.listeners.values()
+            if listener._mqtt is not None and listener._mqtt.is_connected()
+        )
+        open_connections = 0
+        if self._connector is not None and not self._connector.closed:
+            open_connections = len(self._connector._acquired) + sum(
+                len(conns) for conns in self._connector._conns.values()
+            )
+        return PoolHealth(
+            sessions=len(self.sessions),
+            listeners=len(self.listeners),
+            connected=connected,
+            failed=dict(self.failed),
+            open_connections=open_connections,
+        )
+
+    async def remove(self, key: str) -> None:
+        """Disconnect the listener of an account, and remove it from the pool."""
+        listener = self.listeners.pop(key, None)
+        if listener is not None:
+            listener.disconnect()
+        session = self.sessions.pop(key, None)
+        if session is not None:
+            await session._session.close()
+
+    async def close(self) -> None:
+        """Disconnect all listeners, and close all sessions and the connection pool."""
+        for key in list(self.sessions):
+            await self.remove(key)
+        for listener in self.listeners.values():
+            listener.disconnect()
+        self.listeners.clear()
+        if self._connector is not None:
+            await self._connector.close()
+            self._connector = None
@@ -0,0 +1,187 @@
+import attr
+import time
+import asyncio
+from yarl import URL
+from ._common import log, kw_only
+
+from typing import Callable, Dict, FrozenSet, Optional
+
+#: Paths that `RateLimiter` uses the send budget for by default
+SEND_PATHS = frozenset(
+    {
+        "/messaging/send/",
+        "/messaging/unsend_message/",
+        "/mercury/attachments/forward/",
+        "/ajax/mercury/upload.php",
+    }
+)
+
+#: Facebook error codes that `RateLimiter` treats as being throttled by default
+THROTTLE_CODES = frozenset({368, 1390008})
+
+
+@attr.s(slots=True, kw_only=kw_only, auto_attribs=True)
+class RateLimitStats:
+    """Statistics of one endpoint of a `RateLimiter`."""
+
+    #: Number of requests that have been let through
+    requests: int = 0
+    #: Number of requests that had to wait for the limiter
+    waits: int = 0
+    #: Total time requests have waited, in seconds
+    wait_time: float = 0
+    #: Longest time a request has waited, in seconds
+    max_wait: float = 0
+    #: Number of responses that looked like Facebook throttling us
+    throttled: int = 0
+    #: The current rate, in requests per second
+    rate: float = 0
+
+
+@attr.s(slots=True, kw_only=kw_only, eq=False, auto_attribs=True)
+class TokenBucket:
+    """Token bucket with an adjustable rate. Waiters are served in order."""
+
+    #: The rate the bucket adapts back to, in tokens per second
+    max_rate: float
+    #: How many tokens can be used at once after being idle
+    burst: float
+    _clock: Callable[[], float] = time.monotonic
+    #: The current rate
+    rate: float = attr.ib()
+    _tokens: float = attr.ib()
+    _updated: float = attr.ib()
+
+    @rate.default
+    def _rate_default(self):
+        return self.max_rate
+
+    @_tokens.default
+    def _tokens_default(self):
+        return self.burst
+
+    @_updated.default
+    def _updated_default(self):
+        return self._clock()
+
+    def _refill(self) -> None:
+        now = self._clock()
+        self._tokens = min(self._tokens + (now - self._updated) * self.rate, self.burst)
+        self._updated = now
+
+    def reserve(self) -> float:
+        """Take a token, and return how long to wait before using it."""
+        self._refill()
+        self._tokens -= 1
+        if self._tokens >= 0:
+            return 0
+        # The token is borrowed from the future, which keeps the waiters in order
+        return -self._tokens / self.rate
+
+    async def acquire(self) -> float:
+        """Wait for a token, and return how long that took."""
+        delay = self.reserve()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        return delay
+
+
+@attr.s(slots=True, kw_only=kw_only, eq=False, auto_attribs=True)
+class RateLimiter:
+    """Client-side rate limiter for `Session` requests, with a budget per endpoint.
+
+    Each endpoint path gets its own token bucket. Paths in ``send_paths`` use the
+    send budget, and everything else uses the read budget.
+
+    When Facebook responds with HTTP 500 or a throttling error code, the rate of
+    that endpoint is cut by ``decrease_factor``. Every successful request then
+    raises it by ``increase`` of the configured rate, until it's back at the
+    configured rate. This keeps the rate just below where Facebook starts
+    throttling.
+
+    Example:
+        >>> session.rate_limiter = fbchat.RateLimiter(send_rate=0.5, read_rate=5)
+        >>> session.rate_limiter.stats["/messaging/send/"].wait_time
+        12.5
+    """
+
+    #: Requests per second for each read endpoint
+    read_rate: float = 5
+    #: How many read requests can be made at once after being idle
+    read_burst: int = 10
+    #: Requests per second for each send endpoint
+    send_rate: float = 1
+    #: How many send requests can be made at once after being idle
+    send_burst: int = 3
+    #: Endpoint paths that use the send budget
+    send_paths: FrozenSet[str] = SEND_PATHS
+    #: Facebook error codes that mean we're being throttled
+    throttle_codes: FrozenSet[int] = THROTTLE_CODES
+    #: What to multiply the rate by when throttled
+    decrease_factor: float = 0.5
+    #: How much of the configured rate to add back per successful request
+    increase: float = 0.05
+    #: The lowest rate to go down to, as a fraction of the configured rate
+    min_factor: float = 0.05
+    #: Statistics by endpoint path
+    stats: Dict[str, RateLimitStats] = attr.ib(factory=dict)
+    _buckets: Dict[str, TokenBucket] = attr.ib(factory=dict)
+    _clock: Callable[[], float] = time.monotonic
+
+    @staticmethod
+    def _path(url) -> str:
+        return URL(str(url)).path
+
+    def _bucket(self, path: str) -> TokenBucket:
+        try:
+            return self._buckets[path]
+        except KeyError:
+            pass
+        if path in self.send_paths:
+            rate, burst = self.send_rate, self.send_burst
+        else:
+            rate, burst = self.read_rate, self.read_burst
+        bucket = TokenBucket(max_rate=rate, burst=burst, clock=self._clock)
+        self._buckets[path] = bucket
+        self.stats[path] = RateLimitStats(rate=rate)
+        return bucket
+
+    async def acquire(self, url) -> float:
+        """Wait until a request to the URL can be made, and return the time waited."""
+        path = self._path(url)
+        bucket = self._bucket(path)
+        stats = self.stats[path]
+        waited = await bucket.acquire()
+        stats.requests += 1
+        if waited > 0:
+            stats.waits += 1
+            stats.wait_time += waited
+            stats.max_wait = max(stats.max_wait, waited)
+        return waited
+
+    def record(
+        self, url, status: Optional[int] = None, code: Optional[int] = None
+    ) -> None:
+        """Adapt the rate of an endpoint from a response.
+
+        Args:
+            url: The URL the request was made to
+            status: The HTTP status code of the response
+            code: The Facebook error code in the response, if any
+        """
+        path = self._path(url)
+        bucket = self._bucket(path)
+        stats = self.stats[path]
+        if status == 500 or (code is not None and code in self.throttle_codes):
+            stats.throttled += 1
+            bucket.rate = max(
+                bucket.rate * self.decrease_factor, bucket.max_rate * self.min_factor
+            )
+            log.warning(
+                "%s looks rate limited, slowing down to %.2f/s", path, bucket.rate
+            )
+        elif status is not None and status < 400 and code is None:
+            bucket.rate = min(
+                bucket.rate + bucket.max_rate * self.increase, bucket.max_rate
+            )
+        stats.rate = bucket.rate
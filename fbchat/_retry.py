@@ -0,0 +1,72 @@
+import random
+import asyncio
+import aiohttp
+from ._common import attrs_default
+from . import _exception
+
+from typing import FrozenSet, Optional
+
+try:
+    from aiohttp_socks import ProxyTimeoutError
+except ImportError:
+    ProxyTimeoutError = None
+
+
+@attrs_default
+class RetryPolicy:
+    """How `Session` retries failed requests.
+
+    Delays grow exponentially from ``base_delay`` by ``multiplier`` per attempt, up to
+    ``max_delay``, and are then shortened by a random amount of up to ``jitter``.
+
+    Requests that aren't ``idempotent`` are only retried when Facebook can't have
+    acted on them: when the connection couldn't be made at all, or when Facebook
+    asked us to refresh the session. Messages are always resent with the same
+    offline threading ID, so sending them counts as idempotent.
+
+    The default policy retries reads on connection errors, timeouts and server
+    errors, which used to fail right away. Pass ``max_attempts=1`` to disable that.
+
+    Requests with files attached are never retried.
+
+    Example:
+        >>> session.retry_policy = fbchat.RetryPolicy(max_attempts=5, deadline=60)
+    """
+
+    #: Max. number of attempts, including the first one. ``1`` disables retrying
+    max_attempts: int = 3
+    #: Delay before the first retry, in seconds
+    base_delay: float = 0.5
+    #: What to multiply the delay by after each retry
+    multiplier: float = 2
+    #: Longest delay between attempts, in seconds
+    max_delay: float = 10
+    #: Fraction of the delay that's randomized, from 0 to 1
+    jitter: float = 1
+    #: Max. time for all attempts together, in seconds. ``None`` means no limit
+    deadline: Optional[float] = None
+    #: Whether repeating the request is harmless
+    idempotent: bool = True
+    #: HTTP status codes that are retried, if the request is idempotent
+    retry_statuses: FrozenSet[int] = frozenset({500, 502, 503, 504})
+
+    def should_retry(self, error: BaseException) -> bool:
+        """Whether a request that failed with the error may be retried."""
+        if isinstance(error, _exception.PleaseRefresh):
+            return True
+        if isinstance(error, aiohttp.ClientConnectorError):
+            return True  # The request was never sent
+        if ProxyTimeoutError is not None and isinstance(error, ProxyTimeoutError):
+            return True
+        if not self.idempotent:
+            return False
+        if isinstance(error, (aiohttp.ClientConnectionError, asyncio.TimeoutError)):
+            return True
+        if isinstance(error, _exception.HTTPError):
+            return error.status_code in self.retry_statuses
+        return False
+
+    def get_delay(self, attempt: int) -> float:
+        """Get the delay before the next attempt, after ``attempt`` attempts failed."""
+        delay = min(self.base_delay * self.multiplier ** (attempt - 1), self.max_delay)
+        return delay * (1 - self.jitter * random.random())
@@ -1,5 +1,6 @@
 import attr
 import datetime
+import asyncio
 import aiohttp
 import random
 import re
@@ -9,6 +10,7 @@ import time
 import errno
 import string
 import urllib.request
+import weakref
 from yarl import URL
 from http.cookies import SimpleCookie, BaseCookie
 
@@ -16,10 +18,20 @@ from http.cookies import SimpleCookie, BaseCookie
 # Or maybe just replace usage with `html.parser`?
 import bs4
 
-from ._common import log, req_log, kw_only
-from . import _graphql, _util, _exception
-
-from typing import Optional, Mapping, Callable, Any, Awaitable, Dict, List, NamedTuple
+from ._common import log, req_log, kw_only, attrs_default
+from . import _graphql, _util, _exception, _ratelimit, _retry, _outbox
+
+from typing import (
+    Optional,
+    Mapping,
+    Callable,
+    Any,
+    Awaitable,
+    Dict,
+    List,
+    NamedTuple,
+    Tuple,
+)
 
 try:
     from aiohttp_socks import ProxyType, ProxyConnector, ProxyTimeoutError
@@ -27,15 +39,17 @@ except ImportError:
     ProxyType = None
     ProxyConnector = None
 
-
     class ProxyTimeoutError(Exception):
         pass
 
-SERVER_JS_DEFINE_REGEX = re.compile(r'(?:'
-                                    r'\(new ServerJS\(\)\)(?:;s)?'
-                                    r'|\(require\("ServerJS(?:Define)?"\)\)\(\)'
-                                    r').handle(?:Defines|WithCustomApplyEach)?\('
-                                    r'(?:ScheduledApplyEach,)?')
+
+SERVER_JS_DEFINE_REGEX = re.compile(
+    r"(?:"
+    r"\(new ServerJS\(\)\)(?:;s)?"
+    r'|\(require\("ServerJS(?:Define)?"\)\)\(\)'
+    r").handle(?:Defines|WithCustomApplyEach)?\("
+    r"(?:ScheduledApplyEach,)?"
+)
 SERVER_JS_DEFINE_JSON_DECODER = json.JSONDecoder()
 
 
@@ -64,7 +78,9 @@ def parse_server_js_define(html: str) -> Mapping[str, Any]:
 
     if not define_splits:
         file_name = write_html_to_temp(html)
-        raise _exception.ParseError("Could not find any ServerJSDefine", data_file=file_name)
+        raise _exception.ParseError(
+            "Could not find any ServerJSDefine", data_file=file_name
+        )
     # if len(define_splits) > 2:
     #     file_name = write_html_to_temp(html)
     #     raise _exception.ParseError("Found too many ServerJSDefine", data_file=file_name)
@@ -72,18 +88,22 @@ def parse_server_js_define(html: str) -> Mapping[str, Any]:
         parsed, _ = SERVER_JS_DEFINE_JSON_DECODER.raw_decode(define_splits[0], idx=0)
     except json.JSONDecodeError as e:
         file_name = write_html_to_temp(html)
-        raise _exception.ParseError("Invalid ServerJSDefine: not json", data_file=file_name) from e
+        raise _exception.ParseError(
+            "Invalid ServerJSDefine: not json", data_file=file_name
+        ) from e
     try:
         rtn = parsed["define"]
     except KeyError:
         file_name = write_html_to_temp(html)
-        raise _exception.ParseError("Invalid ServerJSDefine: missing define key",
-                                    data_file=file_name)
+        raise _exception.ParseError(
+            "Invalid ServerJSDefine: missing define key", data_file=file_name
+        )
 
     if not isinstance(rtn, list):
         file_name = write_html_to_temp(html)
-        raise _exception.ParseError("Invalid ServerJSDefine: define value is not a list",
-                                    data_file=file_name)
+        raise _exception.ParseError(
+            "Invalid ServerJSDefine: define value is not a list", data_file=file_name
+        )
 
     # Convert to a dict
     return _util.get_jsmods_define(rtn)
@@ -161,29 +181,94 @@ def get_user_id(domain: str, session: aiohttp.ClientSession) -> str:
     try:
         rtn = session.cookie_jar.filter_cookies(URL(f"https://{domain}")).get("c_user")
     except (AttributeError, KeyError):
-        raise _exception.ParseError("Could not find user id", data=session.cookie_jar._cookies)
+        raise _exception.ParseError(
+            "Could not find user id", data=session.cookie_jar._cookies
+        )
     if rtn is None:
-        raise _exception.ParseError("Could not find user id", data=session.cookie_jar._cookies)
+        raise _exception.ParseError(
+            "Could not find user id", data=session.cookie_jar._cookies
+        )
     return rtn if isinstance(rtn, str) else str(rtn.value)
 
 
-def session_factory(domain: str, user_agent: Optional[str] = None) -> aiohttp.ClientSession:
+@attrs_default
+class ConnectionOptions:
+    """Timeouts and connection pool settings of the HTTP client of a `Session`.
+
+    Example:
+        Share one connection pool between many sessions.
+
+        >>> connector = aiohttp.TCPConnector(limit=500)
+        >>> options = fbchat.ConnectionOptions(connector=connector, read_timeout=30)
+        >>> session = fbchat.Session.from_cookies(cookies, connection_options=options)
+    """
+
+    #: Max. time for a whole request, in seconds. ``None`` means no limit
+    total_timeout: Optional[float] = None
+    #: Max. time to wait for a connection to be made, in seconds
+    connect_timeout: Optional[float] = 30
+    #: Max. time to wait for more data from Facebook, in seconds
+    read_timeout: Optional[float] = 60
+    #: Max. number of open connections
+    limit: int = 100
+    #: Max. number of open connections to one host. ``0`` means no limit
+    limit_per_host: int = 0
+    #: How long to keep idle connections open, in seconds
+    keepalive_timeout: float = 15
+    #: How long to cache DNS lookups, in seconds. ``None`` caches them forever
+    dns_cache_ttl: Optional[int] = 10
+    #: A connector to share between sessions. The pool settings above are ignored,
+    #: and the connector isn't closed with the session
+    connector: Optional[aiohttp.BaseConnector] = None
+
+    def _get_timeout(self) -> aiohttp.ClientTimeout:
+        return aiohttp.ClientTimeout(
+            total=self.total_timeout,
+            sock_connect=self.connect_timeout,
+            sock_read=self.read_timeout,
+        )
+
+    def _get_connector_kwargs(self) -> Mapping[str, Any]:
+        return {
+            "limit": self.limit,
+            "limit_per_host": self.limit_per_host,
+            "keepalive_timeout": self.keepalive_timeout,
+            "ttl_dns_cache": self.dns_cache_ttl,
+        }
+
+
+def session_factory(
+    domain: str,
+    user_agent: Optional[str] = None,
+    options: Optional[ConnectionOptions] = None,
+) -> aiohttp.ClientSession:
     from . import __version__
-    connector = None
-    try:
-        http_proxy = urllib.request.getproxies()["http"]
-    except KeyError:
-        pass
-    else:
-        if ProxyConnector:
-            connector = ProxyConnector.from_url(http_proxy)
+
+    options = options or ConnectionOptions()
+    connector = options.connector
+    if connector is None:
+        try:
+            http_proxy = urllib.request.getproxies()["http"]
+        except KeyError:
+            pass
         else:
-            log.warning("http_proxy is set, but aiohttp-socks is not installed")
-    return aiohttp.ClientSession(connector=connector,
-                                 headers={
-                                     "Referer": f"https://www.{domain}/",
-                                     "User-Agent": user_agent or f"fbchat-asyncio/{__version__}",
-                                 })
+            if ProxyConnector:
+                connector = ProxyConnector.from_url(
+                    http_proxy, **options._get_connector_kwargs()
+                )
+            else:
+                log.warning("http_proxy is set, but aiohttp-socks is not installed")
+    if connector is None:
+        connector = aiohttp.TCPConnector(**options._get_connector_kwargs())
+    return aiohttp.ClientSession(
+        connector=connector,
+        connector_owner=options.connector is None,
+        timeout=options._get_timeout(),
+        headers={
+            "Referer": f"https://www.{domain}/",
+            "User-Agent": user_agent or f"fbchat-asyncio/{__version__}",
+        },
+    )
 
 
 def login_cookies(at: datetime.datetime):
@@ -191,7 +276,7 @@ def login_cookies(at: datetime.datetime):
 
 
 def client_id_factory() -> str:
-    return hex(int(random.random() * 2 ** 31))[2:]
+    return hex(int(random.random() * 2**31))[2:]
 
 
 def find_form_request(html: str):
@@ -218,8 +303,11 @@ def find_form_request(html: str):
     return url, data
 
 
-async def two_factor_helper(session: aiohttp.ClientSession, r: aiohttp.ClientResponse,
-                            on_2fa_callback: Callable[[], Awaitable[int]]) -> str:
+async def two_factor_helper(
+    session: aiohttp.ClientSession,
+    r: aiohttp.ClientResponse,
+    on_2fa_callback: Callable[[], Awaitable[int]],
+) -> str:
     url, data = find_form_request(await r.text())
 
     # You don't have to type a code if your device is already saved
@@ -227,8 +315,9 @@ async def two_factor_helper(session: aiohttp.ClientSession, r: aiohttp.ClientRes
     while "approvals_code" in data:
         data["approvals_code"] = await on_2fa_callback()
         log.info("Submitting 2FA code")
-        r = await session.post(url, data=data, allow_redirects=False,
-                               cookies=login_cookies(_util.now()))
+        r = await session.post(
+            url, data=data, allow_redirects=False, cookies=login_cookies(_util.now())
+        )
         log.debug("2FA location: %s", r.headers.get("Location"))
         url, data = find_form_request(await r.text())
 
@@ -236,8 +325,9 @@ async def two_factor_helper(session: aiohttp.ClientSession, r: aiohttp.ClientRes
     if "name_action_selected" in data:
         data["name_action_selected"] = "save_device"
         log.info("Saving browser")
-        r = await session.post(url, data=data, allow_redirects=False,
-                               cookies=login_cookies(_util.now()))
+        r = await session.post(
+            url, data=data, allow_redirects=False, cookies=login_cookies(_util.now())
+        )
         log.debug("2FA location: %s", r.headers.get("Location"))
         url = r.headers.get("Location")
         if url and url.startswith("https://www.messenger.com/login/auth_token/"):
@@ -245,8 +335,9 @@ async def two_factor_helper(session: aiohttp.ClientSession, r: aiohttp.ClientRes
         url, data = find_form_request(await r.text())
 
     log.info("Starting Facebook checkup flow")
-    r = await session.post(url, data=data, allow_redirects=False,
-                           cookies=login_cookies(_util.now()))
+    r = await session.post(
+        url, data=data, allow_redirects=False, cookies=login_cookies(_util.now())
+    )
     log.debug("2FA location: %s", r.headers.get("Location"))
 
     url, data = find_form_request(await r.text())
@@ -260,8 +351,9 @@ async def two_factor_helper(session: aiohttp.ClientSession, r: aiohttp.ClientRes
     del data["submit[This wasn't me]"]
     log.info("Verifying login attempt")
 
-    r = await session.post(url, data=data, allow_redirects=False,
-                           cookies=login_cookies(_util.now()))
+    r = await session.post(
+        url, data=data, allow_redirects=False, cookies=login_cookies(_util.now())
+    )
     log.debug("2FA location: %s", r.headers.get("Location"))
 
     url, data = find_form_request(await r.text())
@@ -270,8 +362,9 @@ async def two_factor_helper(session: aiohttp.ClientSession, r: aiohttp.ClientRes
     data["name_action_selected"] = "save_device"
     log.info("Saving device again")
 
-    r = await session.post(url, data=data, allow_redirects=False,
-                           cookies=login_cookies(_util.now()))
+    r = await session.post(
+        url, data=data, allow_redirects=False, cookies=login_cookies(_util.now())
+    )
     log.debug("2FA location: %s", r.headers.get("Location"))
     return r.headers.get("Location")
 
@@ -317,10 +410,49 @@ class Session:
     _session: aiohttp.ClientSession = attr.ib(factory=session_factory)
     _counter: int = 0
     _client_id: str = attr.ib(factory=client_id_factory)
+    _graphql_batcher: Optional[_graphql.GraphQLBatcher] = None
+    #: Limits the rate of requests to each endpoint, if set
+    rate_limiter: Optional[_ratelimit.RateLimiter] = None
+    #: How to retry failed requests. Use ``RetryPolicy(max_attempts=1)`` to not retry
+    retry_policy: _retry.RetryPolicy = attr.ib(factory=_retry.RetryPolicy)
+    #: How to retry failed requests that send messages. Messages are resent with the
+    #: same offline threading ID, so they're retried as if the policy was
+    #: ``idempotent``
+    send_retry_policy: _retry.RetryPolicy = attr.ib(
+        factory=lambda: _retry.RetryPolicy(idempotent=False)
+    )
+    #: Queues sent messages, to keep them in order within each thread
+    outbox: Optional[_outbox.Outbox] = None
+    #: Parse received messages as `LazyMessageData`
+    lazy_messages: bool = False
+    #: Share one `User` or `Group` object per ID between parsed events, instead of
+    #: creating new ones for every event
+    intern_threads: bool = False
+    _interned: "weakref.WeakValueDictionary[Tuple[type, str], Any]" = attr.ib(
+        factory=weakref.WeakValueDictionary, init=False
+    )
+    _pending_sends: Dict[str, asyncio.Future] = attr.ib(factory=dict, init=False)
 
     def _prefix_url(self, path: str) -> URL:
         return prefix_url(self.domain, path)
 
+    def _intern(self, cls: type, id: str) -> Any:
+        """Get a thread handle like ``cls(session=self, id=id)``.
+
+        With `Session.intern_threads`, handles that are still in use are reused.
+        """
+        id = str(id)
+        if not self.intern_threads:
+            return cls(session=self, id=id)
+        key = (cls, id)
+        try:
+            return self._interned[key]
+        except KeyError:
+            pass
+        handle = cls(session=self, id=id)
+        self._interned[key] = handle
+        return handle
+
     @property
     def user(self):
         """The logged in user."""
@@ -344,9 +476,14 @@ class Session:
         }
 
     @classmethod
-    async def login(cls, email: str, password: str,
-                    on_2fa_callback: Callable[[], Awaitable[int]] = None,
-                    user_agent: Optional[str] = None) -> 'Session':
+    async def login(
+        cls,
+        email: str,
+        password: str,
+        on_2fa_callback: Callable[[], Awaitable[int]] = None,
+        user_agent: Optional[str] = None,
+        connection_options: Optional[ConnectionOptions] = None,
+    ) -> "Session":
         """Login the user, using ``email`` and ``password``.
 
         Args:
@@ -362,6 +499,7 @@ class Session:
                 Note: Facebook limits the amount of codes they will give you, so if you
                 don't receive a code, be patient, and try again later!
             user_agent: The user agent to send to Facebook
+            connection_options: Timeouts and connection pool settings
 
         Example:
             >>> import fbchat
@@ -377,7 +515,9 @@ class Session:
             >>> session.user.id
             "1234"
         """
-        session = session_factory(domain="messenger.com", user_agent=user_agent)
+        session = session_factory(
+            domain="messenger.com", user_agent=user_agent, options=connection_options
+        )
 
         data = {
             # "jazoest": "2754",
@@ -426,18 +566,24 @@ class Session:
             if not url.startswith("https://www.facebook.com/checkpoint/start/"):
                 raise _exception.ParseError("Failed 2fa flow (1)", data=url)
 
-            r = await session.get(url, allow_redirects=False, cookies=login_cookies(_util.now()))
+            r = await session.get(
+                url, allow_redirects=False, cookies=login_cookies(_util.now())
+            )
             url = r.headers.get("Location")
             if not url or not url.startswith("https://www.facebook.com/checkpoint/"):
                 raise _exception.ParseError("Failed 2fa flow (2)", data=url)
 
-            r = await session.get(url, allow_redirects=False, cookies=login_cookies(_util.now()))
+            r = await session.get(
+                url, allow_redirects=False, cookies=login_cookies(_util.now())
+            )
             url = await two_factor_helper(session, r, on_2fa_callback)
 
             if not url.startswith("https://www.messenger.com/login/auth_token/"):
                 raise _exception.ParseError("Failed 2fa flow (3)", data=url)
 
-            r = await session.get(url, allow_redirects=False, cookies=login_cookies(_util.now()))
+            r = await session.get(
+                url, allow_redirects=False, cookies=login_cookies(_util.now())
+            )
             url = r.headers.get("Location")
 
         if url != "https://www.messenger.com/":
@@ -460,16 +606,20 @@ class Session:
         """
         # Send a request to the login url, to see if we're directed to the home page
         try:
-            r = await self._session.get(self._prefix_url("/login/"), allow_redirects=False)
+            r = await self._session.get(
+                self._prefix_url("/login/"), allow_redirects=False
+            )
         except aiohttp.ClientError as e:
             _exception.handle_requests_error(e)
             raise Exception("handle_requests_error did not raise exception")
         _exception.handle_http_error(r.status)
         location = r.headers.get("Location")
-        return location in (f"https://www.{self.domain}/",
-                            # We include this as a "logged in" status, since the user is logged in,
-                            # but needs to verify the session elsewhere
-                            f"https://www.{self.domain}/checkpoint/block/")
+        return location in (
+            f"https://www.{self.domain}/",
+            # We include this as a "logged in" status, since the user is logged in,
+            # but needs to verify the session elsewhere
+            f"https://www.{self.domain}/checkpoint/block/",
+        )
 
     async def logout(self) -> None:
         """Safely log out the user.
@@ -500,16 +650,21 @@ class Session:
             )
 
     @classmethod
-    async def _from_session(cls, session: aiohttp.ClientSession, domain: str
-                            ) -> Optional['Session']:
+    async def _from_session(
+        cls, session: aiohttp.ClientSession, domain: str
+    ) -> Optional["Session"]:
         # TODO: Automatically set user_id when the cookie changes in the session
         user_id = get_user_id(domain, session)
 
         # Make a request to the main page to retrieve ServerJSDefine entries
         try:
-            r = await session.get(prefix_url(domain, "/"), allow_redirects=True, headers={
-                "Accept": "text/html",
-            })
+            r = await session.get(
+                prefix_url(domain, "/"),
+                allow_redirects=True,
+                headers={
+                    "Accept": "text/html",
+                },
+            )
         except aiohttp.ClientError as e:
             _exception.handle_requests_error(e)
             raise Exception("handle_requests_error did not raise exception")
@@ -517,7 +672,9 @@ class Session:
 
         html = await r.text()
         if len(html) == 0:
-            raise _exception.FacebookError("Got empty response when trying to check login")
+            raise _exception.FacebookError(
+                "Got empty response when trying to check login"
+            )
 
         define = parse_server_js_define(html)
 
@@ -535,13 +692,21 @@ class Session:
             raise _exception.ParseError("Could not find client revision", data=define)
         onion = None
         alt_svc_data = parse_alt_svc(r)
-        if "h2" in alt_svc_data and alt_svc_data["h2"].alt_authority.endswith(".onion:443"):
+        if "h2" in alt_svc_data and alt_svc_data["h2"].alt_authority.endswith(
+            ".onion:443"
+        ):
             # TODO remember expiry too?
             onion = alt_svc_data["h2"].alt_authority
             log.info("Got onion alt-svc %s", onion)
 
-        return cls(user_id=user_id, fb_dtsg=fb_dtsg, revision=revision, session=session,
-                   domain=domain, onion=onion)
+        return cls(
+            user_id=user_id,
+            fb_dtsg=fb_dtsg,
+            revision=revision,
+            session=session,
+            domain=domain,
+            onion=onion,
+        )
 
     def get_cookies(self) -> Optional[Mapping[str, str]]:
         """Retrieve session cookies, that can later be used in `from_cookies`.
@@ -556,19 +721,29 @@ class Session:
         return {key: morsel.value for key, morsel in cookie.items()}
 
     @classmethod
-    async def from_cookies(cls, cookies: Mapping[str, str], user_agent: Optional[str] = None,
-                           domain: str = "messenger.com") -> 'Session':
+    async def from_cookies(
+        cls,
+        cookies: Mapping[str, str],
+        user_agent: Optional[str] = None,
+        domain: str = "messenger.com",
+        connection_options: Optional[ConnectionOptions] = None,
+    ) -> "Session":
         """Load a session from session cookies.
 
         Args:
             cookies: A dictionary containing session cookies
+            user_agent: The user agent to send to Facebook
+            domain: The domain to connect to, ``messenger.com`` or ``facebook.com``
+            connection_options: Timeouts and connection pool settings
 
         Example:
             >>> cookies = session.get_cookies()
             >>> # Store cookies somewhere, and then subsequently
             >>> session = fbchat.Session.from_cookies(cookies)
         """
-        session = session_factory(domain=domain, user_agent=user_agent)
+        session = session_factory(
+            domain=domain, user_agent=user_agent, options=connection_options
+        )
 
         if isinstance(cookies, BaseCookie):
             cookie = cookies
@@ -581,7 +756,118 @@ class Session:
 
         return await cls._from_session(session=session, domain=domain)
 
-    async def _post(self, url, data, files=None, as_graphql=False):
+    def enable_graphql_batching(self, window: float = 0.005, max_batch_size: int = 50):
+        """Send GraphQL queries from concurrent requests together.
+
+        Queries made within ``window`` seconds of each other are sent in one request,
+        with at most ``max_batch_size`` queries per request. Errors in one query only
+        affect the request that made it.
+
+        Args:
+            window: How long to wait for more queries, in seconds
+            max_batch_size: Max. number of queries to send in one request
+
+        Example:
+            >>> session.enable_graphql_batching(window=0.01)
+        """
+        self._graphql_batcher = _graphql.GraphQLBatcher(
+            send=self._graphql_batch, window=window, max_batch_size=max_batch_size
+        )
+
+    def disable_graphql_batching(self) -> None:
+        """Send every GraphQL request on its own again."""
+        self._graphql_batcher = None
+
+    async def _refresh(self) -> None:
+        """Fetch a new ``fb_dtsg``, after Facebook told us to refresh the page."""
+        session = await self._from_session(session=self._session, domain=self.domain)
+        self._fb_dtsg = session._fb_dtsg
+        self._revision = session._revision
+
+    async def _post(
+        self,
+        url,
+        data,
+        files=None,
+        as_graphql=False,
+        graphql_errors=False,
+        check_payload=False,
+        graphql_count=None,
+    ):
+        return await self._retry(
+            url,
+            lambda: self._post_once(
+                url,
+                data,
+                files,
+                as_graphql,
+                graphql_errors,
+                check_payload,
+                graphql_count,
+            ),
+            files=files,
+        )
+
+    async def _retry(self, url, make_request, files=None, policy=None, confirmed=None):
+        if policy is None and URL(url).path in _ratelimit.SEND_PATHS:
+            policy = self.send_retry_policy
+        elif policy is None:
+            policy = self.retry_policy
+        loop = asyncio.get_event_loop()
+        start = loop.time()
+        attempt = 1
+        while True:
+            request = make_request()
+            try:
+                if policy.deadline is None:
+                    return await request
+                remaining = policy.deadline - (loop.time() - start)
+                return await asyncio.wait_for(request, max(remaining, 0))
+            except (
+                aiohttp.ClientError,
+                ProxyTimeoutError,
+                asyncio.TimeoutError,
+                _exception.FacebookError,
+            ) as e:
+                if confirmed is not None and confirmed.done():
+                    return confirmed.result()  # It was sent after all
+                delay = policy.get_delay(attempt)
+                give_up = (
+                    files  # The files may not be readable again
+                    or attempt >= policy.max_attempts
+                    or not policy.should_retry(e)
+                    or (
+                        policy.deadline is not None
+                        and loop.time() - start + delay >= policy.deadline
+                    )
+                )
+                if give_up:
+                    if isinstance(e, aiohttp.ClientError):
+                        _exception.handle_requests_error(e)
+                        raise Exception("handle_requests_error did not raise exception")
+                    elif isinstance(e, asyncio.TimeoutError):
+                        raise _exception.HTTPError("Request timed out") from e
+                    raise
+                log.warning(
+                    "Request to %s failed (%s), retrying in %.1f seconds (attempt %d)",
+                    url,
+                    e,
+                    delay,
+                    attempt,
+                )
+                if isinstance(e, _exception.PleaseRefresh):
+                    await self._refresh()
+                if confirmed is None:
+                    await asyncio.sleep(delay)
+                else:
+                    # Don't resend if the message arrives while waiting
+                    try:
+                        return await asyncio.wait_for(asyncio.shield(confirmed), delay)
+                    except asyncio.TimeoutError:
+                        pass
+                attempt += 1
+
+    async def _open(self, url, data, files=None) -> aiohttp.ClientResponse:
         data.update(self._get_params())
         if files:
             payload = aiohttp.FormData()
@@ -598,39 +884,54 @@ class Session:
             kwargs["ssl"] = False
             kwargs["headers"] = {"Host": real_url.host}
             kwargs["cookies"] = self._session.cookie_jar.filter_cookies(real_url)
-            real_url = real_url.with_host(real_url.host.replace(self.domain, self._onion))
-        attempt = 1
-        while True:
-            try:
-                r = await self._session.post(real_url, data=data, **kwargs)
-                break
-            except aiohttp.ClientError as e:
-                _exception.handle_requests_error(e)
-                raise Exception("handle_requests_error did not raise exception")
-            except ProxyTimeoutError:
-                if attempt >= 3:
-                    raise
-                log.warning("Got ProxyTimeoutError, retrying...")
-                attempt += 1
-        _exception.handle_http_error(r.status)
-        text = await r.text()
-        if text is None or len(text) == 0:
+            real_url = real_url.with_host(
+                real_url.host.replace(self.domain, self._onion)
+            )
+        if self.rate_limiter:
+            await self.rate_limiter.acquire(url)
+        r = await self._session.post(real_url, data=data, **kwargs)
+        if self.rate_limiter:
+            self.rate_limiter.record(url, status=r.status)
+        try:
+            _exception.handle_http_error(r.status)
+        except _exception.HTTPError:
+            r.release()
+            raise
+        return r
+
+    async def _post_once(
+        self,
+        url,
+        data,
+        files,
+        as_graphql,
+        graphql_errors,
+        check_payload,
+        graphql_count=None,
+    ):
+        r = await self._open(url, data, files)
+        text = await r.read()
+        if not text:
             raise _exception.HTTPError("Error when sending request: Got empty response")
         if as_graphql:
-            return _graphql.response_to_json(text)
-        else:
-            text = _util.strip_json_cruft(text)
-            j = _util.parse_json(text)
-            log.debug(j)
-            return j
+            return _graphql.response_to_json(
+                text, return_errors=graphql_errors, count=graphql_count
+            )
+        text = _util.strip_json_cruft(text)
+        j = _util.parse_json(text)
+        log.debug(j)
+        if check_payload:
+            if self.rate_limiter and "error" in j:
+                self.rate_limiter.record(url, code=j["error"])
+            _exception.handle_payload_error(j)
+        return j
 
     async def _payload_post(self, url, data, files=None):
         if files:
             req_log.debug("POST %s %s with %d files", url, data, len(files))
         else:
             req_log.debug("POST %s %s", url, data)
-        j = await self._post(url, data, files=files)
-        _exception.handle_payload_error(j)
+        j = await self._post(url, data, files=files, check_payload=True)
 
         # update fb_dtsg token if received in response
         if "jsmods" in j:
@@ -644,20 +945,87 @@ class Session:
         except (KeyError, TypeError) as e:
             raise _exception.ParseError("Missing payload", data=j) from e
 
-    async def _graphql_requests(self, *queries):
+    async def _graphql_requests(self, *queries, return_errors=False):
         # TODO: Explain usage of GraphQL, probably in the docs
         # Perhaps provide this API as public?
+        if self._graphql_batcher:
+            return await self._graphql_batcher.request(
+                *queries, return_errors=return_errors
+            )
+        return await self._graphql_batch(*queries, return_errors=return_errors)
+
+    async def _graphql_stream(self, *queries, return_errors=False):
+        """Make GraphQL queries in one request, and yield ``(index, result)`` pairs.
+
+        The results are yielded as they arrive, in the order Facebook sends them.
+        Only opening the response is retried, since results may have been yielded
+        by the time reading it fails.
+
+        With `Session.enable_graphql_batching`, the queries go through the batcher
+        instead, and are yielded as each batch is done.
+        """
+        if self._graphql_batcher:
+            async for result in self._graphql_batcher.stream(
+                *queries, return_errors=return_errors
+            ):
+                yield result
+            return
+        data = {
+            "method": "GET",
+            "response_format": "json",
+            "queries": _graphql.queries_to_json(*queries),
+        }
+        req_log.debug("Streaming GraphQL queries: %s", queries)
+        url = "/api/graphqlbatch/"
+        r = await self._retry(url, lambda: self._open(url, dict(data)))
+        remaining = len(queries)
+        try:
+            async for x in _graphql.iter_json_stream(r.content):
+                result = _graphql._parse_result(x, return_errors)
+                if result is None:
+                    continue
+                yield result
+                remaining -= 1
+                if remaining == 0:
+                    break
+        except aiohttp.ClientError as e:
+            _exception.handle_requests_error(e)
+        except asyncio.TimeoutError as e:
+            raise _exception.HTTPError("Request timed out") from e
+        finally:
+            r.release()
+
+    async def _graphql_batch(self, *queries, return_errors=True):
         data = {
             "method": "GET",
             "response_format": "json",
             "queries": _graphql.queries_to_json(*queries),
         }
         req_log.debug("Making GraphQL queries: %s", queries)
-        return await self._post("/api/graphqlbatch/", data, as_graphql=True)
+        return await self._post(
+            "/api/graphqlbatch/",
+            data,
+            as_graphql=True,
+            graphql_errors=return_errors,
+            graphql_count=len(queries),
+        )
+
+    async def _do_send_request(self, data, offline_threading_id=None):
+        if self.outbox is None:
+            return await self._send_now(data, offline_threading_id)
+        # The thread the message is sent to, see ThreadABC._to_send_data
+        thread_id = data.get("thread_fbid") or data.get("other_user_fbid")
+        return await self.outbox.send(
+            thread_id, lambda: self._send_now(data, offline_threading_id)
+        )
 
-    async def _do_send_request(self, data):
+    async def _send_now(self, data, offline_threading_id=None):
         now = _util.now()
-        offline_threading_id = _util.generate_offline_threading_id()
+        if offline_threading_id is None:
+            offline_threading_id = _util.generate_offline_threading_id()
+        # The ID is fixed before the first attempt, and Facebook recognizes a message
+        # that's resent with the same ID
+        policy = attr.evolve(self.send_retry_policy, idempotent=True)
         data["client"] = "mercury"
         data["author"] = "fbid:{}".format(self._user_id)
         data["timestamp"] = _util.datetime_to_millis(now)
@@ -668,9 +1036,25 @@ class Session:
         data["ephemeral_ttl_mode:"] = "0"
         req_log.debug("POST /messaging/send/ <data redacted>")
         req_log.log(5, "Message data: %s", data)
-        j = await self._post("/messaging/send/", data)
 
-        _exception.handle_payload_error(j)
+        # Resolved by `Session._confirm_send` if a listener sees the message arrive
+        confirmed = asyncio.get_event_loop().create_future()
+        self._pending_sends[offline_threading_id] = confirmed
+        try:
+            return await self._retry(
+                "/messaging/send/",
+                lambda: self._send_once(data),
+                policy=policy,
+                confirmed=confirmed,
+            )
+        finally:
+            if self._pending_sends.get(offline_threading_id) is confirmed:
+                del self._pending_sends[offline_threading_id]
+
+    async def _send_once(self, data):
+        j = await self._post_once(
+            "/messaging/send/", data, None, False, False, check_payload=True
+        )
 
         try:
             message_ids = [
@@ -683,3 +1067,11 @@ class Session:
             return message_ids[0]
         except (KeyError, IndexError, TypeError) as e:
             raise _exception.ParseError("No message IDs could be found", data=j) from e
+
+    def _confirm_send(
+        self, offline_threading_id: str, message_id: str, thread_id: str
+    ) -> None:
+        confirmed = self._pending_sends.get(offline_threading_id)
+        if confirmed is not None and not confirmed.done():
+            log.debug("Message %s was confirmed by the listener", offline_threading_id)
+            confirmed.set_result((message_id, thread_id))
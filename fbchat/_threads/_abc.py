@@ -4,8 +4,20 @@ import collections
 import datetime
 from .._common import log, attrs_default
 from .. import _util, _exception, _session, _graphql, _models
-from typing import MutableMapping, Mapping, Any, Iterable, Tuple, Optional, AsyncGenerator
+from typing import (
+    MutableMapping,
+    Mapping,
+    Any,
+    Iterable,
+    List,
+    Tuple,
+    Optional,
+    AsyncGenerator,
+)
 
+# Max. number of messages to fetch in one request. This is measured empirically as
+# 210 in extreme cases, fairly safe default chosen below
+MESSAGES_BATCH_LIMIT = 100
 
 DEFAULT_COLOR = "#0084ff"
 SETABLE_COLORS = (
@@ -105,6 +117,7 @@ class ThreadABC(metaclass=abc.ABCMeta):
         mentions: Iterable["_models.Mention"] = None,
         files: Iterable[Tuple[str, str]] = None,
         reply_to_id: str = None,
+        offline_threading_id: str = None,
     ) -> str:
         """Send a message to the thread.
 
@@ -114,6 +127,9 @@ class ThreadABC(metaclass=abc.ABCMeta):
             files: Optional tuples, each containing an uploaded file's ID and mimetype.
                 See `ThreadABC.send_files` for an example.
             reply_to_id: Optional message to reply to
+            offline_threading_id: Optional ID from `generate_offline_threading_id`.
+                Sending again with the same ID won't create a duplicate message, so
+                the send is retried after timeouts, and can safely be repeated.
 
         Example:
             Send a message with a mention to a thread.
@@ -125,6 +141,11 @@ class ThreadABC(metaclass=abc.ABCMeta):
 
             >>> thread.send_text("A reply", reply_to_id=message_id)
 
+            Send a message that can be resent without creating a duplicate.
+
+            >>> offline_threading_id = fbchat.generate_offline_threading_id()
+            >>> thread.send_text("Once", offline_threading_id=offline_threading_id)
+
         Returns:
             The sent message
         """
@@ -145,7 +166,7 @@ class ThreadABC(metaclass=abc.ABCMeta):
         if reply_to_id:
             data["replied_to_message_id"] = reply_to_id
 
-        return await self.session._do_send_request(data)
+        return await self.session._do_send_request(data, offline_threading_id)
 
     async def send_emoji(self, emoji: str, size: "_models.EmojiSize") -> str:
         """Send an emoji to the thread.
@@ -221,10 +242,13 @@ class ThreadABC(metaclass=abc.ABCMeta):
         """
         return await self._send_location(False, latitude=latitude, longitude=longitude)
 
-    async def send_files(self, files: Iterable[Tuple[str, str]]):
+    async def send_files(
+        self, files: Iterable[Tuple[str, str]], offline_threading_id: str = None
+    ):
         """Send files from file IDs to a thread.
 
         `files` should be a list of tuples, with a file's ID and mimetype.
+        ``offline_threading_id`` works like in `ThreadABC.send_text`.
 
         Example:
             Upload and send a video to a thread.
@@ -234,7 +258,9 @@ class ThreadABC(metaclass=abc.ABCMeta):
             >>>
             >>> thread.send_files(files)
         """
-        return await self.send_text(text=None, files=files)
+        return await self.send_text(
+            text=None, files=files, offline_threading_id=offline_threading_id
+        )
 
     # xmd = {"quick_replies": []}
     # for quick_reply in quick_replies:
@@ -350,7 +376,7 @@ class ThreadABC(metaclass=abc.ABCMeta):
                 return  # No more data to fetch
             offset += limit
 
-    async def _fetch_messages(self, limit, before):
+    def _messages_query(self, limit, before):
         params = {
             "id": self.id,
             "message_limit": limit,
@@ -360,16 +386,18 @@ class ThreadABC(metaclass=abc.ABCMeta):
             # "is_work_teamwork_not_putting_muted_in_unreads": False,
             "before": _util.datetime_to_millis(before) if before else None,
         }
-        (j,) = await self.session._graphql_requests(
-            _graphql.from_doc_id("1860982147341344", params)  # 2696825200377124
-        )
+        return _graphql.from_doc_id("1860982147341344", params)  # 2696825200377124
 
+    def _parse_messages(self, j):
         if j.get("message_thread") is None:
             raise _exception.ParseError("Could not fetch messages", data=j)
 
         # TODO: Should we parse the returned thread data, too?
 
-        read_receipts = j["message_thread"]["read_receipts"]["nodes"]
+        # Sorted once for the whole page, instead of being scanned for every message
+        read_receipts = _models.ReadReceiptIndex._from_graphql(
+            j["message_thread"]["read_receipts"]["nodes"]
+        )
 
         thread = self._copy()
         return [
@@ -377,7 +405,29 @@ class ThreadABC(metaclass=abc.ABCMeta):
             for message in j["message_thread"]["messages"]["nodes"]
         ]
 
-    async def fetch_messages(self, limit: Optional[int]
+    async def _fetch_messages(self, limit, before):
+        (j,) = await self.session._graphql_requests(self._messages_query(limit, before))
+        return self._parse_messages(j)
+
+    async def _fetch_message_pages(
+        self, limit: Optional[int], before: Optional[datetime.datetime] = None
+    ) -> AsyncGenerator[List["_models.MessageData"], None]:
+        for limit in _util.get_limits(limit, MESSAGES_BATCH_LIMIT):
+            messages = await self._fetch_messages(limit, before)
+            messages.reverse()
+
+            if before:
+                # Strip the first message, it was the last one of the previous page
+                yield messages[1:]
+            else:
+                yield messages
+
+            if len(messages) < MESSAGES_BATCH_LIMIT:
+                return  # No more data to fetch
+
+            before = messages[-1].created_at
+
+    async def fetch_messages(self, limit: Optional[int], prefetch: int = 0
                              ) -> AsyncGenerator["_models.MessageData", None]:
         """Fetch messages in a thread.
 
@@ -386,6 +436,9 @@ class ThreadABC(metaclass=abc.ABCMeta):
         Args:
             limit: Max. number of threads to retrieve. If ``None``, all threads will be
                 retrieved.
+            prefetch: How many pages (of up to 100 messages) to fetch in the background
+                while the current one is being iterated. ``0`` only fetches a page when
+                it's needed.
 
         Example:
             >>> for message in thread.fetch_messages(limit=5)
@@ -396,27 +449,12 @@ class ThreadABC(metaclass=abc.ABCMeta):
             None
             A fourth message
         """
-        # This is measured empirically as 210 in extreme cases, fairly safe default
-        # chosen below
-        MAX_BATCH_LIMIT = 100
-
-        before = None
-        for limit in _util.get_limits(limit, MAX_BATCH_LIMIT):
-            messages = await self._fetch_messages(limit, before)
-            messages.reverse()
-
-            if before:
-                # Strip the first messages
-                for message in messages[1:]:
-                    yield message
-            else:
-                for message in messages:
-                    yield message
-
-            if len(messages) < MAX_BATCH_LIMIT:
-                return  # No more data to fetch
-
-            before = messages[-1].created_at
+        pages = self._fetch_message_pages(limit)
+        if prefetch > 0:
+            pages = _util.prefetch(pages, prefetch)
+        async for messages in pages:
+            for message in messages:
+                yield message
 
     async def _fetch_images(self, limit, after):
         data = {"id": self.id, "first": limit, "after": after}
@@ -1,3 +1,4 @@
+import asyncio
 import datetime
 import json
 import time
@@ -7,7 +8,28 @@ import urllib.parse
 from ._common import log
 from . import _exception
 
-from typing import Iterable, Optional, Any, Mapping, Sequence
+from typing import (
+    Iterable,
+    Optional,
+    Any,
+    Mapping,
+    Sequence,
+    AsyncIterator,
+    TypeVar,
+    Callable,
+    Union,
+)
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+T = TypeVar("T")
+
+JSONData = Union[str, bytes]
+
+_json_loads: Callable[[JSONData], Any] = orjson.loads if orjson else json.loads
 
 
 def int_or_none(inp: Any) -> Optional[int]:
@@ -35,27 +57,98 @@ def get_limits(limit: Optional[int], max_limit: int) -> Iterable[int]:
         yield remainder
 
 
+async def prefetch(iterator: AsyncIterator[T], depth: int) -> AsyncIterator[T]:
+    """Consume an async iterator in a background task, ahead of the caller.
+
+    At most ``depth`` items are kept waiting. The order is preserved, and errors are
+    raised to the caller when it reaches them.
+    """
+    if depth < 1:
+        raise ValueError("Prefetch depth must be positive")
+    queue = asyncio.Queue(maxsize=depth)
+    end = object()
+
+    async def produce():
+        try:
+            async for item in iterator:
+                await queue.put((item, None))
+        except Exception as e:
+            await queue.put((end, e))
+        else:
+            await queue.put((end, None))
+
+    task = asyncio.ensure_future(produce())
+    try:
+        while True:
+            item, error = await queue.get()
+            if item is end:
+                if error is not None:
+                    raise error
+                return
+            yield item
+    finally:
+        task.cancel()
+
+
 def json_minimal(data: Any) -> str:
     """Get JSON data in minimal form."""
     return json.dumps(data, separators=(",", ":"))
 
 
-def strip_json_cruft(text: str) -> str:
-    """Removes `for(;;);` (and other cruft) that preceeds JSON responses."""
+def set_json_loads(loads: Optional[Callable[[JSONData], Any]] = None) -> None:
+    """Set the function used to parse JSON from Facebook.
+
+    By default, `orjson <https://github.com/ijl/orjson>`_ is used if it's installed
+    (``pip install fbchat-asyncio[speedups]``), and the standard library otherwise.
+    Data the function fails to parse is retried with the standard library, which
+    is more lenient about things like huge integers and lone surrogates.
+
+    Args:
+        loads: A function like `json.loads`, that accepts both ``str`` and UTF-8
+            ``bytes``. ``None`` restores the default.
+
+    Example:
+        >>> import ujson
+        >>> fbchat.set_json_loads(ujson.loads)
+    """
+    global _json_loads
+    if loads is None:
+        loads = orjson.loads if orjson else json.loads
+    _json_loads = loads
+
+
+def find_json_start(text: JSONData) -> int:
+    """Find where the JSON starts, after `for(;;);` (and other cruft)."""
     try:
-        return text[text.index("{") :]
+        return text.index("{" if isinstance(text, str) else b"{")
     except ValueError as e:
         raise _exception.ParseError("No JSON object found", data=text) from e
 
 
-def parse_json(text: str) -> Any:
+def strip_json_cruft(text: JSONData) -> JSONData:
+    """Removes `for(;;);` (and other cruft) that preceeds JSON responses."""
+    index = find_json_start(text)
+    return text[index:] if index else text
+
+
+def parse_json(text: JSONData) -> Any:
     try:
-        return json.loads(text)
+        return _json_loads(text)
     except ValueError as e:
+        if _json_loads is not json.loads:
+            try:
+                return json.loads(text)
+            except ValueError:
+                pass
         raise _exception.ParseError("Error while parsing JSON", data=text) from e
 
 
-def generate_offline_threading_id():
+def generate_offline_threading_id() -> str:
+    """Generate a client-side ID for a message that's going to be sent.
+
+    Pass it to `ThreadABC.send_text`, and store it if the message may have to be
+    resent, e.g. after a crash.
+    """
     ret = datetime_to_millis(now())
     value = int(random.random() * 4294967295)
     string = ("0000000000000000000000" + format(value, "b"))[-22:]
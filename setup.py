@@ -27,6 +27,7 @@ setuptools.setup(
     ],
     extras_require={
         "proxy": ["aiohttp-socks", "pysocks"],
+        "speedups": ["orjson"],
     },
 
     python_requires="~=3.6",
@@ -2,8 +2,12 @@ import pytest
 import fbchat
 
 
-@pytest.fixture(scope="session")
+@pytest.fixture
 def session():
     return fbchat.Session(
-        user_id="31415926536", fb_dtsg=None, revision=None, session=None
+        user_id="1234",
+        fb_dtsg=None,
+        revision=None,
+        domain="messenger.com",
+        session=None,
     )
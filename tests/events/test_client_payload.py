@@ -1,3 +1,4 @@
+import json
 import datetime
 import pytest
 from fbchat import (
@@ -104,7 +105,10 @@ def test_message_reply(session):
         "body": "xyz",
         "attachments": [],
         "irisSeqId": 1111111,
-        "messageReply": {"replyToMessageId": {"id": "mid.$ABC"}, "status": 0,},
+        "messageReply": {
+            "replyToMessageId": {"id": "mid.$ABC"},
+            "status": 0,
+        },
         "requestContext": {"apiArgs": "..."},
         "irisTags": ["DeltaNewMessage"],
     }
@@ -153,6 +157,31 @@ def test_message_reply(session):
     ) == parse_client_delta(session, {"deltaMessageReply": data})
 
 
+def test_user_status_unknown_reason(session):
+    data = {"deltaChangeViewerStatus": {"reason": 1}}
+    assert UnknownEvent(source="client payload", data=data) == parse_client_delta(
+        session, data
+    )
+
+
+def test_parse_client_delta_registry_order(session):
+    reaction = {
+        "threadKey": {"otherUserFbId": 1234},
+        "messageId": "mid.$XYZ",
+        "action": 1,
+        "userId": 4321,
+        "senderId": 4321,
+        "offlineThreadingId": "6623596674408921967",
+    }
+    # "deltaMessageReaction" is registered before "deltaChangeViewerStatus"
+    data = {"deltaChangeViewerStatus": {"reason": 1}, "deltaMessageReaction": reaction}
+    assert isinstance(parse_client_delta(session, data), ReactionEvent)
+    data = {"deltaChangeViewerStatus": {"reason": 1}, "abc": 10}
+    assert UnknownEvent(source="client payload", data=data) == parse_client_delta(
+        session, data
+    )
+
+
 def test_parse_client_delta_unknown(session):
     assert UnknownEvent(
         source="client payload", data={"abc": 10}
@@ -173,3 +202,30 @@ def test_parse_client_payloads_invalid(session):
     data = {"payload": payload, "class": "ClientPayload"}
     with pytest.raises(ParseError, match="Error parsing ClientPayload"):
         list(parse_client_payloads(session, data))
+
+
+def test_parse_client_payloads_utf8(session):
+    delta = {
+        "deltaMessageReaction": {
+            "threadKey": {"otherUserFbId": 1234},
+            "messageId": "mid.$XYZ",
+            "action": 0,
+            "userId": 4321,
+            "reaction": "😍",
+            "senderId": 4321,
+            "offlineThreadingId": "6623596674408921967",
+        }
+    }
+    # The payload is UTF-8, so the emoji is made of several bytes
+    text = json.dumps({"deltas": [delta]}, ensure_ascii=False)
+    payload = list(text.encode("utf-8"))
+    data = {"payload": payload, "class": "ClientPayload"}
+    thread = User(session=session, id="1234")
+    assert [
+        ReactionEvent(
+            author=User(session=session, id="4321"),
+            thread=thread,
+            message=Message(thread=thread, id="mid.$XYZ"),
+            reaction="😍",
+        )
+    ] == list(parse_client_payloads(session, data))
@@ -39,7 +39,9 @@ def test_t_ms_full(session):
                 "payload": [ord(x) for x in _util.json_minimal(payload)],
                 "class": "ClientPayload",
             },
-            {"class": "NoOp",},
+            {
+                "class": "NoOp",
+            },
             {
                 "forceInsert": False,
                 "messageId": "mid.$ABC",
@@ -60,7 +62,8 @@ def test_t_ms_full(session):
             reaction="😢",
         ),
         UnfetchedThreadEvent(
-            thread=thread, message=Message(thread=thread, id="mid.$ABC"),
+            thread=thread,
+            message=Message(thread=thread, id="mid.$ABC"),
         ),
     ] == list(parse_events(session, "/t_ms", data))
 
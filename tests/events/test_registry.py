@@ -0,0 +1,34 @@
+from fbchat import ParserRegistry, UnknownEvent, Event, DELTA_PARSERS
+from fbchat._events import parse_delta
+
+
+def test_parser_registry(session):
+    registry = ParserRegistry(source="Test")
+    parsed = []
+
+    @registry.register("a")
+    def parse_a(session, data):
+        parsed.append(data)
+        return Event()
+
+    assert "a" in registry
+    assert isinstance(registry.parse(session, "a", {"x": 1}), Event)
+    assert [{"x": 1}] == parsed
+    assert UnknownEvent(source="Test", data={"y": 2}) == registry.parse(
+        session, "b", {"y": 2}
+    )
+    registry.unregister("a")
+    assert "a" not in registry
+    assert isinstance(registry.parse(session, "a", {}), UnknownEvent)
+    assert {"a": 2, "b": 1} == registry.hits
+
+
+def test_delta_parsers_plug_in(session):
+    data = {"class": "SomethingNew", "value": 5}
+    assert isinstance(parse_delta(session, data), UnknownEvent)
+    DELTA_PARSERS.register("SomethingNew", lambda session, data: None)
+    try:
+        assert parse_delta(session, data) is None
+    finally:
+        DELTA_PARSERS.unregister("SomethingNew")
+    assert DELTA_PARSERS.hits["SomethingNew"] >= 2
@@ -1,7 +1,10 @@
+import copy
+import datetime
+import attr
 import pytest
 import fbchat
-from fbchat import EmojiSize, Mention, Message, MessageData
-from fbchat._models._message import graphql_to_extensible_attachment
+from fbchat import EmojiSize, Mention, Message, MessageData, LazyMessageData
+from fbchat._models._message import graphql_to_extensible_attachment, ReadReceiptIndex
 
 
 @pytest.mark.parametrize(
@@ -116,3 +119,139 @@ def test_message_from_reply():
 @pytest.mark.skip(reason="need to gather test data")
 def test_message_from_pull():
     pass
+
+
+def lazy_session(session, lazy):
+    return attr.evolve(session, lazy_messages=lazy)
+
+
+def graphql_message():
+    return {
+        "message_id": "mid.$XYZ",
+        "message_sender": {"id": "4321"},
+        "message": {
+            "text": "Hi @Peter",
+            "ranges": [{"entity": {"id": "5678"}, "offset": 3, "length": 6}],
+        },
+        "timestamp_precise": "1500000000000",
+        "unread": False,
+        "tags_list": ["source:messenger:web"],
+        "message_reactions": [{"user": {"id": "5678"}, "reaction": "😍"}],
+        "replied_to_message": {
+            "message": {
+                "message_id": "mid.$ABC",
+                "message_sender": {"id": "5678"},
+                "message": {"text": "Hello"},
+                "timestamp_precise": "1499999999000",
+                "message_reactions": [],
+            }
+        },
+    }
+
+
+def test_message_from_graphql_lazy(session):
+    eager_thread = fbchat.Group(session=session, id="1234")
+    lazy_thread = fbchat.Group(session=lazy_session(session, True), id="1234")
+    eager = MessageData._from_graphql(eager_thread, graphql_message())
+    lazy = MessageData._from_graphql(lazy_thread, graphql_message())
+    assert isinstance(lazy, LazyMessageData)
+    for field in attr.fields(MessageData):
+        if field.name not in ("thread", "replied_to"):
+            assert getattr(eager, field.name) == getattr(lazy, field.name)
+    assert isinstance(lazy.replied_to, LazyMessageData)
+    assert eager.replied_to.text == lazy.replied_to.text
+
+
+def test_message_from_graphql_lazy_parses_on_access(session):
+    thread = fbchat.Group(session=lazy_session(session, True), id="1234")
+    data = graphql_message()
+    del data["message_reactions"]
+    message = MessageData._from_graphql(thread, data)
+    assert "Hi @Peter" == message.text
+    assert "4321" == message.author
+    with pytest.raises(KeyError):
+        message.reactions
+    with pytest.raises(attr.exceptions.FrozenInstanceError):
+        message.text = "Changed"
+
+
+def test_read_receipt_index(session):
+    receipts = [
+        {"actor": {"id": "1"}, "watermark": "1500000002000"},
+        {"actor": {"id": "2"}, "watermark": "1500000000000"},
+        {"actor": {"id": "3"}, "watermark": "1500000001000"},
+    ]
+    index = ReadReceiptIndex._from_graphql(receipts)
+    # In the order of the receipts
+    assert ["1", "2", "3"] == index.read_by(1499999999999)
+    assert ["1", "2", "3"] == index.read_by(1500000000000)
+    assert ["1", "3"] == index.read_by(1500000000001)
+    assert [] == index.read_by(1500000002001)
+
+    thread = fbchat.Group(session=session, id="1234")
+    message = MessageData._from_graphql(thread, graphql_message(), receipts)
+    assert ["1", "2", "3"] == message.read_by
+
+
+def pull_message():
+    return {
+        "body": "Hi @Peter",
+        "data": {"prng": '[{"o":3,"i":"5678","l":6}]'},
+        "messageMetadata": {
+            "actorFbId": "4321",
+            "messageId": "mid.$XYZ",
+            "tags": ["source:messenger:web"],
+            "threadKey": {"threadFbId": "1234"},
+            "timestamp": "1500000000000",
+        },
+    }
+
+
+def reply_message():
+    return {
+        "body": "A reply",
+        "data": {"prng": "[]"},
+        "messageMetadata": {
+            "actorFbId": "4321",
+            "messageId": "mid.$XYZ",
+            "tags": ["source:messenger:web"],
+            "threadKey": {"threadFbId": "1234"},
+            "timestamp": 1500000000000,
+        },
+        "messageReply": {"replyToMessageId": {"id": "mid.$ABC"}},
+    }
+
+
+def assert_same_as_eager(eager, lazy):
+    assert isinstance(lazy, LazyMessageData)
+    for field in attr.fields(MessageData):
+        if field.name != "thread":
+            assert getattr(eager, field.name) == getattr(lazy, field.name)
+    # Fields that the parser doesn't set have their defaults
+    assert lazy.is_read is None
+    assert repr(lazy)
+    assert copy.copy(lazy).text == lazy.text
+    assert attr.evolve(lazy, text="Edited").text == "Edited"
+
+
+def test_message_from_pull_lazy(session):
+    eager_thread = fbchat.Group(session=session, id="1234")
+    lazy_thread = fbchat.Group(session=lazy_session(session, True), id="1234")
+    created_at = datetime.datetime(2017, 7, 14, 2, 40, tzinfo=datetime.timezone.utc)
+    eager, lazy = (
+        MessageData._from_pull(thread, pull_message(), "4321", created_at)
+        for thread in (eager_thread, lazy_thread)
+    )
+    assert_same_as_eager(eager, lazy)
+    assert [Mention(thread_id="5678", offset=3, length=6)] == lazy.mentions
+
+
+def test_message_from_reply_lazy(session):
+    eager_thread = fbchat.Group(session=session, id="1234")
+    lazy_thread = fbchat.Group(session=lazy_session(session, True), id="1234")
+    eager, lazy = (
+        MessageData._from_reply(thread, reply_message())
+        for thread in (eager_thread, lazy_thread)
+    )
+    assert_same_as_eager(eager, lazy)
+    assert "mid.$ABC" == lazy.reply_to_id
@@ -0,0 +1,155 @@
+import asyncio
+import datetime
+import pytest
+import fbchat
+from fbchat import BackfillCursor, Client, Group, User
+
+
+class FakeSession(fbchat.Session):
+    """Serves threads with messages at the timestamps 1 to 250 ms."""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.requests = []
+        #: Thread IDs, and the ``before`` of the page of them that fails
+        self.failing = {}
+
+    async def _graphql_requests(self, *queries, return_errors=False):
+        self.requests.append(queries)
+        await asyncio.sleep(0)
+        rtn = []
+        for query in queries:
+            params = query["query_params"]
+            if params["id"] in self.failing:
+                if self.failing[params["id"]] == params["before"]:
+                    error = fbchat.GraphQLError("Query failed", description="Failed")
+                    if not return_errors:
+                        raise error
+                    rtn.append(error)
+                    continue
+            newest = params["before"] or 250
+            oldest = max(newest - params["message_limit"] + 1, 1)
+            nodes = [
+                {
+                    "message_id": "{}.{}".format(params["id"], i),
+                    "message_sender": {"id": "1234"},
+                    "timestamp_precise": str(i),
+                    "message_reactions": [],
+                }
+                for i in range(oldest, newest + 1)
+            ]
+            rtn.append(
+                {
+                    "message_thread": {
+                        "read_receipts": {"nodes": []},
+                        "messages": {"nodes": nodes},
+                    }
+                }
+            )
+        return rtn
+
+
+@pytest.fixture
+def session():
+    return FakeSession(
+        user_id="1234",
+        fb_dtsg=None,
+        revision=None,
+        domain="messenger.com",
+        session=None,
+    )
+
+
+def message_times(results, thread_id):
+    return [
+        int(message.created_at.timestamp() * 1000)
+        for thread, message in results
+        if thread.id == thread_id
+    ]
+
+
+def test_backfill(session):
+    client = Client(session=session)
+    threads = [Group(session=session, id=str(i)) for i in range(5)]
+
+    async def main():
+        return [r async for r in client.backfill(threads, concurrency=2, batch_size=3)]
+
+    results = asyncio.run(main())
+    for thread in threads:
+        assert list(range(250, 0, -1)) == message_times(results, thread.id)
+    # The first pages of the threads were fetched in two requests
+    assert [3, 2] == [len(queries) for queries in session.requests[:2]]
+    assert all(len(queries) == 1 for queries in session.requests[2:])
+
+
+def test_backfill_limit_after_and_resume(session):
+    client = Client(session=session)
+    threads = [Group(session=session, id="1"), User(session=session, id="2")]
+    cursors = {}
+
+    async def main(limit, stop=None):
+        rtn = []
+        async for thread, message in client.backfill(
+            threads,
+            limit=limit,
+            after=datetime.datetime.fromtimestamp(0.1, datetime.timezone.utc),
+            cursors=cursors,
+        ):
+            rtn.append((thread, message))
+            if len(rtn) == stop:
+                break
+        return rtn
+
+    results = asyncio.run(main(limit=120, stop=50))
+    assert 50 == sum(cursor.count for cursor in cursors.values())
+    assert not any(cursor.done for cursor in cursors.values())
+
+    results += asyncio.run(main(limit=120))
+    # Only messages from 100 ms and later are included
+    assert list(range(250, 130, -1)) == message_times(results, "1")
+    assert list(range(250, 130, -1)) == message_times(results, "2")
+    assert (
+        BackfillCursor(
+            thread_id="1",
+            before=datetime.datetime.fromtimestamp(0.131, datetime.timezone.utc),
+            count=120,
+            done=True,
+        )
+        == cursors["1"]
+    )
+    # Nothing is left to do
+    assert [] == asyncio.run(main(limit=None))
+
+
+def test_backfill_errors(session):
+    client = Client(session=session)
+    threads = [Group(session=session, id=str(i)) for i in range(4)]
+    cursors = {}
+    results = []
+    # The first page of "1" and the second page of "3" fail
+    session.failing = {"1": None, "3": 151}
+
+    async def main(on_error=None):
+        async for r in client.backfill(
+            threads, cursors=cursors, batch_size=2, on_error=on_error
+        ):
+            results.append(r)
+
+    with pytest.raises(fbchat.GraphQLError):
+        asyncio.run(main())
+
+    errors = []
+    asyncio.run(main(on_error=lambda *args: errors.append(args)))
+    assert ["1", "3"] == sorted(thread_id for thread_id, _ in errors)
+    assert all(isinstance(error, fbchat.GraphQLError) for _, error in errors)
+    # The other threads were still fetched
+    assert cursors["0"].done and cursors["2"].done
+    assert 100 == cursors["3"].count and not cursors["3"].done
+    assert 0 == cursors["1"].count and not cursors["1"].done
+
+    # The failed threads are continued where they stopped
+    session.failing = {}
+    asyncio.run(main())
+    for thread in threads:
+        assert list(range(250, 0, -1)) == message_times(results, thread.id)
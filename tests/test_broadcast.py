@@ -0,0 +1,104 @@
+import io
+import asyncio
+import aiohttp
+import pytest
+import fbchat
+from fbchat import Client, Group, User
+
+
+class FakeSession(fbchat.Session):
+    """Fails to send to the threads "3" and "4", and counts sends and uploads."""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.sent = []
+        self.uploads = []
+        self.running = 0
+        self.max_running = 0
+
+    async def _payload_post(self, url, data, files=None):
+        self.uploads.append(url)
+        return {"metadata": [{"image_id": 42, "filetype": "image/png"}]}
+
+    async def _send_now(self, data, offline_threading_id=None):
+        self.running += 1
+        self.max_running = max(self.max_running, self.running)
+        try:
+            await asyncio.sleep(0.001)
+        finally:
+            self.running -= 1
+        thread_id = data.get("thread_fbid") or data.get("other_user_fbid")
+        if thread_id == "3":
+            raise fbchat.HTTPError("Failed", status_code=500)
+        if thread_id == "4":
+            raise aiohttp.ClientPayloadError("Response payload is not completed")
+        self.sent.append((thread_id, offline_threading_id, data))
+        return "mid.${}".format(thread_id), thread_id
+
+
+@pytest.fixture
+def session():
+    return FakeSession(
+        user_id="1234",
+        fb_dtsg=None,
+        revision=None,
+        domain="messenger.com",
+        session=None,
+    )
+
+
+def test_broadcast(session):
+    client = Client(session=session)
+    threads = [Group(session=session, id=str(i)) for i in range(10)]
+    threads.append(User(session=session, id="9999"))
+    files = [("image.png", io.BytesIO(b"png"), "image/png")]
+
+    async def main():
+        return [
+            r async for r in client.broadcast(threads, "Hi", files=files, concurrency=3)
+        ]
+
+    results = {result.thread.id: result for result in asyncio.run(main())}
+    assert len(threads) == len(results)
+    assert 1 == len(session.uploads)
+    assert 3 == session.max_running
+
+    assert isinstance(results["3"].error, fbchat.HTTPError)
+    assert results["3"].message_id is None
+    # Errors that aren't from fbchat don't stop the other sends either
+    assert isinstance(results["4"].error, aiohttp.ClientPayloadError)
+    assert "mid.$9999" == results["9999"].message_id
+    assert results["9999"].error is None
+
+    ids = {result.offline_threading_id for result in results.values()}
+    assert len(threads) == len(ids)
+    for thread_id, offline_threading_id, data in session.sent:
+        assert results[thread_id].offline_threading_id == offline_threading_id
+        assert "Hi" == data["body"]
+        assert "42" == data["image_ids[0]"]
+
+
+def test_broadcast_nothing_to_send(session):
+    client = Client(session=session)
+
+    async def main():
+        return [r async for r in client.broadcast([Group(session=session, id="1")])]
+
+    with pytest.raises(ValueError):
+        asyncio.run(main())
+
+
+def test_broadcast_stopped_early(session):
+    client = Client(session=session)
+    threads = [Group(session=session, id=str(i)) for i in range(10, 20)]
+
+    async def main():
+        results = client.broadcast(threads, "Hi", concurrency=3)
+        async for result in results:
+            break
+        await results.aclose()
+        # The workers were collected, and no sends are left running
+        assert 0 == session.running
+        assert 1 == len([t for t in asyncio.all_tasks() if not t.done()])
+
+    asyncio.run(main())
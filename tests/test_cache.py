@@ -0,0 +1,167 @@
+import attr
+import asyncio
+import datetime
+import fbchat
+from fbchat import ThreadInfoCache, GroupData, UserData, User, Group
+
+
+def make_user(session, id):
+    return UserData(
+        session=session, id=id, photo=None, name="User", is_friend=False, first_name="U"
+    )
+
+
+def make_group(session, id):
+    return GroupData(
+        session=session,
+        id=id,
+        name="Group",
+        participants=[User(session=session, id="1234"), User(session=session, id="2")],
+        admins={"1234"},
+    )
+
+
+def test_cache_ttl_and_lru(session):
+    now = [0]
+    cache = ThreadInfoCache(max_size=2, ttl=10, clock=lambda: now[0])
+    cache.put(make_user(session, "1"))
+    cache.put(make_user(session, "2"))
+    assert cache.get("1")
+    cache.put(make_user(session, "3"))  # Evicts "2", which was used least recently
+    assert cache.get("2") is None
+    assert cache.get("1") and cache.get("3")
+    now[0] = 10
+    assert cache.get("1") is None
+    assert cache.get("3") is None
+
+
+def test_cache_single_flight(session):
+    calls = []
+
+    async def fetch(ids):
+        calls.append(ids)
+        await asyncio.sleep(0.01)
+        for id in ids:
+            yield make_user(session, id)
+
+    async def get(cache, ids):
+        return sorted(
+            thread.id for thread in [t async for t in cache.get_many(ids, fetch)]
+        )
+
+    async def main():
+        cache = ThreadInfoCache()
+        a, b = await asyncio.gather(get(cache, ["1", "2"]), get(cache, ["2", "3"]))
+        assert ["1", "2"] == a
+        assert ["2", "3"] == b
+        assert [["1", "2"], ["3"]] == calls
+        assert ["1", "2", "3"] == await get(cache, ["1", "2", "3"])
+        assert 2 == len(calls)
+
+    asyncio.run(main())
+
+
+def test_cache_fetch_error(session):
+    async def fetch(ids):
+        await asyncio.sleep(0.01)
+        raise fbchat.HTTPError("Oops")
+        yield
+
+    async def get(cache, ids):
+        return [t async for t in cache.get_many(ids, fetch)]
+
+    async def main():
+        cache = ThreadInfoCache()
+        a, b = await asyncio.gather(
+            get(cache, ["1"]), get(cache, ["1"]), return_exceptions=True
+        )
+        assert isinstance(a, fbchat.HTTPError)
+        assert isinstance(b, fbchat.HTTPError)
+
+    asyncio.run(main())
+
+
+def test_cache_handle_event(session):
+    cache = ThreadInfoCache()
+    group = Group(session=session, id="11")
+    user = User(session=session, id="2")
+    at = datetime.datetime.now(tz=datetime.timezone.utc)
+    cache.put(make_group(session, "11"))
+    cache.put(make_user(session, "2"))
+
+    cache.handle_event(
+        fbchat.TitleSet(author=user, thread=group, title="New title", at=at)
+    )
+    assert "New title" == cache.get("11").name
+    cache.handle_event(
+        fbchat.PeopleAdded(
+            author=user, thread=group, added=[User(session=session, id="3")], at=at
+        )
+    )
+    cache.handle_event(
+        fbchat.PersonRemoved(author=user, thread=group, removed=user, at=at)
+    )
+    assert ["1234", "3"] == [p.id for p in cache.get("11").participants]
+    cache.handle_event(
+        fbchat.AdminsAdded(author=user, thread=group, added=[user], at=at)
+    )
+    assert {"1234", "2"} == cache.get("11").admins
+    cache.handle_event(
+        fbchat.NicknameSet(
+            author=user, thread=user, subject=user, nickname="Nick", at=at
+        )
+    )
+    assert "Nick" == cache.get("2").nickname
+    cache.handle_event(
+        fbchat.ColorSet(author=user, thread=user, color="#ff0000", at=at)
+    )
+    assert "#ff0000" == cache.get("2").color
+    # Users don't have admins, so the entry is dropped instead
+    cache.handle_event(
+        fbchat.AdminsAdded(author=user, thread=user, added=[user], at=at)
+    )
+    assert cache.get("2") is None
+    # Parsed groups may not have any nicknames
+    cache.put(attr.evolve(make_group(session, "11"), nicknames=None))
+    cache.handle_event(
+        fbchat.NicknameSet(author=user, thread=group, subject=user, nickname="N", at=at)
+    )
+    assert {"2": "N"} == cache.get("11").nicknames
+
+
+def test_cache_stopped_early(session):
+    async def fetch(ids):
+        for id in ids:
+            yield make_user(session, id)
+
+    async def main():
+        cache = ThreadInfoCache()
+        cache.put(make_user(session, "cached"))
+        async for thread in cache.get_many(["missing", "cached"], fetch):
+            break
+        assert "cached" == thread.id
+        # The miss of the stopped lookup doesn't block the next one
+        threads = [t async for t in cache.get_many(["missing"], fetch)]
+        assert ["missing"] == [t.id for t in threads]
+
+    asyncio.run(asyncio.wait_for(main(), 1))
+
+
+def test_cache_partial_fetch(session):
+    async def fetch(ids):
+        await asyncio.sleep(0.01)
+        for id in ids:
+            if id != "missing":  # E.g. passed to on_error instead
+                yield make_user(session, id)
+
+    async def get(cache, ids):
+        return sorted([t.id async for t in cache.get_many(ids, fetch)])
+
+    async def main():
+        cache = ThreadInfoCache()
+        # The second caller waits for the first one's fetch
+        return await asyncio.gather(
+            get(cache, ["1", "missing"]), get(cache, ["missing", "1"])
+        )
+
+    assert [["1"], ["1"]] == asyncio.run(main())
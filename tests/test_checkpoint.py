@@ -0,0 +1,109 @@
+import json
+import types
+import asyncio
+import pytest
+import fbchat
+from fbchat import Checkpoint, FileCheckpointStore, SQLiteCheckpointStore
+
+
+@pytest.fixture(params=["file", "sqlite"])
+def store(request, tmp_path):
+    if request.param == "file":
+        yield FileCheckpointStore(path=str(tmp_path / "checkpoints.json"))
+    else:
+        store = SQLiteCheckpointStore(path=str(tmp_path / "checkpoints.db"))
+        yield store
+        store.close()
+
+
+def test_checkpoint_store(store):
+    assert store.load("1234") is None
+    store.save("1234", Checkpoint(sync_token="abc", sequence_id=10))
+    store.save("2345", Checkpoint(sync_token="def", sequence_id=20))
+    store.save("1234", Checkpoint(sync_token="abc", sequence_id=11))
+    assert Checkpoint(sync_token="abc", sequence_id=11) == store.load("1234")
+    assert Checkpoint(sync_token="def", sequence_id=20) == store.load("2345")
+    store.save("1234", None)
+    assert store.load("1234") is None
+    assert Checkpoint(sync_token="def", sequence_id=20) == store.load("2345")
+
+
+def test_file_checkpoint_store_corrupted(tmp_path):
+    path = tmp_path / "checkpoints.json"
+    path.write_text("{")
+    store = FileCheckpointStore(path=str(path))
+    assert store.load("1234") is None
+    store.save("1234", Checkpoint(sync_token="abc", sequence_id=1))
+    assert Checkpoint(sync_token="abc", sequence_id=1) == store.load("1234")
+    # No temporary files were left behind
+    assert ["checkpoints.json"] == [p.name for p in tmp_path.iterdir()]
+
+
+def test_listener_checkpoints(session, tmp_path):
+    loop = asyncio.new_event_loop()
+    store = FileCheckpointStore(path=str(tmp_path / "checkpoints.json"))
+
+    def make_listener():
+        return fbchat.Listener(
+            session=session,
+            chat_on=False,
+            foreground=False,
+            loop=loop,
+            # Avoids setting up paho's TLS context, which isn't needed here
+            transport="aiohttp",
+            checkpoint_store=store,
+            checkpoint_interval=2,
+        )
+
+    def receive(sequence_id, deltas):
+        data = {"lastIssuedSeqId": sequence_id, "deltas": deltas}
+        message = types.SimpleNamespace(
+            topic="/t_ms", payload=json.dumps(data).encode()
+        )
+        listener._on_message_handler(None, None, message)
+
+    def consume():
+        # Like Listener.listen does after yielding the events
+        event, sequence_id, generation = loop.run_until_complete(
+            listener._message_queue.get()
+        )
+        if sequence_id is not None:
+            listener._events_yielded(sequence_id, generation)
+
+    def load():
+        loop.run_until_complete(listener._flush_checkpoint())
+        return store.load("1234")
+
+    listener = make_listener()
+    assert listener._sequence_id is None
+    listener._handle_ms({"syncToken": "abc", "firstDeltaSeqId": 1})
+    assert Checkpoint(sync_token="abc", sequence_id=1) == load()
+    receive(2, [{"class": "NoOp"}])
+    receive(3, [{"class": "NoOp"}])
+    # Received, but not yielded yet
+    assert 3 == listener._sequence_id
+    assert Checkpoint(sync_token="abc", sequence_id=1) == load()
+    consume()
+    assert Checkpoint(sync_token="abc", sequence_id=2) == load()
+
+    # Stopping discards the queued message, so it isn't included in the checkpoint
+    listener._message_queue.close()
+    listener._save_checkpoint()
+    assert Checkpoint(sync_token="abc", sequence_id=2) == load()
+
+    # A new listener continues from the checkpoint
+    listener = make_listener()
+    assert "abc" == listener._sync_token
+    assert 2 == listener._sequence_id
+
+    # Messages from the old queue that are still queued after a resync aren't
+    # included in the new queue's checkpoints
+    receive(3, [{"class": "NoOp"}])
+    listener._handle_ms({"errorCode": "ERROR_QUEUE_NOT_FOUND"})
+    assert load() is None
+    listener._handle_ms({"syncToken": "def", "firstDeltaSeqId": 100})
+    assert Checkpoint(sync_token="def", sequence_id=100) == load()
+    consume()
+    listener._save_checkpoint()
+    assert Checkpoint(sync_token="def", sequence_id=100) == load()
+    loop.close()
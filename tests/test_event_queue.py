@@ -0,0 +1,84 @@
+import asyncio
+import pytest
+from fbchat import OverflowPolicy, QueueStats
+from fbchat._event_queue import EventQueue
+
+
+def make_queue(policy, maxsize=2, parse=None):
+    calls = []
+    queue = EventQueue(
+        maxsize=maxsize,
+        policy=policy,
+        parse=parse or (lambda topic, payload: [(topic, payload)]),
+        pause=lambda: calls.append("pause"),
+        resume=lambda: calls.append("resume"),
+    )
+    return queue, calls
+
+
+def drain(queue, count):
+    async def get_all():
+        return [await queue.get() for _ in range(count)]
+
+    return asyncio.run(get_all())
+
+
+def test_unbounded():
+    queue, calls = make_queue(OverflowPolicy.UNBOUNDED)
+    for i in range(5):
+        queue.put(i)
+    assert len(queue) == 5
+    assert [0, 1, 2, 3, 4] == drain(queue, 5)
+    assert not calls
+    assert QueueStats(enqueued=5, dequeued=5, max_depth=5) == queue.stats
+
+
+def test_drop_oldest():
+    queue, calls = make_queue(OverflowPolicy.DROP_OLDEST)
+    for i in range(5):
+        queue.put(i)
+    assert [3, 4] == drain(queue, 2)
+    assert QueueStats(enqueued=5, dequeued=2, max_depth=2, dropped=3) == queue.stats
+
+
+def test_block():
+    queue, calls = make_queue(OverflowPolicy.BLOCK, maxsize=4)
+    for i in range(5):
+        queue.put(i)
+    # Nothing is lost, but reading is paused
+    assert queue.paused
+    assert ["pause"] == calls
+    assert [0] == drain(queue, 1)
+    assert queue.paused
+    assert [1, 2] == drain(queue, 2)
+    assert not queue.paused
+    assert ["pause", "resume"] == calls
+    assert 1 == queue.stats.pauses
+
+
+def test_spill(tmp_path):
+    queue, calls = make_queue(OverflowPolicy.SPILL)
+    queue._spill_dir = str(tmp_path)
+    assert not queue.wants_spill()
+    queue.put("a")
+    queue.put("b")
+    assert queue.wants_spill()
+    queue.spill("/t_ms", b"c")
+    queue.spill("/thread_typing", b"\x00d")
+    assert ["a", "b", ("/t_ms", b"c"), ("/thread_typing", b"\x00d")] == drain(queue, 4)
+    assert not queue.wants_spill()
+    assert 2 == queue.stats.spilled
+    assert 2 == queue.stats.unspilled
+    queue.close()
+
+
+def test_spill_keeps_order_while_pending():
+    queue, calls = make_queue(OverflowPolicy.SPILL, maxsize=1)
+    queue.put("a")
+    queue.spill("/t_ms", b"b")
+    assert ["a"] == drain(queue, 1)
+    # The queue has room now, but there are still messages on disk
+    assert queue.wants_spill()
+    queue.spill("/t_ms", b"c")
+    assert [("/t_ms", b"b"), ("/t_ms", b"c")] == drain(queue, 2)
+    queue.close()
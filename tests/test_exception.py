@@ -17,7 +17,6 @@ from fbchat._exception import (
     handle_requests_error,
 )
 
-
 ERROR_DATA = [
     (
         PleaseRefresh,
@@ -1,6 +1,16 @@
 import pytest
 import json
-from fbchat._graphql import ConcatJSONDecoder, queries_to_json, response_to_json
+import asyncio
+import fbchat
+from fbchat import GraphQLError
+from fbchat._graphql import (
+    ConcatJSONDecoder,
+    GraphQLBatcher,
+    queries_to_json,
+    response_to_json,
+    iter_json_objects,
+    iter_json_stream,
+)
 
 
 @pytest.mark.parametrize(
@@ -33,3 +43,149 @@ def test_response_to_json():
         "}"
     )
     assert [[1, 2], {"b": "c"}] == response_to_json(data)
+
+
+def test_response_to_json_bytes():
+    data = (
+        b'for (;;);{"q0":{"data":{"a":"\xc3\xa9"}}}\r\n'
+        b'{"successful_results": 1, "error_results": 0, "skipped_results": 0}'
+    )
+    assert [{"a": "é"}] == response_to_json(data)
+
+
+def test_response_to_json_count():
+    data = (
+        b'{"q0":{"data":{"a":1}}}\r\n'
+        b'{"q1":{"data":{"b":2}}}\r\n'
+        b"This isn't parsed"
+    )
+    assert [{"a": 1}, {"b": 2}] == response_to_json(data, count=2)
+    with pytest.raises(fbchat.ParseError):
+        response_to_json(data)
+
+
+def test_iter_json_objects():
+    data = b'for (;;);{"a": 1}\r\n{\n  "b": 2\n}{"c": 3}\n'
+    expected = [{"a": 1}, {"b": 2}, {"c": 3}]
+    assert expected == list(iter_json_objects(data, start=9))
+    assert expected == list(iter_json_objects(data.decode(), start=9))
+    fbchat.set_json_loads(json.loads)
+    try:
+        assert expected == list(iter_json_objects(data, start=9))
+    finally:
+        fbchat.set_json_loads(None)
+
+
+def test_response_to_json_return_errors():
+    data = (
+        '{"q0":{"data":{"a":1}}}\r\n'
+        '{"q1":{"error":{"summary":"Oops","message":"Bad query"}}}\r\n'
+        '{"successful_results": 1, "error_results": 1, "skipped_results": 0}'
+    )
+    with pytest.raises(GraphQLError):
+        response_to_json(data)
+    result, error = response_to_json(data, return_errors=True)
+    assert {"a": 1} == result
+    assert isinstance(error, GraphQLError)
+
+
+def test_graphql_batcher():
+    sent = []
+
+    async def send(*queries):
+        sent.append(queries)
+        return [
+            GraphQLError("Oops", "Bad query") if q == "bad" else q * 2 for q in queries
+        ]
+
+    async def main():
+        batcher = GraphQLBatcher(send=send, window=0.01, max_batch_size=3)
+        results = await asyncio.gather(
+            batcher.request("a"),
+            batcher.request("b", "c"),
+            batcher.request("bad"),
+            batcher.request("d"),
+            return_exceptions=True,
+        )
+        assert ["aa"] == results[0]
+        assert ["bb", "cc"] == results[1]
+        assert isinstance(results[2], GraphQLError)
+        assert ["dd"] == results[3]
+        # The first batch was sent as soon as it was full
+        assert [("a", "b", "c"), ("bad", "d")] == sent
+        assert 2 == batcher.requests_sent
+        assert 5 == batcher.queries_sent
+
+    asyncio.run(main())
+
+
+class FakeStream:
+    def __init__(self, *chunks):
+        self.chunks = chunks
+        self.received = 0
+
+    async def iter_any(self):
+        for chunk in self.chunks:
+            self.received += 1
+            yield chunk
+
+
+def test_iter_json_stream():
+    stream = FakeStream(b'for (;;);{"a"', b': 1}\r\n{"b": 2}\r', b'\n{"c": 3}')
+
+    async def main():
+        rtn = []
+        async for obj in iter_json_stream(stream):
+            rtn.append((obj, stream.received))
+        return rtn
+
+    # Objects are decoded as soon as their line is complete
+    assert [({"a": 1}, 2), ({"b": 2}, 3), ({"c": 3}, 3)] == asyncio.run(main())
+
+
+def test_iter_json_stream_multiline():
+    stream = FakeStream(b'{"a": 1}\n{\n  "b"', b': 2\n}\n{"c": 3}\n')
+
+    async def main():
+        return [obj async for obj in iter_json_stream(stream)]
+
+    assert [{"a": 1}, {"b": 2}, {"c": 3}] == asyncio.run(main())
+
+
+def test_graphql_stream():
+    class FakeResponse:
+        content = FakeStream(
+            b'{"q1":{"data":{"b":2}}}\r\n',
+            b'{"q0":{"error":{"summary":"Oops","message":"Bad query"}}}\r\n',
+            b'{"successful_results": 1, "error_results": 1, "skipped_results": 0}',
+        )
+        released = False
+
+        def release(self):
+            self.released = True
+
+    response = FakeResponse()
+
+    class FakeSession(fbchat.Session):
+        async def _open(self, url, data, files=None):
+            assert "/api/graphqlbatch/" == url
+            return response
+
+    session = FakeSession(
+        user_id="1234",
+        fb_dtsg=None,
+        revision=None,
+        domain="messenger.com",
+        session=None,
+    )
+
+    async def main():
+        stream = session._graphql_stream("a", "b", return_errors=True)
+        return [item async for item in stream]
+
+    first, (index, error) = asyncio.run(main())
+    assert (1, {"b": 2}) == first
+    assert 0 == index and isinstance(error, GraphQLError)
+    # Stops without waiting for the summary
+    assert 2 == response.content.received
+    assert response.released
@@ -0,0 +1,117 @@
+import json
+import asyncio
+import fbchat
+from fbchat._listen import TOPICS
+
+
+class FakeMessage:
+    def __init__(self, topic, data):
+        self.topic = topic
+        self.payload = json.dumps(data).encode("utf-8")
+
+
+def client_payload(*deltas):
+    payload = json.dumps({"deltas": list(deltas)})
+    return {"class": "ClientPayload", "payload": [ord(c) for c in payload]}
+
+
+def make_listener(session, loop, **kwargs):
+    return fbchat.Listener(
+        session=session,
+        chat_on=False,
+        foreground=False,
+        loop=loop,
+        # Avoids setting up paho's TLS context, which isn't needed here
+        transport="aiohttp",
+        queue_size=0,
+        **kwargs
+    )
+
+
+def test_listener_filters(session):
+    loop = asyncio.new_event_loop()
+    listener = make_listener(
+        session,
+        loop,
+        topics=["/thread_typing"],
+        delta_classes=["NoOp", "ClientPayload"],
+        client_deltas=["deltaSomethingElse"],
+    )
+    assert ["/t_ms", "/thread_typing"] == listener._subscribed_topics()
+
+    listener._on_message_handler(None, None, FakeMessage("/orca_presence", {}))
+    listener._on_message_handler(
+        None,
+        None,
+        FakeMessage(
+            "/t_ms",
+            {
+                "lastIssuedSeqId": 5,
+                "deltas": [
+                    {"class": "NotWanted"},
+                    {"class": "NoOp"},
+                    client_payload(
+                        {"deltaSomethingElse": {"a": 1}}, {"deltaNotWanted": {}}
+                    ),
+                ],
+            },
+        ),
+    )
+    # The sequence ID is tracked, even though most deltas are skipped
+    assert 5 == listener._sequence_id
+    assert 1 == len(listener._message_queue)
+    event, sequence_id, _ = loop.run_until_complete(listener._message_queue.get())
+    assert 5 == sequence_id
+    expected = {"deltaSomethingElse": {"a": 1}}
+    assert fbchat.UnknownEvent(source="client payload", data=expected) == event
+    loop.close()
+
+
+def test_listener_no_filters(session):
+    loop = asyncio.new_event_loop()
+    listener = make_listener(session, loop)
+    assert TOPICS == listener._subscribed_topics()
+    loop.close()
+
+
+def test_listener_confirms_sends(session):
+    loop = asyncio.new_event_loop()
+    # Sent messages are confirmed even if their events aren't wanted
+    listener = make_listener(session, loop, delta_classes=["NoOp"])
+    confirmed = loop.create_future()
+    listener.session._pending_sends["6800000000000000000"] = confirmed
+    delta = {
+        "class": "NewMessage",
+        "messageMetadata": {
+            "messageId": "mid.$xyz",
+            "offlineThreadingId": "6800000000000000000",
+            "threadKey": {"otherUserFbId": 5678},
+        },
+    }
+    message = FakeMessage("/t_ms", {"lastIssuedSeqId": 6, "deltas": [delta]})
+    listener._on_message_handler(None, None, message)
+    assert ("mid.$xyz", "5678") == confirmed.result()
+    # Only the sequence ID is queued, without an event
+    assert (None, 6, 0) == loop.run_until_complete(listener._message_queue.get())
+    loop.close()
+
+
+def test_listener_spilled_generations(session, tmp_path):
+    loop = asyncio.new_event_loop()
+    listener = make_listener(
+        session, loop, overflow=fbchat.OverflowPolicy.SPILL, spill_dir=str(tmp_path)
+    )
+    listener._message_queue.maxsize = 1
+
+    def receive(data):
+        listener._on_message_handler(None, None, FakeMessage("/t_ms", data))
+
+    receive({"lastIssuedSeqId": 2, "deltas": []})
+    receive({"lastIssuedSeqId": 3, "deltas": []})  # Spilled
+    # The queue is replaced while a message from the old one is spilled
+    receive({"syncToken": "abc", "firstDeltaSeqId": 100})
+    receive({"lastIssuedSeqId": 101, "deltas": []})  # Spilled
+    items = [loop.run_until_complete(listener._message_queue.get()) for _ in range(3)]
+    assert [(None, 2, 0), (None, 3, 0), (None, 101, 1)] == items
+    listener._message_queue.close()
+    loop.close()
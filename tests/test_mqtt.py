@@ -0,0 +1,87 @@
+import asyncio
+import pytest
+from fbchat._mqtt import (
+    MQTTMessage,
+    PacketReader,
+    WebsocketMQTT,
+    encode_length,
+    connect_packet,
+    publish_packet,
+    puback_packet,
+    subscribe_packet,
+    parse_publish,
+)
+
+
+@pytest.mark.parametrize(
+    "length,expected",
+    [
+        (0, b"\x00"),
+        (127, b"\x7f"),
+        (128, b"\x80\x01"),
+        (16383, b"\xff\x7f"),
+        (2097152, b"\x80\x80\x80\x01"),
+    ],
+)
+def test_encode_length(length, expected):
+    assert expected == encode_length(length)
+
+
+def test_connect_packet():
+    packet = connect_packet("mqttwsclient", 10, username="{}")
+    assert packet == (
+        b"\x10\x1e"
+        b"\x00\x06MQIsdp\x03\x82\x00\x0a"
+        b"\x00\x0cmqttwsclient"
+        b"\x00\x02{}"
+    )
+
+
+def test_subscribe_packet():
+    assert b"\x82\x10\x00\x01\x00\x05/t_ms\x00\x00\x03/pp\x01" == subscribe_packet(
+        1, [("/t_ms", 0), ("/pp", 1)]
+    )
+
+
+def test_publish_roundtrip():
+    packet = publish_packet("/t_ms", b'{"a":1}', qos=1, mid=42)
+    ((header, body),) = PacketReader().feed(packet)
+    assert (MQTTMessage(topic="/t_ms", payload=b'{"a":1}'), 1, 42) == parse_publish(
+        header, body
+    )
+
+
+def test_packet_reader_split():
+    reader = PacketReader()
+    long_payload = b"x" * 300
+    data = publish_packet("/a", b"1") + publish_packet("/b", long_payload)
+    assert [] == list(reader.feed(data[:3]))
+    assert 1 == len(list(reader.feed(data[3:10])))
+    ((header, body),) = reader.feed(data[10:])
+    assert "/b" == parse_publish(header, body)[0].topic
+    assert long_payload == parse_publish(header, body)[0].payload
+
+
+def test_packet_reader_malformed():
+    with pytest.raises(ValueError, match="Malformed"):
+        list(PacketReader().feed(b"\x30\xff\xff\xff\xff\x01"))
+
+
+def test_websocket_mqtt_handle_packets():
+    loop = asyncio.new_event_loop()
+    messages = []
+    connects = []
+    mqtt = WebsocketMQTT(session=None, host="edge-chat.messenger.com", loop=loop)
+    mqtt.on_message = lambda client, userdata, message: messages.append(message)
+    mqtt.on_connect = lambda client, userdata, flags, rc: connects.append(rc)
+    mqtt._outgoing = asyncio.Queue()
+
+    for header, body in PacketReader().feed(
+        b"\x20\x02\x00\x00" + publish_packet("/t_ms", b"{}", qos=1, mid=7)
+    ):
+        mqtt._handle_packet(header, body)
+
+    assert [0] == connects
+    assert [MQTTMessage(topic="/t_ms", payload=b"{}")] == messages
+    assert puback_packet(7) == mqtt._outgoing.get_nowait()
+    loop.close()
@@ -0,0 +1,122 @@
+import asyncio
+import pytest
+import fbchat
+from fbchat import Outbox
+
+
+def test_outbox_orders_per_thread():
+    outbox = Outbox(max_concurrency=8)
+    events = []
+
+    def sender(thread_id, i, delay):
+        async def send():
+            events.append(("start", thread_id, i))
+            await asyncio.sleep(delay)
+            events.append(("end", thread_id, i))
+            return i
+
+        return send
+
+    async def main():
+        return await asyncio.gather(
+            outbox.send("a", sender("a", 0, 0.02)),
+            outbox.send("a", sender("a", 1, 0)),
+            outbox.send("b", sender("b", 0, 0)),
+        )
+
+    assert [0, 1, 0] == asyncio.run(main())
+    # The second message to "a" waits for the first, "b" doesn't
+    assert events.index(("end", "a", 0)) < events.index(("start", "a", 1))
+    assert events.index(("end", "b", 0)) < events.index(("end", "a", 0))
+    assert 0 == outbox.depth
+    assert 3 == outbox.stats.sent
+    assert 3 == outbox.stats.max_depth
+
+
+def test_outbox_max_concurrency():
+    outbox = Outbox(max_concurrency=2)
+    running = [0]
+    peak = [0]
+
+    async def send():
+        running[0] += 1
+        peak[0] = max(peak[0], running[0])
+        await asyncio.sleep(0.01)
+        running[0] -= 1
+
+    async def main():
+        await asyncio.gather(*(outbox.send(i, send) for i in range(6)))
+
+    asyncio.run(main())
+    assert 2 == peak[0]
+    assert 6 == outbox.stats.sent
+    assert outbox.stats.total_wait > 0
+
+
+def test_outbox_failure_doesnt_block():
+    outbox = Outbox()
+
+    async def fail():
+        raise fbchat.HTTPError("Failed", status_code=500)
+
+    async def succeed():
+        return "mid.$xyz"
+
+    async def main():
+        first = asyncio.ensure_future(outbox.send("a", fail))
+        second = asyncio.ensure_future(outbox.send("a", succeed))
+        with pytest.raises(fbchat.HTTPError):
+            await first
+        return await second
+
+    assert "mid.$xyz" == asyncio.run(main())
+    assert 1 == outbox.stats.failed
+    assert 1 == outbox.stats.sent
+
+
+def test_outbox_close_cancels_waiting():
+    outbox = Outbox()
+
+    async def slow():
+        await asyncio.sleep(10)
+
+    async def main():
+        first = asyncio.ensure_future(outbox.send("a", slow))
+        second = asyncio.ensure_future(outbox.send("a", slow))
+        await asyncio.sleep(0.01)
+        assert 1 == outbox.thread_depth("a")
+        assert 2 == outbox.depth
+        await outbox.close()
+        await asyncio.gather(first, second, return_exceptions=True)
+        return first, second
+
+    first, second = asyncio.run(main())
+    assert first.cancelled() and second.cancelled()
+    assert 0 == outbox.depth
+
+
+class SendingSession(fbchat.Session):
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.sent = []
+
+    async def _send_now(self, data, offline_threading_id=None):
+        self.sent.append(data)
+        return "mid.$" + str(len(self.sent)), data.get("thread_fbid")
+
+
+def test_session_sends_through_outbox():
+    session = SendingSession(
+        user_id="1234",
+        fb_dtsg=None,
+        revision=None,
+        domain="messenger.com",
+        session=None,
+    )
+    session.outbox = Outbox()
+
+    async def main():
+        return await session._do_send_request({"thread_fbid": "5678"})
+
+    assert ("mid.$1", "5678") == asyncio.run(main())
+    assert 1 == session.outbox.stats.sent
@@ -0,0 +1,48 @@
+import asyncio
+import pytest
+import fbchat
+from fbchat import SessionPool
+
+
+def test_session_pool(monkeypatch):
+    started = []
+
+    async def from_cookies(
+        cookies, user_agent=None, domain="messenger.com", connection_options=None
+    ):
+        loop = asyncio.get_event_loop()
+        started.append(loop.time())
+        if cookies.get("c_user") == "bad":
+            raise fbchat.NotLoggedIn("Bad cookies")
+        return fbchat.Session(
+            user_id=cookies["c_user"],
+            fb_dtsg=None,
+            revision=None,
+            domain=domain,
+            session=fbchat._session.session_factory(domain, options=connection_options),
+        )
+
+    monkeypatch.setattr(fbchat.Session, "from_cookies", from_cookies)
+
+    async def main():
+        pool = SessionPool(startup_interval=0.02)
+        cookies = {key: {"c_user": key} for key in ("1", "2", "bad", "3")}
+        sessions = await pool.start(cookies)
+        assert ["1", "2", "3"] == sorted(sessions)
+        # All sessions share one connection pool
+        assert 1 == len({session._session.connector for session in sessions.values()})
+
+        listener = pool.listener("1", chat_on=False, foreground=False)
+        assert pool.ssl_context is listener._ssl_context
+
+        health = pool.health()
+        assert (3, 1, 0) == (health.sessions, health.listeners, health.connected)
+        assert ["bad"] == list(health.failed)
+        connector = pool._connector
+        await pool.close()
+        assert connector.closed
+        return pool
+
+    asyncio.run(main())
+    # The logins were staggered
+    assert all(b - a >= 0.015 for a, b in zip(started, started[1:]))
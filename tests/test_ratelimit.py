@@ -0,0 +1,52 @@
+import asyncio
+import pytest
+from fbchat import RateLimiter
+from fbchat._ratelimit import TokenBucket
+
+
+def test_token_bucket():
+    now = [0.0]
+    bucket = TokenBucket(max_rate=2, burst=2, clock=lambda: now[0])
+    assert 0 == bucket.reserve()
+    assert 0 == bucket.reserve()
+    # Waiters are queued behind each other
+    assert 0.5 == bucket.reserve()
+    assert 1.0 == bucket.reserve()
+    now[0] = 10
+    assert 0 == bucket.reserve()
+
+
+def test_rate_limiter_budgets_and_stats():
+    now = [0.0]
+    limiter = RateLimiter(
+        read_rate=100, read_burst=1, send_rate=50, send_burst=1, clock=lambda: now[0]
+    )
+
+    async def main():
+        for _ in range(3):
+            await limiter.acquire("https://www.messenger.com/messaging/send/")
+        await limiter.acquire("/api/graphqlbatch/")
+        await limiter.acquire("/api/graphqlbatch/")
+
+    asyncio.run(main())
+    send = limiter.stats["/messaging/send/"]
+    assert (3, 2) == (send.requests, send.waits)
+    assert pytest.approx(0.06) == send.wait_time
+    assert pytest.approx(0.04) == send.max_wait
+    read = limiter.stats["/api/graphqlbatch/"]
+    assert (2, 1) == (read.requests, read.waits)
+    assert pytest.approx(0.01) == read.wait_time
+
+
+def test_rate_limiter_adapts():
+    limiter = RateLimiter(read_rate=10, decrease_factor=0.5, increase=0.1)
+    limiter.record("/api/graphqlbatch/", status=500)
+    assert 5 == limiter.stats["/api/graphqlbatch/"].rate
+    limiter.record("/ajax/mercury/mark_seen.php?dpr=1", status=200, code=1390008)
+    limiter.record("/ajax/mercury/mark_seen.php", status=500)
+    assert 2.5 == limiter.stats["/ajax/mercury/mark_seen.php"].rate
+    assert 2 == limiter.stats["/ajax/mercury/mark_seen.php"].throttled
+    for _ in range(10):
+        limiter.record("/api/graphqlbatch/", status=200)
+    # Recovers, but not above the configured rate
+    assert 10 == limiter.stats["/api/graphqlbatch/"].rate
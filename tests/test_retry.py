@@ -0,0 +1,193 @@
+import asyncio
+import aiohttp
+import pytest
+import fbchat
+from aiohttp.client_reqrep import ConnectionKey
+from fbchat import HTTPError, PleaseRefresh, RetryPolicy
+
+
+class FakeSession(fbchat.Session):
+    """Fails with the errors in ``errors``, then succeeds."""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.errors = []
+        self.attempts = []
+        self.refreshes = []
+
+    async def _post_once(
+        self,
+        url,
+        data,
+        files,
+        as_graphql,
+        graphql_errors,
+        check_payload,
+        graphql_count=None,
+    ):
+        self.attempts.append(url)
+        if self.errors:
+            raise self.errors.pop(0)
+        return {"payload": "ok"}
+
+    async def _refresh(self):
+        self.refreshes.append(True)
+
+
+@pytest.fixture
+def session():
+    return FakeSession(
+        user_id="1234",
+        fb_dtsg=None,
+        revision=None,
+        domain="messenger.com",
+        session=None,
+        retry_policy=RetryPolicy(base_delay=0.001),
+        send_retry_policy=RetryPolicy(base_delay=0.001, idempotent=False),
+    )
+
+
+def connector_error():
+    key = ConnectionKey(*(None for _ in ConnectionKey._fields))
+    key = key._replace(host="www.messenger.com", port=443, is_ssl=True, ssl=True)
+    return aiohttp.ClientConnectorError(key, OSError(111, "Connection refused"))
+
+
+def test_retry_policy_delay():
+    policy = RetryPolicy(base_delay=1, multiplier=2, max_delay=5, jitter=0)
+    assert [1, 2, 4, 5] == [policy.get_delay(attempt) for attempt in range(1, 5)]
+    policy = RetryPolicy(base_delay=1, jitter=0.5)
+    assert all(0.5 <= policy.get_delay(1) <= 1 for _ in range(20))
+
+
+def test_retry_policy_should_retry():
+    read = RetryPolicy()
+    send = RetryPolicy(idempotent=False)
+    server_error = HTTPError("Failed", status_code=502)
+    assert read.should_retry(server_error)
+    assert not send.should_retry(server_error)
+    assert not read.should_retry(HTTPError("Not found", status_code=404))
+    assert read.should_retry(aiohttp.ServerDisconnectedError())
+    assert not send.should_retry(aiohttp.ServerDisconnectedError())
+    assert send.should_retry(connector_error())
+    assert send.should_retry(PleaseRefresh("Please refresh", description=""))
+
+
+def test_post_retries(session):
+    session.errors.extend(
+        [HTTPError("Failed", status_code=500), asyncio.TimeoutError()]
+    )
+    assert "ok" == asyncio.run(session._payload_post("/ajax/mercury/mark_seen.php", {}))
+    assert 3 == len(session.attempts)
+
+
+def test_post_gives_up(session):
+    session.errors.extend([aiohttp.ServerDisconnectedError()] * 3)
+    with pytest.raises(HTTPError, match="Connection error"):
+        asyncio.run(session._payload_post("/ajax/mercury/mark_seen.php", {}))
+    assert 3 == len(session.attempts)
+
+
+def test_post_send_not_retried(session):
+    session.errors.append(HTTPError("Failed", status_code=500))
+    with pytest.raises(HTTPError):
+        asyncio.run(session._post("/messaging/send/", {}))
+    assert 1 == len(session.attempts)
+
+    session.errors.extend([connector_error(), PleaseRefresh("Refresh", description="")])
+    assert {"payload": "ok"} == asyncio.run(session._post("/messaging/send/", {}))
+    assert 4 == len(session.attempts)
+    assert [True] == session.refreshes
+
+
+def test_post_files_not_retried(session):
+    session.errors.append(HTTPError("Failed", status_code=500))
+    with pytest.raises(HTTPError):
+        asyncio.run(session._post("/ajax/mercury/upload.php", {}, files={"a": None}))
+    assert 1 == len(session.attempts)
+
+
+def test_post_deadline(session):
+    class SlowSession(FakeSession):
+        async def _post_once(self, *args):
+            await asyncio.sleep(1)
+
+    slow = SlowSession(
+        user_id="1234",
+        fb_dtsg=None,
+        revision=None,
+        domain="messenger.com",
+        session=None,
+        retry_policy=RetryPolicy(deadline=0.05),
+    )
+    with pytest.raises(HTTPError, match="timed out"):
+        asyncio.run(slow._post("/api/graphqlbatch/", {}))
+
+
+class SendSession(FakeSession):
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.sent_ids = []
+
+    async def _post_once(
+        self,
+        url,
+        data,
+        files,
+        as_graphql,
+        graphql_errors,
+        check_payload,
+        graphql_count=None,
+    ):
+        self.sent_ids.append(data["offline_threading_id"])
+        await super()._post_once(
+            url, data, files, as_graphql, graphql_errors, check_payload
+        )
+        return {
+            "payload": {"actions": [{"message_id": "mid.$1", "thread_fbid": "5678"}]}
+        }
+
+
+@pytest.fixture
+def send_session():
+    return SendSession(
+        user_id="1234",
+        fb_dtsg=None,
+        revision=None,
+        domain="messenger.com",
+        session=None,
+        send_retry_policy=RetryPolicy(base_delay=0.001, idempotent=False),
+    )
+
+
+def test_send_with_offline_threading_id_is_retried(send_session):
+    send_session.errors.append(asyncio.TimeoutError())
+    result = asyncio.run(send_session._do_send_request({}, "6800000000000000000"))
+    assert ("mid.$1", "5678") == result
+    assert ["6800000000000000000", "6800000000000000000"] == send_session.sent_ids
+    assert not send_session._pending_sends
+
+
+def test_send_without_offline_threading_id_is_retried(send_session):
+    send_session.errors.append(asyncio.TimeoutError())
+    assert ("mid.$1", "5678") == asyncio.run(send_session._do_send_request({}))
+    # The generated ID is reused for the retry
+    assert 2 == len(send_session.sent_ids)
+    assert send_session.sent_ids[0] == send_session.sent_ids[1]
+
+
+def test_confirmed_send_isnt_retried(send_session):
+    send_session.send_retry_policy = RetryPolicy(base_delay=10, idempotent=True)
+
+    async def main():
+        send_session.errors.append(asyncio.TimeoutError())
+        send = asyncio.ensure_future(
+            send_session._do_send_request({}, "6800000000000000000")
+        )
+        await asyncio.sleep(0.01)
+        # The listener received the message while waiting to retry
+        send_session._confirm_send("6800000000000000000", "mid.$echo", "5678")
+        return await asyncio.wait_for(send, 1)
+
+    assert ("mid.$echo", "5678") == asyncio.run(main())
+    assert 1 == len(send_session.sent_ids)
@@ -1,6 +1,10 @@
+import gc
+import asyncio
+import aiohttp
 import datetime
 import pytest
-from fbchat import ParseError, _util
+import fbchat
+from fbchat import ParseError, ConnectionOptions, _util
 from fbchat._session import (
     parse_server_js_define,
     base36encode,
@@ -81,6 +85,32 @@ def test_session_factory():
     assert session.headers
 
 
+def test_session_factory_options():
+    async def main():
+        options = ConnectionOptions(
+            connect_timeout=5, read_timeout=20, limit=10, limit_per_host=2
+        )
+        session = session_factory("messenger.com", options=options)
+        assert 5 == session.timeout.sock_connect
+        assert 20 == session.timeout.sock_read
+        assert 10 == session.connector.limit
+        assert 2 == session.connector.limit_per_host
+        await session.close()
+        assert session.connector is None
+
+        connector = aiohttp.TCPConnector()
+        for _ in range(2):
+            options = ConnectionOptions(connector=connector)
+            session = session_factory("messenger.com", options=options)
+            assert connector is session.connector
+            await session.close()
+        # The shared connector is left open
+        assert not connector.closed
+        await connector.close()
+
+    asyncio.run(main())
+
+
 def test_client_id_factory():
     # Returns random output, so hard to test more thoroughly
     assert client_id_factory()
@@ -188,3 +218,31 @@ def test_get_error_data():
     """
     msg = "The password you entered is incorrect. Did you forget your password?"
     assert msg == get_error_data(html)
+
+
+def test_intern_threads(session):
+    data = {"sender_fbid": 4321, "thread": 5678, "state": 1}
+    first = fbchat.Typing._parse_thread_typing(session, data)
+    second = fbchat.Typing._parse_thread_typing(session, data)
+    assert first.author == second.author
+    assert first.author is not second.author
+
+    session.intern_threads = True
+    first = fbchat.Typing._parse_thread_typing(session, data)
+    second = fbchat.Typing._parse_thread_typing(session, data)
+    assert first.author is second.author
+    assert first.thread is second.thread
+    assert isinstance(first.thread, fbchat.Group)
+    # Users and groups with the same ID are different handles
+    assert session._intern(fbchat.User, 5678) is not first.thread
+    assert session._intern(fbchat.Group, 5678) is first.thread
+    # Handles always have string IDs, even if they were first looked up by an int
+    user = session._intern(fbchat.User, 8765)
+    assert "8765" == user.id
+    assert user is session._intern(fbchat.User, "8765")
+    del user
+
+    # Handles that aren't in use anymore are dropped
+    del first, second
+    gc.collect()
+    assert 0 == len(session._interned)
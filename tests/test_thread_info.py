@@ -0,0 +1,210 @@
+import json
+import asyncio
+import pytest
+import fbchat
+from fbchat import Client, GraphQLError, HTTPError
+
+
+def group_data(thread_id):
+    return {
+        "thread_type": "GROUP",
+        "name": "Group",
+        "thread_key": {"thread_fbid": thread_id},
+        "image": None,
+        "is_group_thread": True,
+        "all_participants": {"nodes": []},
+        "customization_info": None,
+        "thread_admins": [],
+        "group_approval_queue": {"nodes": []},
+        "approval_mode": 0,
+        "joinable_mode": {"mode": "0", "link": ""},
+        "event_reminders": {"nodes": []},
+    }
+
+
+class FakeSession(fbchat.Session):
+    """Group IDs start with "g", users with "u". Anything with "bad" fails."""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.requests = []
+
+    async def _graphql_requests(self, *queries, return_errors=False):
+        ids = [query["query_params"]["id"] for query in queries]
+        self.requests.append(ids)
+        await asyncio.sleep(0)
+        if "bad-chunk" in ids:
+            raise HTTPError("Error when sending request", status_code=500)
+        rtn = []
+        for thread_id in ids:
+            if thread_id == "g-bad":
+                assert return_errors
+                rtn.append(GraphQLError("Oops", "Bad query"))
+            elif thread_id.startswith("g"):
+                rtn.append({"message_thread": group_data(thread_id)})
+            else:
+                rtn.append({"message_thread": None})
+        return rtn
+
+    async def _graphql_stream(self, *queries, return_errors=False):
+        results = await self._graphql_requests(*queries, return_errors=return_errors)
+        for item in enumerate(results):
+            yield item
+
+    async def _payload_post(self, url, data, files=None):
+        assert "/chat/user_info/" == url
+        profiles = {}
+        for thread_id in data.values():
+            if thread_id != "u-bad":
+                profiles[thread_id] = {
+                    "type": "user",
+                    "firstName": "User",
+                    "name": "User {}".format(thread_id),
+                }
+        return {"profiles": profiles}
+
+
+@pytest.fixture
+def client():
+    session = FakeSession(
+        user_id="1234",
+        fb_dtsg=None,
+        revision=None,
+        domain="messenger.com",
+        session=None,
+    )
+    return Client(session=session)
+
+
+def test_fetch_thread_info_chunks(client):
+    ids = ["g{}".format(i) for i in range(5)] + ["u{}".format(i) for i in range(5)]
+
+    async def main():
+        return [t async for t in client.fetch_thread_info(ids, batch_size=3)]
+
+    threads = asyncio.run(main())
+    assert sorted(ids) == sorted(thread.id for thread in threads)
+    assert all(isinstance(t, fbchat.UserData) for t in threads if t.id[0] == "u")
+    assert [3, 3, 3, 1] == [len(chunk) for chunk in client.session.requests]
+
+
+def test_fetch_thread_info_errors(client):
+    ids = ["g1", "g-bad", "u1", "u-bad", "bad-chunk", "g2"]
+    errors = {}
+
+    async def main(on_error):
+        return [
+            t.id
+            async for t in client.fetch_thread_info(
+                ids, batch_size=4, on_error=on_error
+            )
+        ]
+
+    assert ["g1", "u1"] == asyncio.run(main(lambda id, e: errors.setdefault(id, e)))
+    assert isinstance(errors["g-bad"], GraphQLError)
+    assert isinstance(errors["u-bad"], fbchat.ParseError)
+    # The whole chunk failed
+    assert isinstance(errors["bad-chunk"], HTTPError)
+    assert isinstance(errors["g2"], HTTPError)
+
+    with pytest.raises(fbchat.FacebookError):
+        asyncio.run(main(None))
+
+
+class FakeContent:
+    def __init__(self, body):
+        self.body = body
+
+    async def iter_any(self):
+        for line in self.body.splitlines(keepends=True):
+            await asyncio.sleep(0)
+            yield line
+
+
+class FakeResponse:
+    def __init__(self, body):
+        self.content = FakeContent(body)
+
+    async def read(self):
+        return self.content.body
+
+    def release(self):
+        pass
+
+
+class StreamingSession(fbchat.Session):
+    """Answers ``/api/graphqlbatch/`` like Facebook, to test the real _graphql_stream.
+
+    Group IDs start with "g", anything with "broken" can't be parsed.
+    """
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.requests = []
+
+    async def _open(self, url, data, files=None):
+        assert "/api/graphqlbatch/" == url
+        queries = json.loads(data["queries"])
+        self.requests.append([q["query_params"]["id"] for q in queries.values()])
+        lines = []
+        for key, query in queries.items():
+            thread_id = query["query_params"]["id"]
+            if "broken" in thread_id:
+                thread = {"thread_type": "GROUP"}
+            else:
+                thread = group_data(thread_id)
+            lines.append({key: {"data": {"message_thread": thread}}})
+        lines.append({"successful_results": len(queries), "error_results": 0})
+        body = "\r\n".join(json.dumps(line) for line in lines) + "\r\n"
+        return FakeResponse(body.encode("utf-8"))
+
+
+@pytest.fixture
+def streaming_client():
+    session = StreamingSession(
+        user_id="1234",
+        fb_dtsg=None,
+        revision=None,
+        domain="messenger.com",
+        session=None,
+    )
+    return Client(session=session)
+
+
+def test_fetch_thread_info_stream_unexpected_error(streaming_client):
+    ids = ["g1", "g-broken", "g2", "g3"]
+    errors = {}
+
+    async def main(on_error):
+        return [
+            t.id
+            async for t in streaming_client.fetch_thread_info(
+                ids, batch_size=3, on_error=on_error
+            )
+        ]
+
+    threads = asyncio.run(main(lambda id, e: errors.setdefault(id, e)))
+    assert ["g1", "g3"] == sorted(threads)
+    # The chunk stopped at the thread that couldn't be parsed
+    assert ["g-broken", "g2"] == sorted(errors)
+    assert all(isinstance(e, KeyError) for e in errors.values())
+
+    with pytest.raises(KeyError):
+        asyncio.run(main(None))
+
+
+def test_fetch_thread_info_stream_batched(streaming_client):
+    streaming_client.session.enable_graphql_batching(window=0.01)
+    ids = ["g{}".format(i) for i in range(6)]
+
+    async def main():
+        return [
+            t.id
+            async for t in streaming_client.fetch_thread_info(
+                ids, batch_size=2, concurrency=3
+            )
+        ]
+
+    assert sorted(ids) == sorted(asyncio.run(main()))
+    # The chunks were combined into one request
+    assert [sorted(ids)] == [sorted(r) for r in streaming_client.session.requests]
@@ -1,3 +1,4 @@
+import asyncio
 import pytest
 import fbchat
 import datetime
@@ -15,6 +16,7 @@ from fbchat._util import (
     seconds_to_timedelta,
     millis_to_timedelta,
     timedelta_to_seconds,
+    prefetch,
 )
 
 
@@ -23,6 +25,10 @@ def test_strip_json_cruft():
     assert strip_json_cruft('{"abc": "def"}') == '{"abc": "def"}'
 
 
+def test_strip_json_cruft_bytes():
+    assert strip_json_cruft(b'for(;;);{"abc": "def"}') == b'{"abc": "def"}'
+
+
 def test_strip_json_cruft_invalid():
     with pytest.raises(AttributeError):
         strip_json_cruft(None)
@@ -34,9 +40,29 @@ def test_parse_json():
     assert parse_json('{"a":"b"}') == {"a": "b"}
 
 
+def test_parse_json_bytes():
+    assert parse_json('{"a":"bé 😀"}'.encode("utf-8")) == {"a": "bé 😀"}
+
+
 def test_parse_json_invalid():
     with pytest.raises(fbchat.ParseError, match="Error while parsing JSON"):
         parse_json("No JSON object here!")
+    with pytest.raises(fbchat.ParseError, match="Error while parsing JSON"):
+        parse_json(b"\xff{}")
+
+
+def test_parse_json_fallback():
+    def strict_loads(text):
+        raise ValueError("Too strict")
+
+    fbchat.set_json_loads(strict_loads)
+    try:
+        assert parse_json(b'{"a": 123456789012345678901234567890}') == {
+            "a": 123456789012345678901234567890
+        }
+        assert parse_json('{"a": "\\ud83d"}') == {"a": "\ud83d"}
+    finally:
+        fbchat.set_json_loads(None)
 
 
 def test_get_jsmods_require():
@@ -245,3 +271,25 @@ def test_timedelta_to_seconds():
     assert timedelta_to_seconds(datetime.timedelta(seconds=1)) == 1
     assert timedelta_to_seconds(datetime.timedelta(hours=1)) == 3600
     assert timedelta_to_seconds(datetime.timedelta(days=1)) == 86400
+
+
+def test_prefetch():
+    produced = []
+
+    async def numbers():
+        for i in range(5):
+            produced.append(i)
+            yield i
+        raise ValueError("Out of numbers")
+
+    async def main():
+        rtn = []
+        with pytest.raises(ValueError, match="Out of numbers"):
+            async for i in prefetch(numbers(), 2):
+                await asyncio.sleep(0)
+                # The producer is ahead, but not by more than the depth (+1 in flight)
+                assert i < len(produced) <= i + 4
+                rtn.append(i)
+        return rtn
+
+    assert [0, 1, 2, 3, 4] == asyncio.run(main())
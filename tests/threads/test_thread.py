@@ -1,3 +1,6 @@
+import attr
+import asyncio
+import datetime
 import pytest
 import fbchat
 from fbchat import ThreadABC, Thread, User, Group, Page
@@ -77,3 +80,39 @@ def test_thread_parse_participants(session):
 def test_thread_create_and_implements_thread_abc(session):
     thread = Thread(session=session, id="123")
     assert thread._parse_customization_info
+
+
+@attr.s(frozen=True, slots=True, auto_attribs=True)
+class FakeMessagesGroup(Group):
+    """Serves messages 0 to 249, newest (highest ID) first, like Facebook would."""
+
+    #: The ``before`` argument of each request
+    fetched: list = attr.ib(factory=list, init=False, eq=False)
+
+    async def _fetch_messages(self, limit, before):
+        self.fetched.append(before)
+        await asyncio.sleep(0)
+        newest = 249 if before is None else before.timestamp()
+        ids = range(int(newest), max(int(newest) - limit, -1), -1)
+        return [
+            fbchat.MessageData(
+                thread=self,
+                id=str(i),
+                author="1234",
+                created_at=datetime.datetime.fromtimestamp(i, datetime.timezone.utc),
+            )
+            for i in reversed(ids)
+        ]
+
+
+@pytest.mark.parametrize("prefetch", [0, 1, 3])
+def test_fetch_messages_prefetch(session, prefetch):
+    group = FakeMessagesGroup(session=session, id="1234")
+
+    async def fetch(limit):
+        return [m.id async for m in group.fetch_messages(limit, prefetch=prefetch)]
+
+    # The boundary message between pages is only returned once
+    assert [str(i) for i in range(249, -1, -1)] == asyncio.run(fetch(None))
+    assert 3 == len(group.fetched)
+    assert [str(i) for i in range(249, 99, -1)] == asyncio.run(fetch(151))